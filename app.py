@@ -1,6 +1,7 @@
 from app import create_app
 from config import Config
 import logging
+import os
 import sys
 
 # Cấu hình logging để hiển thị traceback trong terminal
@@ -15,12 +16,19 @@ logging.basicConfig(
 # Tạo logger cho ứng dụng
 logger = logging.getLogger(__name__)
 
-app, mongo = create_app()
+DEBUG = True
+
+# app.run(debug=True) chạy Werkzeug reloader: process cha chỉ theo dõi file và khởi động lại process con
+# (WERKZEUG_RUN_MAIN=true), nên worker nền chỉ chạy trong process con đang phục vụ request.
+# Import từ WSGI server (gunicorn app:app) thì luôn chạy worker nền.
+IS_RELOADER_PARENT = __name__ == '__main__' and DEBUG and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+app, mongo = create_app(start_background=not IS_RELOADER_PARENT)
 
 if __name__ == '__main__':
     logger.info(f"Starting Flask app on port {Config.PORT}")
     app.run(
         host='0.0.0.0',
         port=Config.PORT,
-        debug=True
+        debug=DEBUG
     )
@@ -1,25 +1,235 @@
 from flask import Flask
 from flask_pymongo import PyMongo
+from pymongo import monitoring
 import os
+import threading
+import time
 
 # Khởi tạo mongo instance toàn cục
 mongo = None
+_app = None
+_mongo_pid = None
+_mongo_lock = threading.Lock()
 
-def create_app():
-    global mongo
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Collect connection pool metrics (checked-out connections, wait time) for sizing the pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.pools = 0
+            self.connections_open = 0
+            self.checked_out = 0
+            self.max_checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.pool_clears = 0
+
+    def _checkout_finished(self, failed=False):
+        started = getattr(self._local, 'checkout_started', None)
+        self._local.checkout_started = None
+        wait_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+        with self._lock:
+            if failed:
+                self.checkout_failures += 1
+                return
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def pool_created(self, event):
+        with self._lock:
+            self.pools += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.pools = max(0, self.pools - 1)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open = max(0, self.connections_open - 1)
+
+    def connection_check_out_started(self, event):
+        # Checkout chạy đồng bộ trên cùng thread nên có thể đo wait time bằng thread-local
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._checkout_finished(failed=True)
+
+    def connection_checked_out(self, event):
+        self._checkout_finished()
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'pools': self.pools,
+                'connections_open': self.connections_open,
+                'checked_out': self.checked_out,
+                'max_checked_out': self.max_checked_out,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'avg_wait_ms': round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait_ms, 3),
+                'pool_clears': self.pool_clears
+            }
+
+
+pool_stats = PoolStatsListener()
+
+
+def _mongo_client_options(app):
+    """Build MongoClient keyword arguments from app config"""
+    return {
+        'maxPoolSize': app.config['MONGO_MAX_POOL_SIZE'],
+        'minPoolSize': app.config['MONGO_MIN_POOL_SIZE'],
+        'maxIdleTimeMS': app.config['MONGO_MAX_IDLE_TIME_MS'],
+        'waitQueueTimeoutMS': app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+        'connectTimeoutMS': app.config['MONGO_CONNECT_TIMEOUT_MS'],
+        'socketTimeoutMS': app.config['MONGO_SOCKET_TIMEOUT_MS'],
+        'serverSelectionTimeoutMS': app.config['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+        'readPreference': app.config['MONGO_READ_PREFERENCE'],
+        'event_listeners': [pool_stats],
+        # Không mở kết nối trước khi fork (gunicorn --preload), client sẽ kết nối ở lần dùng đầu tiên
+        'connect': False
+    }
+
+
+def _init_mongo(app):
+    global mongo, _mongo_pid
+    if mongo is None:
+        mongo = PyMongo()
+    mongo.init_app(app, **_mongo_client_options(app))
+    _mongo_pid = os.getpid()
+    pool_stats.reset()
+    return mongo
+
+
+def create_app(start_background: bool = True):
+    """Create the Flask app; ``start_background=False`` skips the job queue workers and the channel poller (e.g. in the reloader watcher process)"""
+    global _app
     app = Flask(__name__, template_folder='../templates', static_folder='../static')
     # Cấu hình MongoDB
     app.config['MONGO_URI'] = os.getenv('MONGO_URI', 'mongodb://mongodb:27017/playfantasy365')
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
-    
-    # Khởi tạo MongoDB
-    mongo = PyMongo(app)
-    
+
+    # Cấu hình connection pool MongoDB
+    app.config['MONGO_MAX_POOL_SIZE'] = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+    app.config['MONGO_MIN_POOL_SIZE'] = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    app.config['MONGO_MAX_IDLE_TIME_MS'] = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 300000))
+    app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'] = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000))
+    app.config['MONGO_CONNECT_TIMEOUT_MS'] = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 10000))
+    app.config['MONGO_SOCKET_TIMEOUT_MS'] = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 30000))
+    app.config['MONGO_SERVER_SELECTION_TIMEOUT_MS'] = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000))
+    app.config['MONGO_READ_PREFERENCE'] = os.getenv('MONGO_READ_PREFERENCE', 'primary')
+
+    # Khởi tạo MongoDB (một client dùng chung cho cả process)
+    _app = app
+    with _mongo_lock:
+        _init_mongo(app)
+
     # Đăng ký blueprint
     from app.routes import main
     app.register_blueprint(main)
-    
+
+    # Index cho tìm kiếm bài báo (text index + created_at)
+    from app.article_search import ensure_article_indexes
+    try:
+        ensure_article_indexes()
+    except Exception as e:
+        app.logger.warning(f"⚠️ Could not ensure article indexes: {str(e)}")
+
+    # Index cho srt_chunks / srt_files (đọc theo srt_id, video_url)
+    from app.chunk_store import ensure_chunk_indexes
+    try:
+        ensure_chunk_indexes()
+    except Exception as e:
+        app.logger.warning(f"⚠️ Could not ensure SRT chunk indexes: {str(e)}")
+
+    # Cache embedding theo nội dung (Mongo) để không encode lại các chunk không đổi
+    if os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+        from embedding_service import embedding_service
+        from app.embedding_cache import MongoEmbeddingCache
+        embedding_service.set_store(MongoEmbeddingCache(ttl_days=int(os.getenv('EMBEDDING_CACHE_TTL_DAYS', 30))))
+
+    # Cache dùng chung giữa các worker (REDIS_URL): vector của query search và kết quả /api/search
+    from cache_utils import create_redis_cache
+    query_store = create_redis_cache('qemb:', int(os.getenv('QUERY_EMBEDDING_CACHE_TTL', 86400)))
+    if query_store is not None:
+        from embedding_service import embedding_service
+        from elasticsearch_service import elasticsearch_service, SEARCH_RESULT_CACHE_TTL
+        embedding_service.set_query_store(query_store)
+        elasticsearch_service.set_result_store(create_redis_cache('search:', SEARCH_RESULT_CACHE_TTL))
+
+    # Warm-up model embedding ở background (EMBEDDING_WARMUP=all hoặc danh sách key, ví dụ: articles,video_chunks)
+    warmup = os.getenv('EMBEDDING_WARMUP', '').strip()
+    if warmup:
+        from embedding_service import embedding_service
+        keys = None if warmup.lower() == 'all' else [key.strip() for key in warmup.split(',') if key.strip()]
+        embedding_service.start_warm_up(keys)
+
+    # Khởi động worker pool của các job queue (handlers đã được đăng ký trong routes)
+    if start_background:
+        from app.job_queue import start_job_queues
+        start_job_queues()
+
+    # Poll định kỳ các channel YouTube: crawl incremental + đưa video mới vào pipeline
+    if start_background:
+        from app.channel_poller import start_channel_poller
+        start_channel_poller()
+
     return app, mongo
 
+
 def get_mongo():
+    """Return the process-wide PyMongo instance, re-creating the client after a fork"""
+    if _mongo_pid != os.getpid() and _app is not None:
+        with _mongo_lock:
+            if _mongo_pid != os.getpid():
+                # MongoClient không fork-safe: mỗi worker process cần client riêng
+                _init_mongo(_app)
     return mongo
+
+
+def get_mongo_pool_stats():
+    """Return connection pool settings and live pool metrics for this worker process"""
+    settings = {}
+    if _app is not None:
+        settings = {
+            'max_pool_size': _app.config['MONGO_MAX_POOL_SIZE'],
+            'min_pool_size': _app.config['MONGO_MIN_POOL_SIZE'],
+            'max_idle_time_ms': _app.config['MONGO_MAX_IDLE_TIME_MS'],
+            'wait_queue_timeout_ms': _app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+            'read_preference': _app.config['MONGO_READ_PREFERENCE']
+        }
+    return {
+        'pid': os.getpid(),
+        'settings': settings,
+        'stats': pool_stats.snapshot()
+    }
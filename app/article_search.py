@@ -0,0 +1,101 @@
+import os
+import re
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+from app import get_mongo
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_TEXT_INDEX = 'articles_text_search'
+# Tiêu đề / tóm tắt khớp tên đội có trọng số cao hơn nội dung
+ARTICLE_TEXT_WEIGHTS = {'title': 10, 'summary': 5, 'content': 1}
+# 'none' = không stemming / stop words: tên đội và viết tắt (CHE, PSG...) được giữ nguyên
+ARTICLE_TEXT_LANGUAGE = os.getenv('ARTICLE_TEXT_LANGUAGE', 'none')
+
+TEXT_SCORE = {'$meta': 'textScore'}
+
+
+def ensure_article_indexes():
+    """Create the text index and created_at indexes used by article lookups"""
+    col = get_mongo().db.articles
+    col.create_index(
+        [('title', TEXT), ('summary', TEXT), ('content', TEXT)],
+        name=ARTICLE_TEXT_INDEX,
+        weights=ARTICLE_TEXT_WEIGHTS,
+        default_language=ARTICLE_TEXT_LANGUAGE
+    )
+    col.create_index([('created_at', DESCENDING)])
+    col.create_index([('source', ASCENDING), ('created_at', DESCENDING)])
+
+
+def build_text_search(terms: List[str]) -> str:
+    """Join the words of ``terms`` into a $text search string; words are OR-ed and ranked by textScore.
+
+    Multi-word terms lose their phrase here (a quoted phrase would be AND-ed
+    with every other phrase), so callers post-filter with ``phrase_filter``.
+    """
+    words = []
+    seen = set()
+    for term in terms:
+        # Bỏ dấu ngoặc kép / dấu trừ để không vô tình tạo phrase hoặc negation
+        for word in re.split(r'[\s"\-]+', str(term)):
+            key = word.lower()
+            if word and key not in seen:
+                seen.add(key)
+                words.append(word)
+    return ' '.join(words)
+
+
+def _regex_filter(terms: List[str], fields: List[str]) -> Dict[str, Any]:
+    pattern = '|'.join(re.escape(term) for term in terms)
+    return {'$or': [{field: {'$regex': pattern, '$options': 'i'}} for field in fields]}
+
+
+def phrase_filter(terms: List[str], fields: List[str]) -> Optional[Dict[str, Any]]:
+    """Regex filter keeping only documents that contain one of ``terms`` as a whole phrase.
+
+    None when every term is a single word: the $text match is already exact.
+    """
+    if not any(len(str(term).split()) > 1 for term in terms):
+        return None
+    return _regex_filter([' '.join(str(term).split()) for term in terms], fields)
+
+
+def search_related_articles(team_names: List[str], since: datetime, limit: int = 6) -> List[Dict[str, Any]]:
+    """Top-k articles since ``since`` mentioning any of the team names, best textScore first.
+
+    Falls back to the old regex scan when the text index does not exist yet.
+    """
+    col = get_mongo().db.articles
+    search = build_text_search(team_names)
+    if not search:
+        return []
+
+    query = {'$text': {'$search': search}, 'created_at': {'$gte': since}}
+    # "Manchester United" không được khớp bài chỉ nhắc tới "United": lọc lại ứng viên của $text theo cụm từ gốc
+    phrases = phrase_filter(team_names, list(ARTICLE_TEXT_WEIGHTS))
+    if phrases:
+        query.update(phrases)
+    try:
+        cursor = col.find(query, {'score': TEXT_SCORE}).sort([('score', TEXT_SCORE), ('created_at', DESCENDING)]).limit(limit)
+        return list(cursor)
+    except OperationFailure as e:
+        logger.warning(f"⚠️ Text search unavailable on articles, falling back to regex: {str(e)}")
+
+    query = _regex_filter(team_names, ['content'])
+    query['created_at'] = {'$gte': since}
+    return list(col.find(query).sort('created_at', DESCENDING).limit(limit))
+
+
+def apply_article_search(query: Dict[str, Any], search_query: str, use_text: bool = True) -> Dict[str, Any]:
+    """Add a search filter over title / content / summary to an articles query"""
+    if use_text:
+        query['$text'] = {'$search': search_query}
+    else:
+        query.update(_regex_filter([search_query], ['title', 'content', 'summary']))
+    return query
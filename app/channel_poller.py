@@ -0,0 +1,331 @@
+import os
+import time
+import atexit
+import random
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app import get_mongo
+from app.job_queue import video_pipeline_queue
+from app.youtube_sync import crawl_channel_videos, refresh_video_stats, SYNC_MODE_INCREMENTAL
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+class ChannelPoller:
+    """Background scheduler that keeps every channel in `youtube_channels` in sync.
+
+    Each channel carries its own schedule in the ``poll`` sub-document
+    (``next_poll_at``, current ``interval``, error counters). Channels are
+    claimed with a lease, so several worker processes can run the poller
+    without polling the same channel twice. A poll runs the incremental crawl
+    (which also continues the backfill of a channel whose first crawl was
+    capped, ``max_videos`` new videos per poll) and queues every newly found
+    video on ``video_pipeline_queue``; quiet or
+    failing channels back off up to ``max_interval`` and every next poll time
+    is jittered so channels do not line up into bursts.
+    """
+
+    def __init__(self, interval: int = 900, max_interval: int = 21600, backoff_factor: float = 2.0,
+                 jitter: float = 0.2, workers: int = 2, lease_seconds: int = 600,
+                 tick_interval: float = 30.0, max_videos: int = 200, stats_interval: int = 3600):
+        self.interval = interval
+        self.max_interval = max(interval, max_interval)
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.workers = max(1, workers)
+        self.lease_seconds = lease_seconds
+        self.tick_interval = tick_interval
+        self.max_videos = max_videos
+        self.stats_interval = stats_interval
+
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._inflight: Dict[str, float] = {}
+        self._owner = None
+        self._polled = 0
+        self._failed = 0
+        self._queued_videos = 0
+        self._last_stats_refresh = None
+
+    @property
+    def channels(self):
+        return get_mongo().db.youtube_channels
+
+    @property
+    def scheduled_tasks(self):
+        return get_mongo().db.scheduled_tasks
+
+    def ensure_indexes(self):
+        self.channels.create_index([('poll.next_poll_at', ASCENDING)])
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return self.channels.find_one_and_update(
+            {
+                'poll.enabled': {'$ne': False},
+                '$and': [
+                    {'$or': [{'poll.next_poll_at': {'$lte': now}}, {'poll.next_poll_at': {'$exists': False}}]},
+                    # Lease hết hạn: process đang poll channel này đã chết
+                    {'$or': [{'poll.lease_expires_at': None}, {'poll.lease_expires_at': {'$lte': now}}]}
+                ]
+            },
+            {'$set': {
+                'poll.lease_expires_at': now + timedelta(seconds=self.lease_seconds),
+                'poll.owner': self._owner
+            }},
+            sort=[('poll.next_poll_at', ASCENDING)],
+            projection={'channel_id': 1, 'poll': 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _next_interval(self, poll: Dict[str, Any], new_videos: int, failed: bool) -> float:
+        if failed:
+            errors = poll.get('consecutive_errors', 0) + 1
+            return min(self.max_interval, self.interval * (self.backoff_factor ** errors))
+        if new_videos:
+            return self.interval
+        # Channel im lặng: giãn dần khoảng cách poll
+        return min(self.max_interval, (poll.get('interval') or self.interval) * self.backoff_factor)
+
+    def poll_channel(self, channel: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the incremental sync for one claimed channel and queue its new videos"""
+        channel_id = channel['channel_id']
+        poll = channel.get('poll') or {}
+        started_at = datetime.utcnow()
+        result = None
+        error = None
+        queued = 0
+        try:
+            result = crawl_channel_videos(channel_id, self.max_videos, mode=SYNC_MODE_INCREMENTAL)
+            if result['crawled_count']:
+                queued = self._enqueue_new_videos(channel_id, started_at)
+        except Exception as e:
+            error = e
+            logger.error(f"❌ Poll of channel {channel_id} failed: {str(e)}")
+
+        new_videos = result['crawled_count'] if result else 0
+        interval = self._next_interval(poll, new_videos, error is not None)
+        now = datetime.utcnow()
+        update = {
+            'poll.interval': interval,
+            'poll.next_poll_at': now + timedelta(seconds=self._jittered(interval)),
+            'poll.lease_expires_at': None,
+            'poll.last_polled_at': now,
+            'poll.last_duration_ms': int((now - started_at).total_seconds() * 1000)
+        }
+        if error is not None:
+            update['poll.consecutive_errors'] = poll.get('consecutive_errors', 0) + 1
+            update['poll.last_error'] = str(error)
+        else:
+            update['poll.consecutive_errors'] = 0
+            update['poll.last_error'] = None
+            update['poll.last_result'] = {**result, 'queued_videos': queued}
+        self.channels.update_one({'_id': channel['_id'], 'poll.owner': self._owner}, {'$set': update})
+
+        with self._lock:
+            self._polled += 1
+            self._queued_videos += queued
+            if error is not None:
+                self._failed += 1
+
+        if new_videos:
+            logger.info(f"🛰️ Channel {channel_id}: {new_videos} new videos, {queued} queued for pipeline")
+        return {'channel_id': channel_id, 'new_videos': new_videos, 'queued_videos': queued,
+                'next_interval': interval, 'error': str(error) if error else None}
+
+    def _enqueue_new_videos(self, channel_id: str, since: datetime) -> int:
+        """Queue the crawl & chunk pipeline for videos inserted by this poll"""
+        cursor = get_mongo().db.videos.find(
+            # srt_status -1: video không có phụ đề trong SUBTITLE_LANGUAGES
+            {'channel_id': channel_id, 'created_at': {'$gte': since}, 'srt_status': {'$nin': [1, -1]}},
+            {'_id': 1}
+        )
+        queued = 0
+        for video in cursor:
+            video_pipeline_queue.enqueue(
+                'crawl_and_chunk_video',
+                {'video_id': str(video['_id']), 'source': 'channel_poller'},
+                dedupe_key=f"crawl_and_chunk_video:{video['_id']}"
+            )
+            queued += 1
+        return queued
+
+    def _run_claimed(self, channel: Dict[str, Any]):
+        try:
+            self.poll_channel(channel)
+        except Exception as e:
+            logger.error(f"❌ Channel poller error for {channel.get('channel_id')}: {str(e)}")
+        finally:
+            with self._lock:
+                self._inflight.pop(channel['channel_id'], None)
+            self._slots.release()
+
+    def _claim_task(self, name: str, interval: int) -> bool:
+        """Claim a periodic task shared by all processes; True when this process should run it now"""
+        now = datetime.utcnow()
+        try:
+            # Khớp khi task tới hạn, upsert khi task chưa từng chạy
+            self.scheduled_tasks.update_one(
+                {'_id': name, 'next_run_at': {'$lte': now}},
+                {'$set': {'next_run_at': now + timedelta(seconds=interval), 'owner': self._owner, 'claimed_at': now}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Task đã có và chưa tới hạn (hoặc process khác vừa nhận)
+            return False
+        return True
+
+    def _refresh_stats_if_due(self):
+        if self.stats_interval <= 0 or not self._claim_task('refresh_video_stats', self.stats_interval):
+            return
+        try:
+            self._last_stats_refresh = {**refresh_video_stats(), 'at': datetime.utcnow()}
+        except Exception as e:
+            logger.error(f"❌ Periodic stats refresh failed: {str(e)}")
+            self._last_stats_refresh = {'error': str(e), 'at': datetime.utcnow()}
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                # Nhận channel tới hạn cho tới khi hết slot trống
+                while not self._stop.is_set() and self._slots.acquire(blocking=False):
+                    channel = self._claim()
+                    if not channel:
+                        self._slots.release()
+                        break
+                    with self._lock:
+                        self._inflight[channel['channel_id']] = time.time()
+                    self._executor.submit(self._run_claimed, channel)
+                self._refresh_stats_if_due()
+            except Exception as e:
+                logger.error(f"❌ Channel poller loop error: {str(e)}")
+            self._stop.wait(self._jittered(self.tick_interval))
+
+    def _release_inflight(self):
+        """Hand claimed channels back so another process can poll them right away"""
+        try:
+            self.channels.update_many(
+                {'poll.owner': self._owner, 'poll.lease_expires_at': {'$ne': None}},
+                {'$set': {'poll.lease_expires_at': None}}
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to release channel leases: {str(e)}")
+
+    def start(self):
+        """Start the poller thread for this process (idempotent, re-started after fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._stop.clear()
+            self._inflight = {}
+            self._slots = threading.BoundedSemaphore(self.workers)
+            self._owner = f"{socket.gethostname()}:{os.getpid()}:channel_poller"
+            try:
+                self.ensure_indexes()
+            except Exception as e:
+                logger.warning(f"⚠️ Could not ensure channel poll indexes: {str(e)}")
+
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ChannelPoll')
+            thread = threading.Thread(target=self._loop, name='ChannelPoller', daemon=True)
+            thread.start()
+
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+            logger.info(f"🛰️ Started channel poller: every {self.interval}s (max {self.max_interval}s), {self.workers} workers")
+
+    def stop(self):
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._release_inflight()
+        self._pid = None
+
+    def poll_now(self, channel_id: str) -> bool:
+        """Make a channel due immediately and reset its backoff"""
+        result = self.channels.update_one(
+            {'channel_id': channel_id},
+            {'$set': {'poll.next_poll_at': datetime.utcnow(), 'poll.interval': self.interval}}
+        )
+        return result.matched_count == 1
+
+    # ------------------------------------------------------------------
+    # Monitoring
+    # ------------------------------------------------------------------
+
+    def stats(self, upcoming: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            inflight = sorted(self._inflight)
+            polled, failed, queued = self._polled, self._failed, self._queued_videos
+
+        schedule: List[Dict[str, Any]] = list(self.channels.find(
+            {'poll.enabled': {'$ne': False}},
+            {'_id': 0, 'channel_id': 1, 'title': 1, 'poll': 1}
+        ).sort('poll.next_poll_at', ASCENDING).limit(upcoming))
+
+        return {
+            'running_in_this_process': self._pid == os.getpid(),
+            'interval': self.interval,
+            'max_interval': self.max_interval,
+            'workers': self.workers,
+            'inflight': inflight,
+            'polled_in_this_process': polled,
+            'failed_in_this_process': failed,
+            'queued_videos_in_this_process': queued,
+            'erroring_channels': self.channels.count_documents({'poll.consecutive_errors': {'$gt': 0}}),
+            'last_stats_refresh': self._last_stats_refresh,
+            'upcoming': schedule
+        }
+
+
+POLLER_ENABLED = os.getenv('CHANNEL_POLL_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Global instance
+channel_poller = ChannelPoller(
+    interval=_env_int('CHANNEL_POLL_INTERVAL', 900),
+    max_interval=_env_int('CHANNEL_POLL_MAX_INTERVAL', 21600),
+    backoff_factor=float(os.getenv('CHANNEL_POLL_BACKOFF_FACTOR', 2)),
+    jitter=float(os.getenv('CHANNEL_POLL_JITTER', 0.2)),
+    workers=_env_int('CHANNEL_POLL_WORKERS', 2),
+    lease_seconds=_env_int('CHANNEL_POLL_LEASE_SECONDS', 600),
+    tick_interval=float(os.getenv('CHANNEL_POLL_TICK_INTERVAL', 30)),
+    max_videos=_env_int('CHANNEL_POLL_MAX_VIDEOS', 200),
+    stats_interval=_env_int('CHANNEL_POLL_STATS_INTERVAL', 3600)
+)
+
+
+def start_channel_poller():
+    """Start the poller unless disabled or the YouTube API is not configured"""
+    if not POLLER_ENABLED:
+        logger.info("⏸️ Channel poller disabled (CHANNEL_POLL_ENABLED=false)")
+        return
+    if not os.getenv('YOUTUBE_API_KEY'):
+        logger.info("⏸️ Channel poller not started: YOUTUBE_API_KEY is not set")
+        return
+    channel_poller.start()
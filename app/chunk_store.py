@@ -0,0 +1,105 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import ConfigurationError, OperationFailure
+
+from app import get_mongo
+
+logger = logging.getLogger(__name__)
+
+# Mongo standalone không hỗ trợ transaction: nhớ lại sau lần thử đầu tiên để khỏi thử lại mỗi lần ghi
+_transactions_supported: Optional[bool] = None
+
+
+def ensure_chunk_indexes():
+    """Create the indexes used by chunk lookups and the replace-by-srt_id writes"""
+    db = get_mongo().db
+    db.srt_chunks.create_index([('srt_id', ASCENDING), ('chunk_index', ASCENDING)])
+    db.srt_chunks.create_index([('video_id', ASCENDING)], sparse=True)
+    db.srt_files.create_index([('video_url', ASCENDING), ('created_at', DESCENDING)])
+    db.srt_files.create_index([('created_at', DESCENDING)])
+    db.srt_files.create_index([('video_id', ASCENDING)], sparse=True)
+    db.srt_files.create_index([('language', ASCENDING)], sparse=True)
+
+
+def build_chunk_docs(srt_id: ObjectId, video_url: str, chunks: List[Dict[str, Any]],
+                     video_id: Optional[ObjectId] = None, language: Optional[str] = None) -> List[Dict[str, Any]]:
+    """srt_chunks documents for ``chunks`` (one timestamp for the whole batch)"""
+    now = datetime.utcnow()
+    base = {'srt_id': srt_id, 'video_url': video_url, 'created_at': now}
+    if video_id is not None:
+        base['video_id'] = video_id
+    if language:
+        base['language'] = language
+    return [
+        {
+            **base,
+            'chunk_index': i,
+            'text': chunk['text'],
+            'time': chunk['time'],
+            'start_time': chunk.get('start_time'),
+            'end_time': chunk.get('end_time')
+        }
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def _write(db, srt_id: ObjectId, docs: List[Dict[str, Any]], srt_update: Dict[str, Any], session=None):
+    db.srt_chunks.delete_many({'srt_id': srt_id}, session=session)
+    if docs:
+        db.srt_chunks.insert_many(docs, ordered=False, session=session)
+    db.srt_files.update_one({'_id': srt_id}, {'$set': srt_update}, session=session)
+
+
+def _is_transaction_unsupported(error: Exception) -> bool:
+    # 20 = IllegalOperation: "Transaction numbers are only allowed on a replica set member or mongos"
+    return isinstance(error, ConfigurationError) or getattr(error, 'code', None) == 20 \
+        or 'Transaction numbers' in str(error)
+
+
+def replace_srt_chunks(srt_id: ObjectId, video_url: str, chunks: List[Dict[str, Any]],
+                       video_id: Optional[ObjectId] = None,
+                       extra_fields: Optional[Dict[str, Any]] = None,
+                       language: Optional[str] = None) -> Dict[str, Any]:
+    """Replace all chunks of ``srt_id`` and mark the SRT file processed in one unit of work.
+
+    On a replica set the delete, the unordered bulk insert and the status update
+    run in one transaction, so readers never see half-written chunks next to a
+    processed status. On a standalone server the same writes run in that order:
+    a crash leaves the file at status 0 and re-processing replaces the partial
+    chunks instead of duplicating them.
+    """
+    global _transactions_supported
+    mongo = get_mongo()
+    docs = build_chunk_docs(srt_id, video_url, chunks, video_id, language)
+    srt_update = {
+        'status': 1,  # 1: processed
+        'chunks_count': len(docs),
+        'updated_at': datetime.utcnow(),
+        **(extra_fields or {})
+    }
+
+    if _transactions_supported is not False:
+        try:
+            with mongo.cx.start_session() as session:
+                session.with_transaction(lambda s: _write(mongo.db, srt_id, docs, srt_update, session=s))
+            _transactions_supported = True
+            return {'inserted': len(docs), 'transaction': True}
+        except (OperationFailure, ConfigurationError) as e:
+            if not _is_transaction_unsupported(e):
+                raise
+            _transactions_supported = False
+            logger.info("ℹ️ MongoDB transactions unavailable (standalone server), writing chunks without a transaction")
+
+    _write(mongo.db, srt_id, docs, srt_update)
+    return {'inserted': len(docs), 'transaction': False}
+
+
+def delete_srt(srt_doc: Dict[str, Any]):
+    """Delete an SRT file record together with its chunks"""
+    db = get_mongo().db
+    db.srt_chunks.delete_many({'srt_id': srt_doc['_id']})
+    db.srt_files.delete_one({'_id': srt_doc['_id']})
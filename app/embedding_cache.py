@@ -0,0 +1,109 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+from bson.binary import Binary
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+from app import get_mongo
+
+logger = logging.getLogger(__name__)
+
+
+class MongoEmbeddingCache:
+    """Content-addressed embedding store in the `embedding_cache` collection.
+
+    Documents are keyed by sha256(model + normalized text) and hold the vector
+    as raw float32 bytes. ``last_used_at`` is refreshed on every hit and a TTL
+    index on it evicts entries that have not been used for ``ttl_days``, which
+    gives LRU-style eviction without a background job.
+    """
+
+    def __init__(self, ttl_days: int = 30):
+        self.ttl_days = ttl_days
+        self._indexes_ready = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    @property
+    def collection(self):
+        return get_mongo().db.embedding_cache
+
+    def ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        with self._lock:
+            if self._indexes_ready:
+                return
+            self.collection.create_index(
+                [('last_used_at', ASCENDING)],
+                expireAfterSeconds=int(timedelta(days=self.ttl_days).total_seconds())
+            )
+            self._indexes_ready = True
+
+    def get_many(self, model_name: str, keys: List[str]) -> Dict[str, np.ndarray]:
+        if not keys:
+            return {}
+        try:
+            self.ensure_indexes()
+            found = {}
+            for doc in self.collection.find({'_id': {'$in': keys}}, {'vector': 1, 'dims': 1}):
+                found[doc['_id']] = np.frombuffer(doc['vector'], dtype=np.float32)
+            if found:
+                # Làm mới last_used_at để TTL chỉ xóa các vector lâu không dùng tới
+                self.collection.update_many(
+                    {'_id': {'$in': list(found)}},
+                    {'$set': {'last_used_at': datetime.utcnow()}}
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            return found
+        except PyMongoError as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Embedding cache lookup failed: {str(e)}")
+            return {}
+
+    def put_many(self, model_name: str, vectors: Dict[str, np.ndarray]):
+        if not vectors:
+            return
+        now = datetime.utcnow()
+        operations = []
+        for key, vector in vectors.items():
+            vector = np.asarray(vector, dtype=np.float32)
+            operations.append(UpdateOne(
+                {'_id': key},
+                {
+                    '$set': {'last_used_at': now},
+                    '$setOnInsert': {
+                        'model': model_name,
+                        'dims': int(vector.shape[0]),
+                        'vector': Binary(vector.tobytes()),
+                        'created_at': now
+                    }
+                },
+                upsert=True
+            ))
+        try:
+            self.ensure_indexes()
+            self.collection.bulk_write(operations, ordered=False)
+            self.writes += len(operations)
+        except PyMongoError as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Embedding cache write failed: {str(e)}")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'ttl_days': self.ttl_days
+        }
@@ -0,0 +1,517 @@
+import os
+import time
+import atexit
+import random
+import socket
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app import get_mongo
+
+logger = logging.getLogger(__name__)
+
+# Trạng thái của job trong collection `jobs`
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_DEAD = 'dead'
+JOB_STATUSES = [JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_DEAD]
+
+# Cho phép tắt worker trên các node chỉ nhận request (job vẫn được ghi vào Mongo)
+WORKERS_ENABLED = os.getenv('JOB_WORKERS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job cannot succeed; the job is dead-lettered immediately"""
+
+
+class JobProgress:
+    """Per-stage progress and timings of a running job, persisted in the job's ``progress`` field.
+
+    Handlers declare their stages up front and wrap each one in ``stage()``;
+    status readers (polling /api/jobs/<job_id>) see which stage is running, how long each
+    finished stage took and the overall percentage.
+    """
+
+    def __init__(self, queue: 'JobQueue', job: Dict[str, Any], stages: List[str]):
+        self.queue = queue
+        self.job_id = job['_id']
+        self.attempt = job.get('attempts', 1)
+        self.current_stage = None
+        self.stages = [{'name': name, 'status': 'pending'} for name in stages]
+        self._save()
+
+    def _entry(self, name: str) -> Dict[str, Any]:
+        for entry in self.stages:
+            if entry['name'] == name:
+                return entry
+        entry = {'name': name, 'status': 'pending'}
+        self.stages.append(entry)
+        return entry
+
+    def snapshot(self) -> Dict[str, Any]:
+        finished = sum(1 for entry in self.stages if entry['status'] in ('done', 'skipped'))
+        return {
+            'attempt': self.attempt,
+            'current_stage': self.current_stage,
+            'completed_stages': finished,
+            'total_stages': len(self.stages),
+            'percent': int(finished * 100 / len(self.stages)) if self.stages else 0,
+            'stages': self.stages
+        }
+
+    def _save(self):
+        try:
+            self.queue.collection.update_one(
+                {'_id': self.job_id},
+                {'$set': {'progress': self.snapshot(), 'updated_at': datetime.utcnow()}}
+            )
+        except Exception as e:
+            # Progress chỉ để hiển thị: lỗi ghi không được làm hỏng job
+            logger.warning(f"⚠️ Failed to save progress for job {self.job_id}: {str(e)}")
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mark ``name`` running for the duration of the block; the yielded dict is stored as stage details"""
+        entry = self._entry(name)
+        entry.update({'status': 'running', 'started_at': datetime.utcnow(), 'details': {}})
+        self.current_stage = name
+        self._save()
+        started = time.perf_counter()
+        try:
+            yield entry['details']
+        except Exception as e:
+            entry.update({
+                'status': 'failed',
+                'error': str(e),
+                'duration_ms': int((time.perf_counter() - started) * 1000),
+                'finished_at': datetime.utcnow()
+            })
+            self._save()
+            raise
+        entry.update({
+            'status': 'done',
+            'duration_ms': int((time.perf_counter() - started) * 1000),
+            'finished_at': datetime.utcnow()
+        })
+        self.current_stage = None
+        self._save()
+
+    def skip(self, name: str, reason: str = ''):
+        entry = self._entry(name)
+        entry.update({'status': 'skipped', 'reason': reason})
+        self._save()
+
+
+class JobQueue:
+    """Mongo-backed durable job queue with a fixed-size worker pool.
+
+    Jobs are claimed with a lease (visibility timeout). A job whose worker dies
+    is picked up again once its lease expires, so nothing is lost when a worker
+    process is recycled. Failed jobs are retried with exponential backoff and
+    moved to the dead-letter state after ``max_attempts``.
+    """
+
+    def __init__(self, name: str, workers: int = 2, visibility_timeout: int = 900,
+                 max_attempts: int = 5, retry_base_delay: int = 30,
+                 retry_max_delay: int = 1800, poll_interval: float = 2.0):
+        self.name = name
+        self.workers = max(1, workers)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.poll_interval = poll_interval
+
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._inflight: Dict[ObjectId, str] = {}
+        self._processed = 0
+        self._failed = 0
+
+    # ------------------------------------------------------------------
+    # Collection helpers
+    # ------------------------------------------------------------------
+
+    @property
+    def collection(self):
+        return get_mongo().db.jobs
+
+    def ensure_indexes(self):
+        """Create the indexes used by claim, dedupe and the status API"""
+        col = self.collection
+        col.create_index([('queue', ASCENDING), ('status', ASCENDING), ('run_at', ASCENDING)])
+        col.create_index([('status', ASCENDING), ('lease_expires_at', ASCENDING)])
+        col.create_index([('created_at', DESCENDING)])
+        col.create_index([('payload.batch_id', ASCENDING)], sparse=True)
+        col.create_index(
+            [('queue', ASCENDING), ('dedupe_key', ASCENDING)],
+            unique=True,
+            partialFilterExpression={'active': True, 'dedupe_key': {'$exists': True}}
+        )
+
+    def register_handler(self, job_type: str, handler: Callable[[Dict[str, Any]], Any]):
+        """Register the function that processes jobs of ``job_type``"""
+        self._handlers[job_type] = handler
+
+    # ------------------------------------------------------------------
+    # Producer API
+    # ------------------------------------------------------------------
+
+    def enqueue(self, job_type: str, payload: Dict[str, Any], dedupe_key: Optional[str] = None,
+                max_attempts: Optional[int] = None, delay: int = 0) -> ObjectId:
+        """Persist a new job and return its id.
+
+        If ``dedupe_key`` is given and an active (pending/running) job with the
+        same key already exists, the existing job id is returned instead.
+        """
+        now = datetime.utcnow()
+        job_doc = {
+            'queue': self.name,
+            'type': job_type,
+            'payload': payload,
+            'status': JOB_PENDING,
+            'active': True,
+            'attempts': 0,
+            'max_attempts': max_attempts or self.max_attempts,
+            'run_at': now + timedelta(seconds=delay),
+            'lease_expires_at': None,
+            'worker_id': None,
+            'last_error': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        if dedupe_key:
+            job_doc['dedupe_key'] = dedupe_key
+
+        try:
+            job_id = self.collection.insert_one(job_doc).inserted_id
+        except DuplicateKeyError:
+            existing = self.collection.find_one({'queue': self.name, 'dedupe_key': dedupe_key, 'active': True})
+            if existing:
+                logger.info(f"♻️ Job {dedupe_key} already queued as {existing['_id']}")
+                return existing['_id']
+            raise
+
+        logger.info(f"📥 Enqueued job {job_id} ({self.name}/{job_type})")
+        # Đảm bảo worker pool của process này đang chạy và đánh thức worker rảnh
+        if WORKERS_ENABLED:
+            self.start()
+            self._wakeup.set()
+        return job_id
+
+    def retry(self, job_id: ObjectId) -> bool:
+        """Move a dead job back to pending with a fresh attempt budget"""
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            {'_id': job_id, 'queue': self.name, 'status': JOB_DEAD},
+            {
+                '$set': {
+                    'status': JOB_PENDING,
+                    'active': True,
+                    'attempts': 0,
+                    'run_at': now,
+                    'lease_expires_at': None,
+                    'worker_id': None,
+                    'updated_at': now
+                },
+                '$unset': {'dead_at': ''}
+            }
+        )
+        if result.modified_count and WORKERS_ENABLED:
+            self.start()
+            self._wakeup.set()
+        return result.modified_count == 1
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+
+    def _claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {
+                'queue': self.name,
+                'type': {'$in': list(self._handlers.keys())},
+                '$or': [
+                    {'status': JOB_PENDING, 'run_at': {'$lte': now}},
+                    # Lease hết hạn: worker cũ đã chết, job được nhận lại
+                    {'status': JOB_RUNNING, 'lease_expires_at': {'$lte': now}}
+                ]
+            },
+            {
+                '$set': {
+                    'status': JOB_RUNNING,
+                    'worker_id': worker_id,
+                    'lease_expires_at': now + timedelta(seconds=self.visibility_timeout),
+                    'started_at': now,
+                    'updated_at': now
+                },
+                '$inc': {'attempts': 1}
+            },
+            sort=[('run_at', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _complete(self, job: Dict[str, Any], worker_id: str, result: Any):
+        now = datetime.utcnow()
+        update = {
+            'status': JOB_DONE,
+            'active': False,
+            'lease_expires_at': None,
+            'finished_at': now,
+            'updated_at': now,
+            'duration_ms': int((now - job['started_at']).total_seconds() * 1000)
+        }
+        if result is not None:
+            update['result'] = result
+        self.collection.update_one(
+            {'_id': job['_id'], 'worker_id': worker_id, 'status': JOB_RUNNING},
+            {'$set': update}
+        )
+
+    def _fail(self, job: Dict[str, Any], worker_id: str, error: Exception, permanent: bool = False):
+        now = datetime.utcnow()
+        attempts = job.get('attempts', 1)
+        error_info = {
+            'attempt': attempts,
+            'error': str(error),
+            'at': now
+        }
+
+        if permanent or attempts >= job.get('max_attempts', self.max_attempts):
+            update = {
+                'status': JOB_DEAD,
+                'active': False,
+                'lease_expires_at': None,
+                'dead_at': now
+            }
+            logger.error(f"💀 Job {job['_id']} ({job['type']}) dead-lettered after {attempts} attempts: {error}")
+        else:
+            delay = min(self.retry_max_delay, self.retry_base_delay * (2 ** (attempts - 1)))
+            delay += random.uniform(0, self.retry_base_delay / 2)
+            update = {
+                'status': JOB_PENDING,
+                'lease_expires_at': None,
+                'worker_id': None,
+                'run_at': now + timedelta(seconds=delay)
+            }
+            logger.warning(f"🔁 Job {job['_id']} ({job['type']}) failed attempt {attempts}, retrying in {delay:.0f}s: {error}")
+
+        update['last_error'] = str(error)
+        update['updated_at'] = now
+        self.collection.update_one(
+            {'_id': job['_id'], 'worker_id': worker_id, 'status': JOB_RUNNING},
+            {'$set': update, '$push': {'errors': {'$each': [error_info], '$slice': -10}}}
+        )
+
+    def _run_job(self, job: Dict[str, Any], worker_id: str):
+        if job['attempts'] > job.get('max_attempts', self.max_attempts):
+            # Job bị nhận lại sau khi worker chết quá nhiều lần
+            self._fail(job, worker_id, Exception('Lease expired too many times'), permanent=True)
+            return
+
+        handler = self._handlers[job['type']]
+        with self._lock:
+            self._inflight[job['_id']] = worker_id
+
+        logger.info(f"⚙️ Worker {worker_id} running job {job['_id']} ({job['type']}), attempt {job['attempts']}")
+        try:
+            result = handler(job)
+            self._complete(job, worker_id, result)
+            with self._lock:
+                self._processed += 1
+            logger.info(f"✅ Job {job['_id']} completed")
+        except PermanentJobError as e:
+            self._fail(job, worker_id, e, permanent=True)
+            with self._lock:
+                self._failed += 1
+        except Exception as e:
+            logger.error(f"❌ Job {job['_id']} raised: {str(e)}")
+            logger.error(f"📋 Traceback: {traceback.format_exc()}")
+            self._fail(job, worker_id, e)
+            with self._lock:
+                self._failed += 1
+        finally:
+            with self._lock:
+                self._inflight.pop(job['_id'], None)
+
+    def _worker_loop(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                job = self._claim(worker_id)
+            except Exception as e:
+                logger.error(f"❌ Job queue '{self.name}' claim error: {str(e)}")
+                self._stop.wait(self.poll_interval)
+                continue
+
+            if not job:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            self._run_job(job, worker_id)
+
+    def _heartbeat_loop(self):
+        """Extend the lease of every job this process is still working on"""
+        interval = max(1, self.visibility_timeout // 3)
+        while not self._stop.wait(interval):
+            with self._lock:
+                inflight = dict(self._inflight)
+            for job_id, worker_id in inflight.items():
+                try:
+                    self.collection.update_one(
+                        {'_id': job_id, 'worker_id': worker_id, 'status': JOB_RUNNING},
+                        {'$set': {'lease_expires_at': datetime.utcnow() + timedelta(seconds=self.visibility_timeout)}}
+                    )
+                except Exception as e:
+                    logger.warning(f"⚠️ Failed to extend lease for job {job_id}: {str(e)}")
+
+    def _release_inflight(self):
+        """Hand unfinished jobs back to the queue when the process exits"""
+        with self._lock:
+            inflight = dict(self._inflight)
+        for job_id, worker_id in inflight.items():
+            try:
+                self.collection.update_one(
+                    {'_id': job_id, 'worker_id': worker_id, 'status': JOB_RUNNING},
+                    {
+                        '$set': {
+                            'status': JOB_PENDING,
+                            'worker_id': None,
+                            'lease_expires_at': None,
+                            'run_at': datetime.utcnow()
+                        },
+                        '$inc': {'attempts': -1}
+                    }
+                )
+                logger.info(f"↩️ Released job {job_id} back to queue '{self.name}'")
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to release job {job_id}: {str(e)}")
+
+    def start(self):
+        """Start the worker pool for this process (idempotent, re-started after fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._stop.clear()
+            self._inflight = {}
+            self._threads = []
+            try:
+                self.ensure_indexes()
+            except Exception as e:
+                logger.warning(f"⚠️ Could not ensure job indexes: {str(e)}")
+
+            worker_prefix = f"{socket.gethostname()}:{os.getpid()}:{self.name}"
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    args=(f"{worker_prefix}:{i}",),
+                    name=f"JobWorker-{self.name}-{i}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+            heartbeat = threading.Thread(target=self._heartbeat_loop, name=f"JobHeartbeat-{self.name}", daemon=True)
+            heartbeat.start()
+            self._threads.append(heartbeat)
+
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+            logger.info(f"🚀 Started job queue '{self.name}' with {self.workers} workers (pid {self._pid})")
+
+    def stop(self):
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._release_inflight()
+        self._pid = None
+
+    # ------------------------------------------------------------------
+    # Monitoring
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {status: 0 for status in JOB_STATUSES}
+        for row in self.collection.aggregate([
+            {'$match': {'queue': self.name}},
+            {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+        ]):
+            counts[row['_id']] = row['count']
+
+        with self._lock:
+            busy = len(self._inflight)
+            processed = self._processed
+            failed = self._failed
+
+        return {
+            'queue': self.name,
+            'workers': self.workers,
+            'running_in_this_process': self._pid == os.getpid(),
+            'busy_workers': busy,
+            'processed_in_this_process': processed,
+            'failed_in_this_process': failed,
+            'counts': counts,
+            'handlers': sorted(self._handlers.keys())
+        }
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+# Queue cho việc tạo bài viết phân tích trận đấu (Groq pipeline)
+article_job_queue = JobQueue(
+    'article_generation',
+    workers=_env_int('ARTICLE_JOB_WORKERS', 2),
+    visibility_timeout=_env_int('JOB_VISIBILITY_TIMEOUT', 900),
+    max_attempts=_env_int('JOB_MAX_ATTEMPTS', 5),
+    retry_base_delay=_env_int('JOB_RETRY_BASE_DELAY', 30),
+    retry_max_delay=_env_int('JOB_RETRY_MAX_DELAY', 1800),
+    poll_interval=float(os.getenv('JOB_POLL_INTERVAL', 2))
+)
+
+# Queue cho pipeline crawl SRT -> chunk -> embed -> index của video
+video_pipeline_queue = JobQueue(
+    'video_pipeline',
+    workers=_env_int('PIPELINE_JOB_WORKERS', 4),
+    visibility_timeout=_env_int('PIPELINE_JOB_VISIBILITY_TIMEOUT', 1800),
+    max_attempts=_env_int('PIPELINE_JOB_MAX_ATTEMPTS', 3),
+    retry_base_delay=_env_int('JOB_RETRY_BASE_DELAY', 30),
+    retry_max_delay=_env_int('JOB_RETRY_MAX_DELAY', 1800),
+    poll_interval=float(os.getenv('JOB_POLL_INTERVAL', 2))
+)
+
+job_queues: Dict[str, JobQueue] = {
+    article_job_queue.name: article_job_queue,
+    video_pipeline_queue.name: video_pipeline_queue
+}
+
+
+def start_job_queues():
+    """Start worker pools for every registered queue unless disabled via JOB_WORKERS_ENABLED"""
+    if not WORKERS_ENABLED:
+        logger.info("⏸️ Job workers disabled (JOB_WORKERS_ENABLED=false)")
+        return
+    for queue in job_queues.values():
+        try:
+            queue.start()
+        except Exception as e:
+            logger.error(f"❌ Failed to start job queue '{queue.name}': {str(e)}")
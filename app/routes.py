@@ -1,20 +1,28 @@
 from flask import Blueprint, request, jsonify, current_app, render_template
-from flask_pymongo import PyMongo
 from bson import ObjectId
+from pymongo.errors import OperationFailure
 from datetime import datetime
 import json
 import os
-import yt_dlp
-import pysrt
 import uuid
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import traceback
 import time
 import threading
-import re
 # Import Elasticsearch service
-from elasticsearch_service import elasticsearch_service
+from elasticsearch_service import (
+    elasticsearch_service, bulk_index, chunk_doc_id, delete_stale_docs, decode_search_cursor,
+    SEARCH_MODES, SEARCH_MODE_HYBRID, FUSION_METHODS, FUSION_RRF, SEARCH_RESULT_FIELDS, SEARCH_HIGHLIGHTS_FIELD
+)
+# Rate limiter dùng chung cho mọi lời gọi Groq
+from groq_rate_limiter import groq_rate_limiter
+# Cookies / giới hạn download đồng thời dùng chung cho yt-dlp
+# Fetch phụ đề qua pool YoutubeDL "ấm" (cookies, giới hạn đồng thời theo host, thư mục shard) dùng chung
+from youtube_download import youtube_video_id
+from subtitle_fetcher import subtitle_fetcher
+from subtitle_parser import chunk_subtitle_lines
+from text_chunker import chunk_text, model_token_budget
 
 # Import Groq for article  generation
 try:
@@ -24,10 +32,22 @@ except ImportError:
     GROQ_AVAILABLE = False
     logging.warning("Groq library not available. Article generation will be disabled.")
 
-main = Blueprint('main', __name__)
+from app import get_mongo, get_mongo_pool_stats
+from app.job_queue import (
+    article_job_queue, video_pipeline_queue, job_queues, JobProgress, PermanentJobError,
+    JOB_STATUSES
+)
+from app.team_names import team_name_store, extract_teams_from_requests, parse_groq_teams, groq_team_name_list
+from app.channel_poller import channel_poller
+from app.chunk_store import replace_srt_chunks, delete_srt
+from app.subtitle_store import subtitle_store
+from app.youtube_sync import (
+    crawl_channel_videos, refresh_video_stats, is_backfill_complete, YouTubeConfigError,
+    SYNC_MODES, SYNC_MODE_FULL, SYNC_MODE_INCREMENTAL
+)
+from app.article_search import search_related_articles, apply_article_search, build_text_search, TEXT_SCORE
 
-def get_mongo():
-    return PyMongo(current_app)
+main = Blueprint('main', __name__)
 
 # Groq API helper functions
 def get_groq_client():
@@ -78,8 +98,6 @@ def query_related_articles(team_names):
     Query các bài báo liên quan đến đội bóng trong 4h gần đây
     """
     try:
-        from app import mongo
-        
         if not team_names:
             logging.warning("⚠️ No team names provided for article query")
             return []
@@ -90,33 +108,10 @@ def query_related_articles(team_names):
         
         logging.info(f"📅 Querying articles from: {cutoff_time} (last 4 hours)")
         
-        # Tạo regex pattern để tìm kiếm team names trong content
-        # Escape special regex characters và tạo case-insensitive pattern
-        import re
-        team_patterns = []
-        for team_name in team_names:
-            # Escape special regex characters
-            escaped_name = re.escape(team_name)
-            team_patterns.append(escaped_name)
-        
-        # Combine patterns với OR operator
-        combined_pattern = "|".join(team_patterns)
-        
-        logging.info(f"🔍 Search pattern: {combined_pattern}")
-        
-        # Query articles với regex pattern và time filter
-        query = {
-            'content': {
-                '$regex': combined_pattern,
-                '$options': 'i'  # Case insensitive
-            },
-            'created_at': {
-                '$gte': cutoff_time
-            }
-        }
+        logging.info(f"🔍 Text search terms: {build_text_search(team_names)}")
         
-        # Sort by created_at descending (gần đây nhất trước) - Giới hạn 6 bài viết
-        articles = list(mongo.db.articles.find(query).sort('created_at', -1).limit(6))
+        # Text index trên articles: xếp hạng theo textScore, lọc 4h gần đây - Giới hạn 6 bài viết
+        articles = search_related_articles(team_names, cutoff_time, limit=6)
         
         logging.info(f"📰 Found {len(articles)} related articles (last 4 hours)")
         
@@ -204,75 +199,48 @@ def extract_team_names_with_groq(articles_data):
         # Prompt để xác định tên đội bóng
         prompt = (
             "Based on the provided match data, identify the two teams playing in this match. "
-            "Return ONLY a comma-separated list of team names and their possible variations. "
-            "Include official names, common names, and abbreviations. "
-            "Format: Team1, Team1_abbrev, Team1_common, Team2, Team2_abbrev, Team2_common\n\n"
-            "Example: Chelsea, CHE, Blues, Liverpool, LIV, Reds\n\n"
+            "Return ONLY a JSON object with the home team and the away team, each a list that starts with "
+            "the official name followed by its common names and abbreviations.\n\n"
+            'Example: {"home": ["Chelsea", "CHE", "Blues"], "away": ["Liverpool", "LIV", "Reds"]}\n\n'
             f"Match Data:\n{combined_articles}"
         )
         
         logging.info("🔍 Extracting team names with Groq...")
         logging.info(f"📄 Input length: {len(combined_articles)} characters")
         
-        # Call Groq API với retry logic
-        max_retries = 3
-        base_delay = 5  # 5 seconds base delay
-        
-        for attempt in range(max_retries):
-            try:
-                logging.info(f"🔄 Attempt {attempt + 1}/{max_retries} to extract team names")
-                
-                response = client.chat.completions.create(
-                    model="llama-3.1-8b-instant",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    max_tokens=200,
-                    temperature=0.1
-                )
-                
-                # Nếu thành công, break khỏi retry loop
-                break
-                
-            except Exception as e:
-                error_str = str(e)
-                
-                # Kiểm tra nếu là rate limit error
-                if "rate_limit_exceeded" in error_str or "429" in error_str:
-                    if attempt < max_retries - 1:  # Chưa phải lần thử cuối
-                        # Tính delay time với exponential backoff
-                        delay = base_delay * (2 ** attempt)
-                        
-                        # Extract wait time từ error message nếu có
-                        wait_match = re.search(r'Please try again in (\d+\.?\d*)s', error_str)
-                        if wait_match:
-                            delay = float(wait_match.group(1)) + 2  # Thêm 2s buffer
-                        
-                        logging.warning(f"⚠️ Rate limit hit for team extraction, waiting {delay}s before retry {attempt + 2}/{max_retries}")
-                        time.sleep(delay)
-                        continue
-                    else:
-                        # Lần thử cuối cùng thất bại
-                        logging.error(f"❌ All retry attempts failed for team extraction due to rate limit")
-                        raise e
-                else:
-                    # Không phải rate limit error, raise ngay
-                    raise e
+        # Call Groq API qua rate limiter chung (admission theo RPM/TPM, tự retry khi 429)
+        response = groq_rate_limiter.chat_completion(
+            client,
+            estimate_tokens(prompt),
+            model="llama-3.1-8b-instant",
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            max_tokens=200,
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        )
         
         team_names_text = response.choices[0].message.content.strip()
         
         logging.info(f"🏆 Groq team names response length: {len(team_names_text)} characters")
         
-        # Parse team names
-        team_names = [name.strip() for name in team_names_text.split(',') if name.strip()]
+        # Parse team names: {home: [...], away: [...]}; không đúng dạng thì tách theo dấu phẩy, không gán được cho đội nào
+        teams = parse_groq_teams(team_names_text)
+        if teams:
+            team_names = [name for team in teams for name in [team['name']] + team['aliases']]
+        else:
+            logging.warning("⚠️ Groq team names are not a {home, away} object, aliases will not be learned")
+            team_names = groq_team_name_list(team_names_text)
         
         logging.info(f"🏆 Extracted {len(team_names)} team name variations: {team_names}")
         
         return {
             'success': True,
+            'teams': teams,
             'team_names': team_names,
             'raw_response': team_names_text
         }
@@ -285,15 +253,79 @@ def extract_team_names_with_groq(articles_data):
             'team_names': []
         }
 
+def resolve_team_names(fixture_id, related_requests, articles_data):
+    """
+    Xác định tên đội bóng: cache theo fixture_id -> dữ liệu có cấu trúc của trận đấu -> Groq (fallback)
+    """
+    cached = team_name_store.get_cached(fixture_id)
+    if cached and cached.get('team_names'):
+        logging.info(f"♻️ Using cached team names for fixture_id {fixture_id}: {cached['team_names']}")
+        return {'success': True, 'team_names': cached['team_names'], 'source': 'cache'}
+
+    teams = extract_teams_from_requests(related_requests)
+    source = 'match_data'
+    raw_response = ''
+    if teams:
+        logging.info(f"📋 Team names found in match data: {[team['name'] for team in teams]}")
+    else:
+        logging.info(f"🤖 No structured team names, falling back to Groq")
+        groq_result = extract_team_names_with_groq(articles_data)
+        if not groq_result['success']:
+            return groq_result
+        source = 'groq'
+        raw_response = groq_result.get('raw_response', '')
+        teams = groq_result.get('teams') or []
+        if not teams:
+            # Không xác định được tên nào thuộc đội nào: dùng nguyên danh sách Groq trả về, không học alias
+            team_names = groq_result['team_names']
+            if team_names:
+                team_name_store.cache(fixture_id, [], team_names, source)
+            return {'success': True, 'team_names': team_names, 'source': source, 'raw_response': raw_response}
+
+    team_name_store.learn(teams, source)
+    team_names = team_name_store.expand(teams)
+    team_name_store.cache(fixture_id, teams, team_names, source)
+    return {'success': True, 'team_names': team_names, 'source': source, 'raw_response': raw_response}
+
+def load_related_requests(fixture_id, limit=50):
+    """
+    Lấy các requests cùng fixture_id (trừ event_match_end) làm dữ liệu nguồn cho bài viết
+    """
+    mongo = get_mongo()
+    return list(mongo.db.requests.find({
+        'fixture_id': fixture_id,
+        'type': {'$ne': 'event_match_end'}  # Loại trừ chính request này
+    }).limit(limit))
+
+def run_match_article_job(job):
+    """
+    Handler của job queue 'article_generation' cho job type 'match_article'
+    """
+    payload = job['payload']
+    fixture_id = payload['fixture_id']
+    request_id = payload['request_id']
+
+    mongo = get_mongo()
+    request_doc = mongo.db.requests.find_one({'_id': ObjectId(request_id)}, {'article_generated': 1, 'generated_article_id': 1})
+    if request_doc and request_doc.get('article_generated'):
+        # Job được chạy lại sau khi bài viết đã lưu thành công (worker chết trước khi ack)
+        logging.info(f"♻️ Article already generated for request {request_id}, skipping")
+        return {'generated_article_id': request_doc.get('generated_article_id'), 'skipped': True}
+
+    related_requests = load_related_requests(fixture_id)
+    logging.info(f"📊 Found {len(related_requests)} related requests for fixture_id: {fixture_id}")
+    return process_article_generation_async(fixture_id, related_requests, request_id)
+
 def process_article_generation_async(fixture_id, related_requests, request_id):
     """
-    Xử lý tạo bài viết trong thread riêng với delay 4h
+    Xử lý tạo bài viết trong worker của job queue.
+    Raise exception khi thất bại để job queue retry với backoff.
     """
     try:
-        # Import mongo trong thread để tránh lỗi
-        from app import mongo
+        # Dùng client MongoDB chung của process
+        mongo = get_mongo()
         logging.info(f"🚀 Starting async article generation for fixture_id: {fixture_id}")
-        logging.info(f"📋 Thread ID: {threading.current_thread().ident}")
+        logging.info(f"📋 Thread: {threading.current_thread().name}")
         logging.info(f"⏰ Waiting 4 hours before processing...")
         
         # Delay 4 hours (4 * 60 * 60 = 14400 seconds)
@@ -358,18 +390,18 @@ def process_article_generation_async(fixture_id, related_requests, request_id):
         
         if not articles_data:
             logging.warning(f"⚠️ No articles data found for fixture_id: {fixture_id}")
-            return
+            return None
         
         if articles_data:
             # Bước 1: Xác định tên các đội bóng trước
             logging.info(f"🏆 Step 1: Extracting team names for fixture_id: {fixture_id}")
             try:
-                team_names_result = extract_team_names_with_groq(articles_data)
+                team_names_result = resolve_team_names(fixture_id, related_requests, articles_data)
                 logging.info(f"✅ Team names extraction completed: {team_names_result}")
             except Exception as e:
                 logging.error(f"❌ Error in team names extraction: {str(e)}")
                 logging.error(f"📋 Traceback: {traceback.format_exc()}")
-                return
+                raise
             
             if team_names_result['success']:
                 team_names = team_names_result['team_names']
@@ -386,7 +418,7 @@ def process_article_generation_async(fixture_id, related_requests, request_id):
             except Exception as e:
                 logging.error(f"❌ Error in related articles query: {str(e)}")
                 logging.error(f"📋 Traceback: {traceback.format_exc()}")
-                return
+                raise
             
             # Bước 3: Kết hợp dữ liệu trận đấu và bài báo liên quan
             logging.info(f"🔄 Step 3: Combining match data and related articles")
@@ -396,7 +428,7 @@ def process_article_generation_async(fixture_id, related_requests, request_id):
             except Exception as e:
                 logging.error(f"❌ Error in data combination: {str(e)}")
                 logging.error(f"📋 Traceback: {traceback.format_exc()}")
-                return
+                raise
             
             # Bước 4: Tạo bài viết phân tích
             logging.info(f"🤖 Step 4: Generating analysis article for fixture_id: {fixture_id}")
@@ -410,7 +442,7 @@ def process_article_generation_async(fixture_id, related_requests, request_id):
             except Exception as e:
                 logging.error(f"❌ Error in Groq article generation: {str(e)}")
                 logging.error(f"📋 Traceback: {traceback.format_exc()}")
-                return
+                raise
             
             if groq_result['success']:
                 # Lưu bài báo đã generate vào collection generated_articles
@@ -422,6 +454,7 @@ def process_article_generation_async(fixture_id, related_requests, request_id):
                     'related_articles_count': len(related_articles),
                     'team_names': team_names,  # Danh sách tên đội bóng
                     'team_names_raw': team_names_result.get('raw_response', ''),  # Raw response từ Groq
+                    'team_names_source': team_names_result.get('source', 'groq'),  # cache / match_data / groq
                     'related_articles_ids': [str(article.get('_id', '')) for article in related_articles],  # IDs của related articles
                     'related_articles_links': [article.get('url', '') for article in related_articles if article.get('url')],  # Links gốc của related articles
                     'related_articles_details': [  # Chi tiết đầy đủ của related articles
@@ -455,6 +488,7 @@ def process_article_generation_async(fixture_id, related_requests, request_id):
                         '$set': {
                             'generated_article_id': str(article_result.inserted_id),
                             'article_generated': True,
+                            'article_generation_status': 'completed',
                             'article_generated_at': datetime.utcnow()
                         }
                     }
@@ -482,6 +516,8 @@ def process_article_generation_async(fixture_id, related_requests, request_id):
                 except Exception as e:
                     logging.error(f"❌ Error posting article: {str(e)}")
                     logging.error(f"📋 Traceback: {traceback.format_exc()}")
+
+                return {'generated_article_id': str(article_result.inserted_id)}
             else:
                 logging.error(f"❌ Failed to generate article: {groq_result.get('error', 'Unknown error')}")
                 
@@ -491,11 +527,13 @@ def process_article_generation_async(fixture_id, related_requests, request_id):
                     {
                         '$set': {
                             'article_generated': False,
+                            'article_generation_status': 'failed',
                             'generation_error': groq_result.get('error', 'Unknown error'),
                             'generation_failed_at': datetime.utcnow()
                         }
                     }
                 )
+                raise Exception(f"Article generation failed: {groq_result.get('error', 'Unknown error')}")
         else:
             logging.warning(f"⚠️ No articles data found for fixture_id: {fixture_id}")
             
@@ -505,6 +543,7 @@ def process_article_generation_async(fixture_id, related_requests, request_id):
                 {
                     '$set': {
                         'article_generated': False,
+                        'article_generation_status': 'failed',
                         'generation_error': 'No articles data found',
                         'generation_failed_at': datetime.utcnow()
                     }
@@ -522,6 +561,7 @@ def process_article_generation_async(fixture_id, related_requests, request_id):
                 {
                     '$set': {
                         'article_generated': False,
+                        'article_generation_status': 'failed',
                         'generation_error': str(e),
                         'generation_failed_at': datetime.utcnow()
                     }
@@ -529,6 +569,9 @@ def process_article_generation_async(fixture_id, related_requests, request_id):
             )
         except Exception as update_error:
             logging.error(f"❌ Failed to update request with error: {str(update_error)}")
+        raise
+
+article_job_queue.register_handler('match_article', run_match_article_job)
 
 def extract_optimized_match_data(articles_data):
     """
@@ -771,48 +814,14 @@ def generate_article_with_groq(articles_data):
         logging.info(f"📝 Prompt tokens: {prompt_tokens}")
         logging.info(f"📏 Total input tokens: {final_tokens + prompt_tokens}")
 
-        # Retry logic với exponential backoff cho rate limit
-        max_retries = 3
-        base_delay = 10  # 10 seconds base delay
-        
-        for attempt in range(max_retries):
-            try:
-                logging.info(f"🔄 Attempt {attempt + 1}/{max_retries} to call Groq API")
-
-                response = client.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt}],
-                    model="groq/compound",
-                    max_tokens=MAX_OUTPUT_TOKENS,
-                )
-                
-                # Nếu thành công, break khỏi retry loop
-                break
-                
-            except Exception as e:
-                error_str = str(e)
-                
-                # Kiểm tra nếu là rate limit error
-                if "rate_limit_exceeded" in error_str or "429" in error_str:
-                    if attempt < max_retries - 1:  # Chưa phải lần thử cuối
-                        # Tính delay time với exponential backoff
-                        delay = base_delay * (2 ** attempt)
-                        
-                        # Extract wait time từ error message nếu có
-                        import re
-                        wait_match = re.search(r'Please try again in (\d+\.?\d*)s', error_str)
-                        if wait_match:
-                            delay = float(wait_match.group(1)) + 5  # Thêm 5s buffer
-                        
-                        logging.warning(f"⚠️ Rate limit hit, waiting {delay}s before retry {attempt + 2}/{max_retries}")
-                        time.sleep(delay)
-                        continue
-                    else:
-                        # Lần thử cuối cùng thất bại
-                        logging.error(f"❌ All retry attempts failed due to rate limit")
-                        raise e
-                else:
-                    # Không phải rate limit error, raise ngay
-                    raise e
+        # Gọi Groq qua rate limiter chung: chờ tới khi đủ quota token thay vì retry mù
+        response = groq_rate_limiter.chat_completion(
+            client,
+            prompt_tokens,
+            messages=[{"role": "user", "content": prompt}],
+            model="groq/compound",
+            max_tokens=MAX_OUTPUT_TOKENS,
+        )
 
         generated_text = response.choices[0].message.content.strip()
         final_output = extract_final_think_output(generated_text)
@@ -1109,23 +1118,30 @@ def get_articles():
         if selected_type != 'all':
             query['source'] = selected_type
         
-        # Add search filter
-        if search_query:
-            query['$or'] = [
-                {'title': {'$regex': search_query, '$options': 'i'}},
-                {'content': {'$regex': search_query, '$options': 'i'}},
-                {'summary': {'$regex': search_query, '$options': 'i'}}
-            ]
-        
         # Calculate skip for pagination
         skip = (page - 1) * per_page
         
-        # Get total count for pagination info
-        total_count = mongo.db.articles.count_documents(query)
-        
-        # Query articles with filters, pagination, sorted by newest first
-        articles_cursor = mongo.db.articles.find(query).sort('created_at', -1).skip(skip).limit(per_page)
-        articles = list(articles_cursor)
+        if search_query:
+            # Search qua text index (title / content / summary), sắp xếp theo độ liên quan
+            try:
+                text_query = apply_article_search(dict(query), search_query)
+                total_count = mongo.db.articles.count_documents(text_query)
+                articles_cursor = mongo.db.articles.find(text_query, {'score': TEXT_SCORE}).sort(
+                    [('score', TEXT_SCORE), ('created_at', -1)]
+                ).skip(skip).limit(per_page)
+                articles = list(articles_cursor)
+            except OperationFailure as e:
+                logging.warning(f"⚠️ Text search unavailable, falling back to regex: {str(e)}")
+                regex_query = apply_article_search(dict(query), search_query, use_text=False)
+                total_count = mongo.db.articles.count_documents(regex_query)
+                articles = list(mongo.db.articles.find(regex_query).sort('created_at', -1).skip(skip).limit(per_page))
+        else:
+            # Get total count for pagination info
+            total_count = mongo.db.articles.count_documents(query)
+            
+            # Query articles with filters, pagination, sorted by newest first
+            articles_cursor = mongo.db.articles.find(query).sort('created_at', -1).skip(skip).limit(per_page)
+            articles = list(articles_cursor)
         
         # Get unique types for the dropdown
         unique_types = mongo.db.articles.distinct('source')
@@ -1755,140 +1771,209 @@ def crawl_videos():
                 'error': 'Channel ID is required'
             }), 400
         
-        # YouTube API configuration
-        API_KEY = os.getenv('YOUTUBE_API_KEY')
-        if not API_KEY:
+        # max_videos: số video tối đa cần duyệt (0 = toàn bộ uploads playlist)
+        max_videos = data.get('max_videos')
+        # mode: 'full' duyệt tới max_videos, 'incremental' dừng khi gặp video đã biết (watermark + ETag)
+        mode = data.get('mode', SYNC_MODE_FULL)
+        if mode not in SYNC_MODES:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid mode. Must be one of: {SYNC_MODES}'
+            }), 400
+        
+        try:
+            result = crawl_channel_videos(channel_id, int(max_videos) if max_videos is not None else None, mode=mode)
+        except YouTubeConfigError as e:
             return jsonify({
                 'success': False,
-                'error': 'YouTube API key not configured. Please set YOUTUBE_API_KEY environment variable.'
+                'error': str(e)
             }), 500
+        except LookupError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': f"Successfully crawled {result['crawled_count']} new videos",
+            'crawled_count': result['crawled_count'],
+            'total_found': result['total_found'],
+            'api_calls': result['api_calls'],
+            'mode': result['mode'],
+            'not_modified': result['not_modified']
+        }), 200
+        
+    except Exception as e:
+        log_exception("crawl_videos", e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@main.route('/api/videos/refresh-stats', methods=['POST'])
+def refresh_videos_stats():
+    """
+    Cập nhật view_count / like_count cho các video gần đây (mặc định YOUTUBE_STATS_REFRESH_DAYS ngày).
+    Body (tùy chọn): channel_id, days, limit
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        days = data.get('days')
+        limit = data.get('limit')
         
         try:
-            from googleapiclient.discovery import build
-            youtube = build('youtube', 'v3', developerKey=API_KEY)
-        except ImportError as e:
+            result = refresh_video_stats(
+                channel_id=data.get('channel_id'),
+                days=int(days) if days is not None else None,
+                limit=int(limit) if limit is not None else None
+            )
+        except YouTubeConfigError as e:
             return jsonify({
                 'success': False,
-                'error': f'Google API client not installed: {str(e)}'
+                'error': str(e)
             }), 500
         
-        mongo = get_mongo()
+        return jsonify({
+            'success': True,
+            'message': f"Updated stats for {result['updated_count']} videos",
+            **result
+        }), 200
         
-        # Get channel's uploads playlist
-        channel_request = youtube.channels().list(
-            part='contentDetails',
-            id=channel_id
-        )
-        channel_response = channel_request.execute()
+    except Exception as e:
+        log_exception("refresh_videos_stats", e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@main.route('/api/channels/<channel_id>/crawl-all', methods=['POST'])
+def crawl_all_channel_videos(channel_id):
+    """
+    Crawl danh sách video của channel rồi đưa mọi video chưa có SRT vào video_pipeline_queue.
+    channel_id: _id trong youtube_channels hoặc YouTube channel_id.
+    Body (tùy chọn): refresh_videos (mặc định true), mode (mặc định full cho tới khi channel đã được duyệt
+    hết playlist một lần, sau đó incremental), max_videos (0 = cả playlist), force (xử lý lại cả video đã có SRT), limit
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        refresh_videos = data.get('refresh_videos', True)
+        force = bool(data.get('force', False))
+        limit = int(data.get('limit', 0))
+        
+        mongo = get_mongo()
         
-        if 'items' not in channel_response or not channel_response['items']:
+        channel = None
+        if ObjectId.is_valid(channel_id):
+            channel = mongo.db.youtube_channels.find_one({'_id': ObjectId(channel_id)})
+        if not channel:
+            channel = mongo.db.youtube_channels.find_one({'channel_id': channel_id})
+        if not channel:
             return jsonify({
                 'success': False,
-                'error': 'Channel not found'
+                'error': 'YouTube channel not found'
             }), 404
         
-        playlist_id = channel_response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+        youtube_channel_id = channel['channel_id']
         
-        # Get latest 10 videos
-        videos = []
-        next_page_token = None
-        max_results = 10
+        # BƯỚC 1: cập nhật danh sách video từ YouTube (lỗi ở bước này không chặn việc xử lý video đã có)
+        videos_crawl = None
+        warnings = []
+        if refresh_videos:
+            try:
+                # Channel chưa từng được duyệt hết playlist (vd. chỉ "Crawl 10 latest"): duyệt full toàn bộ playlist,
+                # sau đó incremental dừng ở video đã biết
+                default_mode = SYNC_MODE_INCREMENTAL if is_backfill_complete(youtube_channel_id) else SYNC_MODE_FULL
+                videos_crawl = crawl_channel_videos(
+                    youtube_channel_id,
+                    int(data.get('max_videos', 0)),
+                    mode=data.get('mode', default_mode)
+                )
+                if not videos_crawl['backfill_complete']:
+                    warnings.append("Video list is incomplete: the uploads playlist has not been crawled to the end yet")
+            except (YouTubeConfigError, LookupError, ValueError) as e:
+                warnings.append(f"Video list not refreshed: {str(e)}")
+        
+        # BƯỚC 2: chọn video cần xử lý, bỏ qua video đã có SRT (srt_status = 1) hoặc không có phụ đề (-1)
+        query = {'channel_id': youtube_channel_id}
+        if not force:
+            query['srt_status'] = {'$nin': [1, -1]}
+        cursor = mongo.db.videos.find(query, {'_id': 1}).sort('published_at', -1)
+        if limit > 0:
+            cursor = cursor.limit(limit)
+        
+        skipped_processed = 0 if force else mongo.db.videos.count_documents({
+            'channel_id': youtube_channel_id,
+            'srt_status': 1
+        })
         
-        while len(videos) < max_results:
-            playlist_request = youtube.playlistItems().list(
-                part='snippet',
-                playlistId=playlist_id,
-                maxResults=min(50, max_results - len(videos)),
-                pageToken=next_page_token
+        # BƯỚC 3: fan-out mỗi video thành một job; worker pool + giới hạn theo host quyết định độ song song
+        batch_id = uuid.uuid4().hex
+        job_ids = []
+        for video in cursor:
+            job_id = video_pipeline_queue.enqueue(
+                'crawl_and_chunk_video',
+                {'video_id': str(video['_id']), 'batch_id': batch_id},
+                dedupe_key=f"crawl_and_chunk_video:{video['_id']}"
             )
-            playlist_response = playlist_request.execute()
-            
-            for item in playlist_response['items']:
-                if len(videos) >= max_results:
-                    break
-                    
-                video_title = item['snippet']['title']
-                video_id = item['snippet']['resourceId']['videoId']
-                video_url = f'https://www.youtube.com/watch?v={video_id}'
-                published_at = item['snippet']['publishedAt']
-                description = item['snippet'].get('description', '')
-                thumbnail_url = item['snippet']['thumbnails'].get('high', {}).get('url', '')
-                
-                # Get additional video details
-                try:
-                    video_request = youtube.videos().list(
-                        part='statistics,contentDetails',
-                        id=video_id
-                    )
-                    video_response = video_request.execute()
-                    
-                    if video_response['items']:
-                        video_data = video_response['items'][0]
-                        view_count = int(video_data['statistics'].get('viewCount', 0))
-                        like_count = int(video_data['statistics'].get('likeCount', 0))
-                        duration = video_data['contentDetails'].get('duration', '')
-                    else:
-                        view_count = 0
-                        like_count = 0
-                        duration = ''
-                except:
-                    view_count = 0
-                    like_count = 0
-                    duration = ''
-                
-                videos.append({
-                    'title': video_title,
-                    'url': video_url,
-                    'video_id': video_id,
-                    'description': description,
-                    'thumbnail_url': thumbnail_url,
-                    'view_count': view_count,
-                    'like_count': like_count,
-                    'duration': duration,
-                    'published_at': datetime.fromisoformat(published_at.replace('Z', '+00:00'))
-                })
-            
-            next_page_token = playlist_response.get('nextPageToken')
-            if not next_page_token:
-                break
+            job_ids.append(str(job_id))
         
-        # Save videos to database
-        crawled_count = 0
-        for video_data in videos:
-            # Check if video already exists
-            existing_video = mongo.db.videos.find_one({'url': video_data['url']})
-            if existing_video:
-                continue
-            
-            # Create video document
-            video_doc = {
-                'url': video_data['url'],
-                'channel_id': channel_id,
-                'title': video_data['title'],
-                'description': video_data['description'],
-                'video_id': video_data['video_id'],
-                'thumbnail_url': video_data['thumbnail_url'],
-                'duration': video_data['duration'],
-                'view_count': video_data['view_count'],
-                'like_count': video_data['like_count'],
-                'published_at': video_data['published_at'],
-                'status': 0,  # pending
-                'created_at': datetime.utcnow(),
-                'updated_at': datetime.utcnow()
-            }
-            
-            mongo.db.videos.insert_one(video_doc)
-            crawled_count += 1
+        logging.info(f"📦 Channel {youtube_channel_id}: queued {len(job_ids)} videos (batch {batch_id}), skipped {skipped_processed} processed")
         
         return jsonify({
             'success': True,
-            'message': f'Successfully crawled {crawled_count} new videos',
-            'crawled_count': crawled_count,
-            'total_found': len(videos)
-        }), 200
+            'message': f'Queued {len(job_ids)} videos for crawl & chunk',
+            'channel_id': youtube_channel_id,
+            'batch_id': batch_id,
+            'queued_count': len(job_ids),
+            'skipped_processed': skipped_processed,
+            'job_ids': job_ids,
+            'jobs_url': f"/api/jobs?batch_id={batch_id}",
+            'videos_crawl': videos_crawl,
+            'warnings': warnings
+        }), 202
         
     except Exception as e:
-        log_exception("crawl_videos", e)
+        log_exception("crawl_all_channel_videos", e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@main.route('/api/channels/poller', methods=['GET'])
+def channel_poller_status():
+    """
+    API trả về trạng thái channel poller (channel đang poll, lịch poll sắp tới, channel đang lỗi)
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'poller': serialize_document(channel_poller.stats())
+        }), 200
+    except Exception as e:
+        log_exception("channel_poller_status", e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@main.route('/api/channels/<channel_id>/poll-now', methods=['POST'])
+def poll_channel_now(channel_id):
+    """
+    Đưa channel lên đầu lịch poll (reset backoff); poller sẽ nhận ở lượt kế tiếp
+    """
+    try:
+        if not channel_poller.poll_now(channel_id):
+            return jsonify({
+                'success': False,
+                'error': 'YouTube channel not found'
+            }), 404
+        return jsonify({
+            'success': True,
+            'message': 'Channel scheduled for the next poll'
+        }), 200
+    except Exception as e:
+        log_exception("poll_channel_now", e)
         return jsonify({
             'success': False,
             'error': str(e)
@@ -1904,6 +1989,7 @@ def health_check():
         return jsonify({
             'status': 'healthy',
             'database': 'connected',
+            'mongo_pool': get_mongo_pool_stats()['stats'],
             'timestamp': datetime.utcnow().isoformat()
         }), 200
     except Exception as e:
@@ -1914,76 +2000,106 @@ def health_check():
             'timestamp': datetime.utcnow().isoformat()
         }), 500
 
+# Groq rate limiter stats
+@main.route('/api/groq/rate-limits', methods=['GET'])
+def groq_rate_limits():
+    """
+    API trả về trạng thái rate limiter Groq (quota học được từ headers, số caller đang chờ)
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'data': groq_rate_limiter.stats()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# Subtitle fetcher stats
+@main.route('/api/subtitles/fetcher', methods=['GET'])
+def subtitle_fetcher_stats():
+    """
+    API trả về trạng thái pool fetch phụ đề (số instance YoutubeDL đã tạo, thời gian fetch trung bình, slot download)
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'data': subtitle_fetcher.stats()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# MongoDB connection pool stats
+@main.route('/api/mongo/pool-stats', methods=['GET'])
+def mongo_pool_stats():
+    """
+    API trả về cấu hình và thống kê connection pool MongoDB của worker process hiện tại
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'data': get_mongo_pool_stats()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # ==============================================================================
 # SRT PROCESSING FUNCTIONS
 # ==============================================================================
 
-def process_srt_file(srt_file_path: str, max_words: int = 350) -> List[Dict[str, Any]]:
+# Bỏ phần chữ lặp lại giữa các cue liên tiếp của auto-caption YouTube trước khi chunk
+SRT_DEDUPE_ROLLING = os.getenv('SRT_DEDUPE_ROLLING', 'true').lower() in ('1', 'true', 'yes')
+
+# Chunk theo câu với budget token của model embedding (0 = dùng toàn bộ cửa sổ của model)
+CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', 0))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', 32))
+# Chunk SRT được index vào video_chunks (cửa sổ nhỏ nhất); index_chunks ghép thêm title + channel vào text
+SRT_CHUNK_EMBEDDING_KEY = 'video_chunks'
+SRT_CHUNK_RESERVED_TOKENS = int(os.getenv('SRT_CHUNK_RESERVED_TOKENS', 32))
+
+def process_srt_file(srt_doc: Dict[str, Any], dedupe_stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
     """
-    Đọc file SRT và chia thành các chunk với giới hạn số từ
+    Đọc phụ đề của srt_files document (blob nén trong subtitle store, hoặc srt_file_path với bản ghi cũ)
+    theo từng cue (streaming) và chia theo câu thành các chunk vừa cửa sổ token của model.
+    dedupe_stats (nếu truyền vào) nhận số từ trước/sau khi bỏ caption lặp và reduction_ratio.
     """
+    # Budget theo tokenizer của model sẽ embed ngôn ngữ này (model đa ngôn ngữ cho phụ đề không phải tiếng Anh)
+    embedding_key = embedding_service.key_for_language(SRT_CHUNK_EMBEDDING_KEY, srt_doc.get('language'))
+    count_tokens, max_tokens = model_token_budget(embedding_key, SRT_CHUNK_RESERVED_TOKENS, CHUNK_MAX_TOKENS)
+    is_vtt = (srt_doc.get('subtitle_format') or (srt_doc.get('srt_filename') or '').rsplit('.', 1)[-1]).lower() == 'vtt'
     try:
-        subs = pysrt.open(srt_file_path, encoding='utf-8')
+        with subtitle_store.open_text(srt_doc) as lines:
+            return chunk_subtitle_lines(
+                lines, max_tokens, CHUNK_OVERLAP_TOKENS, count_tokens,
+                dedupe=SRT_DEDUPE_ROLLING, stats=dedupe_stats, is_vtt=is_vtt
+            )
     except Exception as e:
-        logging.error(f"Lỗi khi đọc file {srt_file_path}: {e}")
+        logging.error(f"Lỗi khi đọc phụ đề {srt_doc.get('blob_key') or srt_doc.get('srt_file_path')}: {e}")
         return []
 
-    chunks_data: List[Dict[str, Any]] = []
-    current_chunk_captions: List[pysrt.SubRipItem] = []
-    current_word_count = 0
-
-    # Logic chunking thông minh
-    for caption in subs:
-        caption_text = caption.text.replace('\n', ' ')
-        caption_word_count = len(caption_text.split())
-
-        # Trường hợp đặc biệt: một caption dài hơn giới hạn
-        if caption_word_count > max_words:
-            if current_chunk_captions:
-                # Hoàn thành chunk hiện tại trước
-                full_chunk_text = " ".join([c.text.replace('\n', ' ') for c in current_chunk_captions])
-                start_time = str(current_chunk_captions[0].start)
-                chunks_data.append({'text': full_chunk_text, 'time': start_time})
-                current_chunk_captions = []
-                current_word_count = 0
-
-            # Chia nhỏ caption quá dài
-            words = caption_text.split()
-            for i in range(0, len(words), max_words):
-                sub_chunk_words = words[i : i + max_words]
-                chunks_data.append({'text': " ".join(sub_chunk_words), 'time': str(caption.start)})
-            continue
-
-        # Nếu thêm caption này sẽ vượt quá giới hạn -> hoàn thành chunk hiện tại
-        if current_word_count + caption_word_count > max_words and current_chunk_captions:
-            full_chunk_text = " ".join([c.text.replace('\n', ' ') for c in current_chunk_captions])
-            start_time = str(current_chunk_captions[0].start)
-            chunks_data.append({'text': full_chunk_text, 'time': start_time})
-            
-            # Bắt đầu chunk mới với caption hiện tại
-            current_chunk_captions = [caption]
-            current_word_count = caption_word_count
-        else:
-            # Tiếp tục thêm vào chunk hiện tại
-            current_chunk_captions.append(caption)
-            current_word_count += caption_word_count
-
-    # Đừng quên chunk cuối cùng
-    if current_chunk_captions:
-        full_chunk_text = " ".join([c.text.replace('\n', ' ') for c in current_chunk_captions])
-        start_time = str(current_chunk_captions[0].start)
-        chunks_data.append({'text': full_chunk_text, 'time': start_time})
-
-    return chunks_data
-
-def generate_unique_filename(video_url: str, extension: str = 'srt') -> str:
+def store_subtitle(video_url: str, subtitle: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Tạo tên file unique dựa trên video URL
+    Đưa file phụ đề vừa download vào subtitle store (content-addressed, nén) và trả về
+    các field lưu trên srt_files document.
     """
-    # Extract video ID from URL
-    video_id = video_url.split('v=')[-1].split('&')[0] if 'v=' in video_url else str(uuid.uuid4())
-    unique_id = str(uuid.uuid4())[:8]
-    return f"{video_id}_{unique_id}.{extension}"
+    video_key = youtube_video_id(video_url) or subtitle['filename'].split('_', 1)[0]
+    stored = subtitle_store.store_file(video_key, subtitle['path'])
+    return {
+        'srt_file_path': subtitle['path'] if subtitle_store.keep_raw else None,
+        'srt_filename': subtitle['filename'],
+        'language': subtitle.get('language'),
+        'subtitle_track': subtitle.get('track'),
+        'subtitle_source': subtitle.get('source'),
+        **stored
+    }
 
 # ==============================================================================
 # CRAWL SRT API ENDPOINTS
@@ -2004,44 +2120,16 @@ def crawl_srt():
                 'error': 'Video URL is required'
             }), 400
         
-        # Tạo thư mục lưu trữ SRT nếu chưa tồn tại
-        srt_folder = 'srt_files'
-        if not os.path.exists(srt_folder):
-            os.makedirs(srt_folder)
-        
-        # Tạo tên file unique
-        srt_filename = generate_unique_filename(video_url)
-        srt_file_path = os.path.join(srt_folder, srt_filename)
-        
-        # Cấu hình yt-dlp để download subtitle
-        ydl_opts = {
-            'writesubtitles': True,
-            'writeautomaticsub': True,
-            'subtitleslangs': ['en'],  # Thử cả tiếng Anh và tiếng Việt
-            'subtitlesformat': 'srt',
-            'skip_download': True,
-            'outtmpl': srt_file_path.replace('.srt', '.%(ext)s'),
-        }
-        
         success = False
         error_message = ""
         
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_url])
-                
-                # Kiểm tra file đã được tạo
-                if os.path.exists(srt_file_path):
-                    success = True
-                else:
-                    # Thử tìm file với extension khác
-                    for ext in ['srt', 'vtt']:
-                        test_path = srt_file_path.replace('.srt', f'.{ext}')
-                        if os.path.exists(test_path):
-                            os.rename(test_path, srt_file_path)
-                            success = True
-                            break
-                            
+            subtitle = subtitle_fetcher.fetch(video_url)
+            if subtitle:
+                stored = store_subtitle(video_url, subtitle)
+                success = True
+            else:
+                error_message = 'No subtitles available for this video'
         except Exception as e:
             error_message = str(e)
             logging.error(f"Lỗi khi download subtitle: {e}")
@@ -2051,8 +2139,7 @@ def crawl_srt():
             mongo = get_mongo()
             srt_doc = {
                 'video_url': video_url,
-                'srt_file_path': srt_file_path,
-                'srt_filename': srt_filename,
+                **stored,
                 'status': 0,  # 0: pending processing
                 'created_at': datetime.utcnow(),
                 'updated_at': datetime.utcnow()
@@ -2064,8 +2151,10 @@ def crawl_srt():
                 'success': True,
                 'message': 'SRT file downloaded successfully',
                 'srt_id': str(result.inserted_id),
-                'srt_filename': srt_filename,
-                'srt_file_path': srt_file_path
+                'srt_filename': stored['srt_filename'],
+                'srt_file_path': stored['srt_file_path'],
+                'blob_key': stored['blob_key'],
+                'storage': stored['storage']
             }), 200
         else:
             return jsonify({
@@ -2104,17 +2193,16 @@ def process_srt():
                 'error': 'SRT file not found'
             }), 404
         
-        srt_file_path = srt_doc['srt_file_path']
-        
-        # Kiểm tra file tồn tại
-        if not os.path.exists(srt_file_path):
+        # Kiểm tra blob (hoặc file cũ trên đĩa) còn tồn tại
+        if not subtitle_store.is_available(srt_doc):
             return jsonify({
                 'success': False,
-                'error': 'SRT file not found on disk'
+                'error': 'SRT file not found in subtitle store'
             }), 404
         
-        # Xử lý file SRT
-        chunks_data = process_srt_file(srt_file_path)
+        # Xử lý file SRT (đọc stream trực tiếp từ store)
+        dedupe_stats = {}
+        chunks_data = process_srt_file(srt_doc, dedupe_stats=dedupe_stats)
         
         if not chunks_data:
             return jsonify({
@@ -2122,39 +2210,19 @@ def process_srt():
                 'error': 'No chunks extracted from SRT file'
             }), 500
         
-        # Lưu chunks vào MongoDB
-        chunks_docs = []
-        for i, chunk_info in enumerate(chunks_data):
-            chunk_doc = {
-                'srt_id': ObjectId(srt_id),
-                'video_url': srt_doc['video_url'],
-                'chunk_index': i,
-                'text': chunk_info['text'],
-                'time': chunk_info['time'],
-                'created_at': datetime.utcnow()
-            }
-            chunks_docs.append(chunk_doc)
-        
-        # Insert tất cả chunks
-        if chunks_docs:
-            mongo.db.srt_chunks.insert_many(chunks_docs)
-        
-        # Cập nhật status của SRT file
-        mongo.db.srt_files.update_one(
-            {'_id': ObjectId(srt_id)},
-            {
-                '$set': {
-                    'status': 1,  # 1: processed
-                    'chunks_count': len(chunks_data),
-                    'updated_at': datetime.utcnow()
-                }
-            }
+        # Thay toàn bộ chunks của SRT file và cập nhật status trong một lần ghi
+        replace_srt_chunks(
+            ObjectId(srt_id), srt_doc['video_url'], chunks_data,
+            video_id=srt_doc.get('video_id'),
+            extra_fields={'dedupe': dedupe_stats},
+            language=srt_doc.get('language')
         )
         
         return jsonify({
             'success': True,
             'message': f'Successfully processed SRT file with {len(chunks_data)} chunks',
             'chunks_count': len(chunks_data),
+            'dedupe': dedupe_stats,
             'chunks': chunks_data[:5]  # Trả về 5 chunks đầu để preview
         }), 200
         
@@ -2296,72 +2364,41 @@ def crawl_video_srt():
                 'srt_id': str(existing_srt['_id'])
             }), 400
         
-        # Tạo thư mục lưu trữ SRT nếu chưa tồn tại
-        srt_folder = 'srt_files'
-        if not os.path.exists(srt_folder):
-            os.makedirs(srt_folder)
-        
-        # Tạo tên file unique
-        srt_filename = generate_unique_filename(video_url)
-        srt_file_path = os.path.join(srt_folder, srt_filename)
-        
-        # Cấu hình yt-dlp để download subtitle
-        ydl_opts = {
-            'writesubtitles': True,
-            'writeautomaticsub': True,
-            'subtitleslangs': ['en'],  # Thử cả tiếng Anh và tiếng Việt
-            'subtitlesformat': 'srt',
-            'skip_download': True,
-            'outtmpl': srt_file_path.replace('.srt', '.%(ext)s'),
-        }
-        
         success = False
         error_message = ""
-        actual_srt_file = None
+        no_subtitles = False
         
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_url])
-                
-                # Tìm file SRT thực tế được tạo (yt-dlp có thể tạo tên khác)
-                actual_srt_file = None
-                
-                # Kiểm tra file với tên mong đợi trước
-                if os.path.exists(srt_file_path):
-                    actual_srt_file = srt_file_path
-                    success = True
-                else:
-                    # Extract video ID từ URL để tìm file
-                    video_id_from_url = video_url.split('v=')[-1].split('&')[0] if 'v=' in video_url else ''
-                    
-                    # Tìm tất cả file .srt trong thư mục
-                    for file in os.listdir(srt_folder):
-                        if file.endswith('.srt') and video_id_from_url in file:  # Video ID trong tên file
-                            actual_srt_file = os.path.join(srt_folder, file)
-                            success = True
-                            break
-                    
-                    # Nếu vẫn không tìm thấy, tìm file .srt mới nhất
-                    if not actual_srt_file:
-                        srt_files = [f for f in os.listdir(srt_folder) if f.endswith('.srt')]
-                        if srt_files:
-                            # Lấy file mới nhất
-                            latest_file = max(srt_files, key=lambda x: os.path.getctime(os.path.join(srt_folder, x)))
-                            actual_srt_file = os.path.join(srt_folder, latest_file)
-                            success = True
-                            
+            # Chỉ lấy metadata rồi tải đúng track phụ đề đã chọn, không quét thư mục srt_files
+            subtitle = subtitle_fetcher.fetch(video_url)
+            if subtitle:
+                stored = store_subtitle(video_url, subtitle)
+                success = True
+            else:
+                no_subtitles = True
+                error_message = 'No subtitles available for this video'
         except Exception as e:
             error_message = str(e)
             logging.error(f"Lỗi khi download subtitle: {e}")
         
-        if success and actual_srt_file:
-            # Lưu thông tin vào database với file thực tế
-            actual_filename = os.path.basename(actual_srt_file)
+        if no_subtitles:
+            # -1: không có track nào trong SUBTITLE_LANGUAGES, crawl-all / poller không thử lại nữa
+            mongo.db.videos.update_one(
+                {'_id': ObjectId(video_id)},
+                {'$set': {'srt_status': -1, 'updated_at': datetime.utcnow()}}
+            )
+            return jsonify({
+                'success': False,
+                'error': error_message,
+                'srt_status': -1
+            }), 404
+        
+        if success:
+            # Lưu thông tin vào database cùng blob key trong subtitle store
             srt_doc = {
                 'video_url': video_url,
                 'video_id': ObjectId(video_id),
-                'srt_file_path': actual_srt_file,
-                'srt_filename': actual_filename,
+                **stored,
                 'status': 0,  # 0: pending processing
                 'created_at': datetime.utcnow(),
                 'updated_at': datetime.utcnow()
@@ -2372,15 +2409,18 @@ def crawl_video_srt():
             # Cập nhật status của video
             mongo.db.videos.update_one(
                 {'_id': ObjectId(video_id)},
-                {'$set': {'status':1,'srt_status': 1, 'updated_at': datetime.utcnow()}}  # 1: SRT downloaded
+                {'$set': {'status':1,'srt_status': 1, 'language': stored['language'], 'updated_at': datetime.utcnow()}}  # 1: SRT downloaded
             )
             
             return jsonify({
                 'success': True,
                 'message': 'SRT file downloaded successfully',
                 'srt_id': str(result.inserted_id),
-                'srt_filename': actual_filename,
-                'srt_file_path': actual_srt_file
+                'srt_filename': stored['srt_filename'],
+                'language': stored['language'],
+                'srt_file_path': stored['srt_file_path'],
+                'blob_key': stored['blob_key'],
+                'storage': stored['storage']
             }), 200
         else:
             return jsonify({
@@ -2395,157 +2435,138 @@ def crawl_video_srt():
             'error': str(e)
         }), 500
 
-from elasticsearch import Elasticsearch, exceptions
-import time
-ES_HOST = "http://37.27.181.54:9200" # Địa chỉ Elasticsearch
-ES_INDEX_NAME = "articles"          # Tên index bạn muốn lưu dữ liệu
-MODEL_NAME = 'all-distilroberta-v1' # Model dùng để mã hóa
-from sentence_transformers import SentenceTransformer
-try:
-    # --- Khởi tạo kết nối và model (chỉ một lần) ---
-    logging.info("🔌 Đang kết nối đến Elasticsearch...")
-    es_connection = Elasticsearch([ES_HOST])
-    if not es_connection.ping():
-        raise ConnectionError(f"Không thể kết nối đến Elasticsearch tại {ES_HOST}")
-    logging.info("   ✔ Kết nối Elasticsearch thành công!")
-
-    logging.info(f"🧠 Đang tải model '{MODEL_NAME}'... (có thể mất một lúc)")
-    transformer_model = SentenceTransformer('all-distilroberta-v1')
-    logging.info("   ✔ Tải model thành công!")
+from elasticsearch import Elasticsearch
+from embedding_service import embedding_service
+ES_HOST = os.getenv('ARTICLES_ES_HOST', "http://37.27.181.54:9200") # Địa chỉ Elasticsearch
+ES_INDEX_NAME = os.getenv('ARTICLES_ES_INDEX', "articles")          # Tên index bạn muốn lưu dữ liệu
+# Model mã hóa của index articles được khai báo trong embedding_service (key 'articles')
+ARTICLES_EMBEDDING_KEY = 'articles'
+
+_es_connection = None
+_es_connection_lock = threading.Lock()
+
+def get_articles_es():
+    """
+    Client Elasticsearch cho index articles, tạo ở lần dùng đầu tiên thay vì lúc import
+    """
+    global _es_connection
+    if _es_connection is None:
+        with _es_connection_lock:
+            if _es_connection is None:
+                logging.info(f"🔌 Creating Elasticsearch client for {ES_HOST}...")
+                _es_connection = Elasticsearch([ES_HOST])
+    return _es_connection
+
+# Batch size khi encode chunks bằng sentence transformer
+ENCODE_BATCH_SIZE = int(os.getenv('ENCODE_BATCH_SIZE', 32))
+
+def index_text_chunks(url, url_channel, texts):
+    """
+    Encode tất cả chunks trong một lần gọi model và bulk index vào ES_INDEX_NAME.
+    _id cố định theo (url, chunk_index) nên index lại sẽ ghi đè; document cũ thừa của url bị xóa sau cùng.
+    """
+    if not texts:
+        return {'indexed_count': 0, 'failed_count': 0, 'errors': [], 'deleted_stale': 0}
     
-except exceptions.ConnectionError as e:
-    logging.error(f"🔥 LỖI KẾT NỐI ELASTICSEARCH: {e}")
-except Exception as e:
-    logging.error(f"🔥 Đã xảy ra lỗi không mong muốn trong quá trình thực thi: {e}")
+    started = time.time()
+    vectors = embedding_service.encode(texts, ARTICLES_EMBEDDING_KEY, batch_size=ENCODE_BATCH_SIZE)
+    encode_seconds = time.time() - started
     
-@main.route('/api/crawl-and-chunk-video', methods=['POST'])
-def crawl_and_chunk_video():
+    now = int(time.time())
+    actions = []
+    for i, (text, vector) in enumerate(zip(texts, vectors)):
+        actions.append({
+            '_index': ES_INDEX_NAME,
+            '_id': chunk_doc_id(url, i),
+            '_source': {
+                'url': url,
+                'url_channel': url_channel,
+                'origin_content': text,
+                'vector': vector.tolist(),
+                'time': now,
+                'chunk_index': i
+            }
+        })
+    
+    es_connection = get_articles_es()
+    result = bulk_index(es_connection, actions)
+    
+    # Chỉ xóa document cũ khi bulk thành công hoàn toàn, tránh mất dữ liệu đang được search
+    result['deleted_stale'] = 0
+    if result['failed_count'] == 0:
+        result['deleted_stale'] = delete_stale_docs(es_connection, ES_INDEX_NAME, url, [action['_id'] for action in actions])
+    
+    result['encode_seconds'] = round(encode_seconds, 3)
+    result['total_seconds'] = round(time.time() - started, 3)
+    logging.info(f"✅ Indexed {result['indexed_count']}/{len(texts)} chunks for {url} "
+                 f"(encode {result['encode_seconds']}s, total {result['total_seconds']}s, stale deleted {result['deleted_stale']})")
+    return result
+    
+VIDEO_PIPELINE_STAGES = ['cleanup', 'crawl_srt', 'chunk_srt', 'save_chunks', 'index_elasticsearch', 'update_status']
+
+def run_video_pipeline(video_id, progress):
     """
-    API gộp crawl SRT và chunk cho một video cụ thể
+    Pipeline crawl SRT -> chunk -> lưu MongoDB -> embed + index Elasticsearch cho một video.
+    Chạy trong worker của video_pipeline_queue, mỗi bước được ghi lại vào job progress.
     """
-    try:
-        data = request.get_json()
-        video_id = data.get('video_id')
-        
-        if not video_id:
-            return jsonify({
-                'success': False,
-                'error': 'Video ID is required'
-            }), 400
-        
-        mongo = get_mongo()
-        
-        # Lấy thông tin video
-        video = mongo.db.videos.find_one({'_id': ObjectId(video_id)})
-        if not video:
-            return jsonify({
-                'success': False,
-                'error': 'Video not found'
-            }), 404
-        channel = mongo.db.youtube_channels.find_one({'channel_id': video['channel_id']})
-        channel_url = channel['url']
-        video_url = video['url']
-        print(f"Processing video: {video_url}")
-        
-        # Kiểm tra xem đã có SRT file chưa - nếu có thì xóa để crawl lại
+    mongo = get_mongo()
+    
+    # Lấy thông tin video
+    video = mongo.db.videos.find_one({'_id': ObjectId(video_id)})
+    if not video:
+        raise PermanentJobError(f'Video not found: {video_id}')
+    channel = mongo.db.youtube_channels.find_one({'channel_id': video['channel_id']})
+    channel_url = channel['url'] if channel else video.get('channel_url', '')
+    video_url = video['url']
+    logging.info(f"🎬 Processing video: {video_url}")
+    
+    # BƯỚC 0: XÓA SRT CŨ (nếu có) để crawl lại
+    with progress.stage('cleanup') as details:
         existing_srt = mongo.db.srt_files.find_one({'video_url': video_url})
+        details['existing_srt'] = bool(existing_srt)
         if existing_srt:
-            print(f"Found existing SRT file, deleting to re-crawl: {existing_srt['_id']}")
-            # Xóa SRT file cũ và chunks liên quan
-            mongo.db.srt_chunks.delete_many({'srt_id': existing_srt['_id']})
-            mongo.db.srt_files.delete_one({'_id': existing_srt['_id']})
-            
-            # Xóa file vật lý nếu tồn tại
-            if os.path.exists(existing_srt.get('srt_file_path', '')):
-                try:
-                    os.remove(existing_srt['srt_file_path'])
-                except Exception as e:
-                    print(f"Warning: Could not delete old SRT file: {e}")
-            
-                # Xóa chunks khỏi Elasticsearch
-                try:
-                    es_delete_result = elasticsearch_service.delete_video_chunks(video_id)
-                    if es_delete_result['success']:
-                        print(f"✅ Deleted {es_delete_result.get('deleted_count', 0)} Elasticsearch records")
-                    else:
-                        print(f"⚠️ Elasticsearch deletion warning: {es_delete_result['message']}")
-                except Exception as e:
-                    print(f"⚠️ Elasticsearch deletion error: {str(e)}")
+            logging.info(f"🗑️ Found existing SRT file, deleting to re-crawl: {existing_srt['_id']}")
+            # Xóa SRT file cũ và chunks liên quan; blob cũ chỉ được giải phóng sau khi
+            # lưu bản mới, để nội dung không đổi được dedupe thay vì ghi lại
+            delete_srt(existing_srt)
+            # Chunk cũ trong Elasticsearch vẫn được search cho tới khi bản mới được index:
+            # _id cố định nên được ghi đè, phần thừa bị xóa sau bulk (delete_stale_docs)
             
             # Reset video status về pending
             mongo.db.videos.update_one(
                 {'_id': ObjectId(video_id)},
                 {'$set': {'srt_status': 0, 'updated_at': datetime.utcnow()}}
             )
-        
-        # BƯỚC 1: CRAWL SRT FILE
-        print("Step 1: Crawling SRT file...")
-        srt_folder = 'srt_files'
-        if not os.path.exists(srt_folder):
-            os.makedirs(srt_folder)
-        
-        # Tạo tên file unique
-        srt_filename = generate_unique_filename(video_url)
-        srt_file_path = os.path.join(srt_folder, srt_filename)
-        
-        # Cấu hình yt-dlp để download subtitle
-        ydl_opts = {
-            'writesubtitles': True,
-            'writeautomaticsub': True,
-            'subtitleslangs': ['en'],
-            'subtitlesformat': 'srt',
-            'skip_download': True,
-            'cookies': 'cookies.txt',
-            'outtmpl': srt_file_path.replace('.srt', '.%(ext)s'),
-        }
-        
-        srt_success = False
-        srt_error_message = ""
-        actual_srt_file = None
-        
+    
+    # BƯỚC 1: CRAWL SRT FILE
+    with progress.stage('crawl_srt') as details:
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_url])
-                
-                # Tìm file SRT thực tế được tạo
-                if os.path.exists(srt_file_path):
-                    actual_srt_file = srt_file_path
-                    srt_success = True
-                else:
-                    # Tìm file có chứa video ID
-                    video_id_from_url = video_url.split('v=')[-1].split('&')[0] if 'v=' in video_url else ''
-                    for file in os.listdir(srt_folder):
-                        if file.endswith('.srt') and video_id_from_url in file:
-                            actual_srt_file = os.path.join(srt_folder, file)
-                            srt_success = True
-                            break
-                    
-                    # Nếu vẫn không tìm thấy, lấy file mới nhất
-                    if not actual_srt_file:
-                        srt_files = [f for f in os.listdir(srt_folder) if f.endswith('.srt')]
-                        if srt_files:
-                            latest_file = max(srt_files, key=lambda x: os.path.getctime(os.path.join(srt_folder, x)))
-                            actual_srt_file = os.path.join(srt_folder, latest_file)
-                            srt_success = True
-                            
+            # Chỉ lấy metadata rồi tải đúng track phụ đề đã chọn (shard theo video id)
+            subtitle = subtitle_fetcher.fetch(video_url)
         except Exception as e:
-            srt_error_message = str(e)
             logging.error(f"Lỗi khi download subtitle: {e}")
+            raise Exception(f'Failed to download subtitle: {str(e)}')
         
-        if not srt_success or not actual_srt_file:
-            return jsonify({
-                'success': False,
-                'error': f'Failed to download subtitle: {srt_error_message}',
-                'step': 'crawl_srt'
-            }), 500
-        
-        # Lưu thông tin SRT file vào database
-        actual_filename = os.path.basename(actual_srt_file)
+        if not subtitle:
+            # -1: không có track nào trong SUBTITLE_LANGUAGES; retry không thay đổi được kết quả
+            mongo.db.videos.update_one(
+                {'_id': ObjectId(video_id)},
+                {'$set': {'srt_status': -1, 'updated_at': datetime.utcnow()}}
+            )
+            # Video không còn phụ đề: không để chunk của lần crawl trước tiếp tục xuất hiện trong search
+            elasticsearch_service.delete_video_chunks(video_id)
+            raise PermanentJobError('No subtitles available in the configured languages')
+        details['slot_wait_ms'] = subtitle['slot_wait_ms']
+        details['fetch_ms'] = subtitle['fetch_ms']
+        details['subtitle_source'] = subtitle['source']
+        details['language'] = subtitle['language']
+        
+        # Nén + lưu vào subtitle store (trùng nội dung thì không ghi lại), rồi lưu thông tin SRT file vào database
+        stored = store_subtitle(video_url, subtitle)
         srt_doc = {
             'video_url': video_url,
             'video_id': ObjectId(video_id),
-            'srt_file_path': actual_srt_file,
-            'srt_filename': actual_filename,
+            **stored,
             'status': 0,  # 0: pending processing
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
@@ -2553,122 +2574,127 @@ def crawl_and_chunk_video():
         
         srt_result = mongo.db.srt_files.insert_one(srt_doc)
         srt_id = srt_result.inserted_id
+        details['srt_filename'] = stored['srt_filename']
+        details['storage'] = stored['storage']
         
-        # BƯỚC 2: CHUNK SRT FILE
-        print("Step 2: Chunking SRT file...")
-        chunks_data = process_srt_file(actual_srt_file)
-        
+        # Blob cũ không còn document nào trỏ tới thì xóa (cùng content hash thì giữ nguyên)
+        if existing_srt:
+            subtitle_store.release(existing_srt)
+    
+    # BƯỚC 2: CHUNK SRT FILE
+    with progress.stage('chunk_srt') as details:
+        dedupe_stats = {}
+        chunks_data = process_srt_file(srt_doc, dedupe_stats=dedupe_stats)
         if not chunks_data:
+            elasticsearch_service.delete_video_chunks(video_id)
+            raise PermanentJobError('No chunks extracted from SRT file')
+        details['chunks_count'] = len(chunks_data)
+        details['dedupe'] = dedupe_stats
+    
+    # BƯỚC 3: LƯU CHUNKS VÀO MONGODB
+    with progress.stage('save_chunks') as details:
+        details.update(replace_srt_chunks(
+            srt_id, video_url, chunks_data,
+            video_id=ObjectId(video_id),
+            extra_fields={'dedupe': dedupe_stats},
+            language=stored['language']
+        ))
+    
+    # BƯỚC 4: ELASTICSEARCH VECTOR INDEXING
+    with progress.stage('index_elasticsearch') as details:
+        es_result = index_text_chunks(video_url, channel_url, [chunk['text'] for chunk in chunks_data])
+        details.update(es_result)
+        
+        # Index video_chunks (có start_time / end_time) cho /api/search theo thời điểm trong video.
+        # video_id = _id Mongo, cùng id mà cleanup / delete-video / cleanup-video-data truyền vào delete_video_chunks
+        video_chunks_result = elasticsearch_service.index_chunks(chunks_data, {
+            'video_id': video_id,
+            'url': video_url,
+            'channel_url': channel_url,
+            'title': video.get('title', ''),
+            'channel_name': channel.get('title', '') if channel else '',
+            'language': stored['language']
+        })
+        details['video_chunks'] = {
+            'indexed_count': video_chunks_result.get('indexed_count', 0),
+            'failed_count': video_chunks_result.get('failed_count', 0),
+            'deleted_stale': video_chunks_result.get('deleted_stale', 0),
+            'message': video_chunks_result.get('message', '')
+        }
+        
+        # Index lỗi thì stage lỗi: job được retry thay vì đánh dấu video đã xử lý (srt_status = 1)
+        if es_result['failed_count']:
+            raise Exception(f"Elasticsearch indexing failed for {es_result['failed_count']} of {len(chunks_data)} chunks")
+        if not video_chunks_result.get('success'):
+            raise Exception(f"video_chunks indexing failed: {video_chunks_result.get('message', '')}")
+    
+    # BƯỚC 5: CẬP NHẬT STATUS VIDEO
+    with progress.stage('update_status'):
+        mongo.db.videos.update_one(
+            {'_id': ObjectId(video_id)},
+            {'$set': {'status': 1, 'srt_status': 1, 'language': stored['language'], 'updated_at': datetime.utcnow()}}  # 1: SRT processed
+        )
+    
+    return {
+        'message': f'Successfully crawled and chunked video with {len(chunks_data)} chunks',
+        'srt_id': str(srt_id),
+        'srt_filename': stored['srt_filename'],
+        'blob_key': stored['blob_key'],
+        'language': stored['language'],
+        'chunks_count': len(chunks_data),
+        'dedupe': dedupe_stats,
+        'video_status': 1,
+        'elasticsearch': es_result
+    }
+
+def run_video_pipeline_job(job):
+    """
+    Handler của video_pipeline_queue cho job type 'crawl_and_chunk_video'
+    """
+    progress = JobProgress(video_pipeline_queue, job, VIDEO_PIPELINE_STAGES)
+    return run_video_pipeline(job['payload']['video_id'], progress)
+
+video_pipeline_queue.register_handler('crawl_and_chunk_video', run_video_pipeline_job)
+
+@main.route('/api/crawl-and-chunk-video', methods=['POST'])
+def crawl_and_chunk_video():
+    """
+    API gộp crawl SRT và chunk cho một video cụ thể.
+    Chỉ đưa job vào video_pipeline_queue và trả về job_id ngay; theo dõi tiến độ bằng cách poll /api/jobs/<job_id>.
+    """
+    try:
+        data = request.get_json()
+        video_id = data.get('video_id')
+        
+        if not video_id:
             return jsonify({
                 'success': False,
-                'error': 'No chunks extracted from SRT file',
-                'step': 'chunk_srt'
-            }), 500
-        
-        # Lưu chunks vào MongoDB
-        chunks_docs = []
-        for i, chunk_info in enumerate(chunks_data):
-            chunk_doc = {
-                'srt_id': srt_id,
-                'video_id': ObjectId(video_id),
-                'video_url': video_url,
-                'chunk_index': i,
-                'text': chunk_info['text'],
-                'time': chunk_info['time'],
-                'created_at': datetime.utcnow()
-            }
-            chunks_docs.append(chunk_doc)
+                'error': 'Video ID is required'
+            }), 400
         
-        # Insert tất cả chunks
-        if chunks_docs:
-            mongo.db.srt_chunks.insert_many(chunks_docs)
+        mongo = get_mongo()
         
-        # Cập nhật status của SRT file
-        mongo.db.srt_files.update_one(
-            {'_id': srt_id},
-            {
-                '$set': {
-                    'status': 1,  # 1: processed
-                    'chunks_count': len(chunks_data),
-                    'updated_at': datetime.utcnow()
-                }
-            }
-        )
+        # Kiểm tra video tồn tại trước khi enqueue
+        video = mongo.db.videos.find_one({'_id': ObjectId(video_id)}, {'_id': 1})
+        if not video:
+            return jsonify({
+                'success': False,
+                'error': 'Video not found'
+            }), 404
         
-        # BƯỚC 3: ELASTICSEARCH VECTOR INDEXING
-        es_result = []
-        print("Step 3: Elasticsearch vector indexing...")
-        try:
-            video_info = {
-                'video_id': video_id,
-                'title': video.get('title', ''),
-                'channel_name': video.get('channel_name', ''),
-                'url': video.get('url', ''),
-                'channel_url': video.get('channel_url', '')  # Thêm channel URL
-            }
-            delete_query = {
-                "query": {
-                    "term": {
-                        "url": video.get('url', ''),
-                    }
-                }
-            }
-            response = es_connection.delete_by_query(
-                index=ES_INDEX_NAME,
-                body=delete_query
-            )
-            deleted_count = response.get('deleted', 0)
-            if deleted_count > 0:
-                print(f"✅ Đã xóa thành công {deleted_count} document.")
-            else:
-                print("ℹ️ Không tìm thấy document nào khớp để xóa. Hãy kiểm tra lại giá trị URL và câu query.")
-            for data in chunks_data:
-                vector = transformer_model.encode(data['text']).tolist()
-               
-                # 2. Chuẩn bị document để index
-                document = {
-                    'url': video.get('url', ''),
-                    'origin_content': data['text'],
-                    'vector': vector,
-                    'time': int(time.time()),
-                    'url_channel': channel_url,
-                }
-                # 3. Index document vào Elasticsearch
-                logging.info(f"   - Chunk {i+1}/{len(chunks_data)}: Đang index vào '{ES_INDEX_NAME}'...")
-                response = es_connection.index(index=ES_INDEX_NAME, body=document)
-                response_dict = dict(response)
-                pretty_response_str = json.dumps(response_dict, indent=2, ensure_ascii=False)
-                print("pretty_response_str",pretty_response_str)
-                logging.info(f"   ✔ Chunk {i+1} đã được index thành công với ID:")
-                es_result.append(pretty_response_str)
-            print("data",chunks_data, video_info)
-        except Exception as e:
-            print(f"❌ Elasticsearch indexing error: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            # es_result = {
-            #     'success': False,
-            #     'message': f'Elasticsearch indexing error: {str(e)}',
-            #     'indexed_count': 0
-            # }
-        
-        # BƯỚC 4: CẬP NHẬT STATUS VIDEO
-        print("Step 4: Updating video status...")
-        mongo.db.videos.update_one(
-            {'_id': ObjectId(video_id)},
-            {'$set': {'status':1,'srt_status': 1, 'updated_at': datetime.utcnow()}}  # 1: SRT processed
+        # Dedupe: bấm nhiều lần chỉ tạo một job đang chạy cho mỗi video
+        job_id = video_pipeline_queue.enqueue(
+            'crawl_and_chunk_video',
+            {'video_id': video_id},
+            dedupe_key=f"crawl_and_chunk_video:{video_id}"
         )
         
         return jsonify({
             'success': True,
-            'message': f'Successfully crawled and chunked video with {len(chunks_data)} chunks',
-            'srt_id': str(srt_id),
-            'srt_filename': actual_filename,
-            'srt_file_path': actual_srt_file,
-            'chunks_count': len(chunks_data),
-            'video_status': 1,
-            'elasticsearch': es_result
-        }), 200
+            'message': 'Video pipeline job queued',
+            'job_id': str(job_id),
+            'status_url': f"/api/jobs/{job_id}"
+        }), 202
         
     except Exception as e:
         log_exception("crawl_and_chunk_video", e)
@@ -2697,30 +2723,8 @@ def index_content():
         
         print(f"Processing content for URL: {url}")
         
-        # BƯỚC 1: KIỂM TRA VÀ XÓA DỮ LIỆU CŨ (nếu có)
-        print("Step 1: Checking and deleting existing data...")
-        try:
-            delete_query = {
-                "query": {
-                    "term": {
-                        "url": url
-                    }
-                }
-            }
-            response = es_connection.delete_by_query(
-                index=ES_INDEX_NAME,
-                body=delete_query
-            )
-            deleted_count = response.get('deleted', 0)
-            if deleted_count > 0:
-                print(f"✅ Đã xóa thành công {deleted_count} document cũ.")
-            else:
-                print("ℹ️ Không tìm thấy document nào khớp để xóa.")
-        except Exception as e:
-            print(f"⚠️ Lỗi khi xóa dữ liệu cũ: {str(e)}")
-        
-        # BƯỚC 2: CHIA CONTENT THÀNH CHUNKS
-        print("Step 2: Splitting content into chunks...")
+        # BƯỚC 1: CHIA CONTENT THÀNH CHUNKS
+        print("Step 1: Splitting content into chunks...")
         chunks_data = split_content_into_chunks(content)
         
         if not chunks_data:
@@ -2732,55 +2736,38 @@ def index_content():
         
         print(f"Created {len(chunks_data)} chunks from content")
         
-        # BƯỚC 3: MÃ HÓA VÀ INDEX VÀO ELASTICSEARCH
-        print("Step 3: Encoding and indexing to Elasticsearch...")
+        # BƯỚC 2: MÃ HÓA (BATCH) VÀ BULK INDEX VÀO ELASTICSEARCH
+        # Document cũ của url được ghi đè theo _id cố định, phần thừa bị xóa sau khi index xong
+        print("Step 2: Encoding and bulk indexing to Elasticsearch...")
         indexed_count = 0
+        failed_count = 0
         es_errors = []
         
         try:
-            for i, chunk_text in enumerate(chunks_data):
-                try:
-                    # Mã hóa chunk thành vector
-                    vector = transformer_model.encode(chunk_text).tolist()
-                    
-                    # Chuẩn bị document để index
-                    document = {
-                        'url': url,
-                        'url_channel': url_channel,
-                        'origin_content': chunk_text,
-                        'vector': vector,
-                        'time': int(time.time()),
-                        'chunk_index': i
-                    }
-                    
-                    # Index document vào Elasticsearch
-                    response = es_connection.index(index=ES_INDEX_NAME, body=document)
-                    indexed_count += 1
-                    print(f"   ✔ Chunk {i+1}/{len(chunks_data)} indexed successfully")
-                    
-                except Exception as e:
-                    error_msg = f"Error indexing chunk {i+1}: {str(e)}"
-                    print(f"   ❌ {error_msg}")
-                    es_errors.append(error_msg)
-                    
+            es_result = index_text_chunks(url, url_channel, chunks_data)
+            indexed_count = es_result['indexed_count']
+            failed_count = es_result['failed_count']
+            es_errors = [f"Error indexing {error['_id']}: {error['error']}" for error in es_result['errors']]
         except Exception as e:
             print(f"❌ Elasticsearch indexing error: {str(e)}")
-            import traceback
             traceback.print_exc()
+            failed_count = len(chunks_data)
+            es_errors.append(str(e))
         
-        # BƯỚC 4: TRẢ VỀ KẾT QUẢ
+        # BƯỚC 3: TRẢ VỀ KẾT QUẢ
         result = {
             'success': True,
             'message': f'Successfully indexed {indexed_count} chunks from content',
             'total_chunks': len(chunks_data),
             'indexed_count': indexed_count,
+            'failed_count': failed_count,
             'url': url,
             'url_channel': url_channel
         }
         
         if es_errors:
             result['warnings'] = es_errors
-            result['message'] += f' (with {len(es_errors)} errors)'
+            result['message'] += f' (with {failed_count} errors)'
         
         return jsonify(result), 200
         
@@ -2791,55 +2778,12 @@ def index_content():
             'error': str(e)
         }), 500
 
-def split_content_into_chunks(content, max_chunk_size=500, overlap=50):
+def split_content_into_chunks(content):
     """
-    Chia content thành các chunks phù hợp
+    Chia content thành các chunk theo câu, mỗi chunk vừa cửa sổ token của model index articles
     """
-    if not content or not content.strip():
-        return []
-    
-    # Làm sạch content
-    content = content.strip()
-    
-    # Nếu content ngắn hơn max_chunk_size, trả về 1 chunk
-    if len(content) <= max_chunk_size:
-        return [content]
-    
-    chunks = []
-    start = 0
-    
-    while start < len(content):
-        # Xác định vị trí kết thúc chunk
-        end = start + max_chunk_size
-        
-        if end >= len(content):
-            # Chunk cuối cùng
-            chunks.append(content[start:].strip())
-            break
-        
-        # Tìm vị trí tốt để cắt (ưu tiên dấu câu, xuống dòng)
-        cut_positions = [
-            content.rfind('.', start, end),
-            content.rfind('!', start, end),
-            content.rfind('?', start, end),
-            content.rfind('\n', start, end),
-            content.rfind(' ', start, end)
-        ]
-        
-        # Chọn vị trí cắt tốt nhất
-        best_cut = max([pos for pos in cut_positions if pos > start + max_chunk_size // 2])
-        
-        if best_cut > start:
-            end = best_cut + 1
-        
-        chunk = content[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-        
-        # Tính toán vị trí bắt đầu chunk tiếp theo (có overlap)
-        start = max(start + 1, end - overlap)
-    
-    return chunks
+    count_tokens, max_tokens = model_token_budget(ARTICLES_EMBEDDING_KEY, max_tokens=CHUNK_MAX_TOKENS)
+    return chunk_text(content, max_tokens, CHUNK_OVERLAP_TOKENS, count_tokens)
 
 @main.route('/api/process-video-srt', methods=['POST'])
 def process_video_srt():
@@ -2879,48 +2823,25 @@ def process_video_srt():
         processed_files = 0
         
         for srt_file in srt_files:
-            srt_file_path = srt_file['srt_file_path']
-            
-            # Kiểm tra file tồn tại
-            if not os.path.exists(srt_file_path):
+            # Kiểm tra blob (hoặc file cũ trên đĩa) còn tồn tại
+            if not subtitle_store.is_available(srt_file):
                 continue
             
             # Xử lý file SRT
-            chunks_data = process_srt_file(srt_file_path)
+            dedupe_stats = {}
+            chunks_data = process_srt_file(srt_file, dedupe_stats=dedupe_stats)
             
             if not chunks_data:
                 continue
             
-            # Lưu chunks vào MongoDB
-            chunks_docs = []
-            for i, chunk_info in enumerate(chunks_data):
-                chunk_doc = {
-                    'srt_id': srt_file['_id'],
-                    'video_id': ObjectId(video_id),
-                    'video_url': video['url'],
-                    'chunk_index': i,
-                    'text': chunk_info['text'],
-                    'time': chunk_info['time'],
-                    'created_at': datetime.utcnow()
-                }
-                chunks_docs.append(chunk_doc)
-            
-            # Insert tất cả chunks
-            if chunks_docs:
-                mongo.db.srt_chunks.insert_many(chunks_docs)
-                total_chunks += len(chunks_data)
-            
-            # Cập nhật status của SRT file
-            mongo.db.srt_files.update_one(
-                {'_id': srt_file['_id']},
-                {
-                    '$set': {
-                        'status': 1,  # 1: processed
-                        'chunks_count': len(chunks_data),
-                        'updated_at': datetime.utcnow()
-                    }
-                }
+            # Thay toàn bộ chunks của SRT file và cập nhật status trong một lần ghi
+            replace_srt_chunks(
+                srt_file['_id'], video['url'], chunks_data,
+                video_id=ObjectId(video_id),
+                extra_fields={'dedupe': dedupe_stats},
+                language=srt_file.get('language')
             )
+            total_chunks += len(chunks_data)
             processed_files += 1
         
         # Cập nhật status của video
@@ -2949,7 +2870,9 @@ def process_video_srt():
 @main.route('/api/search', methods=['GET'])
 def search_videos():
     """
-    API tìm kiếm semantic trong Elasticsearch với vector embeddings
+    API tìm kiếm trong video_chunks: hybrid (kNN + BM25, trộn bằng RRF) mặc định, hoặc mode=semantic / keyword.
+    Trang tiếp theo: truyền lại next_cursor của response vào tham số cursor.
+    fields=url,origin_content,start_time chỉ trả về (và chỉ đọc từ ES) các field đó; mặc định là toàn bộ schema kết quả.
     """
     try:
         # Get search parameters
@@ -2957,28 +2880,63 @@ def search_videos():
         video_id = request.args.get('video_id', None)
         size = int(request.args.get('size', 10))
         from_ = int(request.args.get('from', 0))
+        # Ngôn ngữ phụ đề (en, vi, ...): query được embed bằng cùng model với chunk của ngôn ngữ đó
+        language = request.args.get('language') or None
+        mode = request.args.get('mode', SEARCH_MODE_HYBRID)
+        fusion = request.args.get('fusion', FUSION_RRF)
+        cursor = request.args.get('cursor') or None
+        fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()] or None
         
         if not query:
             return jsonify({
                 'success': False,
                 'error': 'Query parameter "q" is required'
             }), 400
+        if mode not in SEARCH_MODES or fusion not in FUSION_METHODS:
+            return jsonify({
+                'success': False,
+                'error': f'mode must be one of {", ".join(SEARCH_MODES)} and fusion one of {", ".join(FUSION_METHODS)}'
+            }), 400
+        if fields:
+            unknown = [field for field in fields if field not in SEARCH_RESULT_FIELDS and field != SEARCH_HIGHLIGHTS_FIELD]
+            if unknown:
+                return jsonify({
+                    'success': False,
+                    'error': f'Unknown fields: {", ".join(unknown)}; allowed: {", ".join(list(SEARCH_RESULT_FIELDS) + [SEARCH_HIGHLIGHTS_FIELD])}'
+                }), 400
+        if cursor:
+            try:
+                decode_search_cursor(cursor)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
         
-        # Perform semantic search
         search_result = elasticsearch_service.search_chunks(
             query=query,
             video_id=video_id,
             size=size,
-            from_=from_
+            from_=from_,
+            language=language,
+            mode=mode,
+            fusion=fusion,
+            cursor=cursor,
+            fields=fields
         )
         
         if search_result['success']:
             return jsonify({
                 'success': True,
                 'query': query,
+                'language': language,
+                'mode': search_result['mode'],
+                'fusion': search_result['fusion'],
                 'results': search_result['results'],
                 'total': search_result['total'],
                 'took': search_result['took'],
+                'next_cursor': search_result['next_cursor'],
+                'cached': search_result['cached'],
                 'message': f"Found {len(search_result['results'])} results"
             }), 200
         else:
@@ -2994,6 +2952,24 @@ def search_videos():
             'error': f'Search failed: {str(e)}'
         }), 500
 
+@main.route('/api/embeddings/stats', methods=['GET'])
+def get_embedding_stats():
+    """
+    API trả về thông tin model embedding (đã load chưa, số chiều), thống kê cache embedding và micro-batching query
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'models': embedding_service.info(),
+            'cache': embedding_service.cache_stats(),
+            'batching': embedding_service.batching_stats()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @main.route('/api/elasticsearch/stats', methods=['GET'])
 def get_elasticsearch_stats():
     """
@@ -3005,7 +2981,8 @@ def get_elasticsearch_stats():
         if stats['success']:
             return jsonify({
                 'success': True,
-                'stats': stats
+                'stats': stats,
+                'search_cache': elasticsearch_service.search_cache_stats()
             }), 200
         else:
             return jsonify({
@@ -3106,18 +3083,9 @@ def cleanup_video_data():
             srt_files = mongo.db.srt_files.find({'video_id': ObjectId(video_id)})
             
             for srt_file in srt_files:
-                # Xóa file vật lý
-                srt_file_path = srt_file.get('file_path')
-                if srt_file_path and os.path.exists(srt_file_path):
-                    try:
-                        os.remove(srt_file_path)
-                        print(f"✅ Deleted SRT file: {srt_file_path}")
-                    except Exception as e:
-                        print(f"⚠️ Failed to delete SRT file {srt_file_path}: {str(e)}")
-                        cleanup_results['errors'].append(f"SRT file deletion: {str(e)}")
-                
-                # Xóa record trong MongoDB
+                # Xóa record trong MongoDB trước, rồi giải phóng blob nếu không còn document nào dùng
                 mongo.db.srt_files.delete_one({'_id': srt_file['_id']})
+                subtitle_store.release(srt_file)
                 cleanup_results['srt_files_deleted'] += 1
                 
         except Exception as e:
@@ -3307,32 +3275,32 @@ def save_request():
                 else:
                     logging.info(f"🎯 Processing event_match_end for fixture_id: {fixture_id}")
                     
-                    # Query tất cả requests có cùng fixture_id
-                    related_requests = list(mongo.db.requests.find({
+                    # Kiểm tra có requests cùng fixture_id hay không (worker sẽ tự query lại dữ liệu)
+                    has_related_requests = mongo.db.requests.count_documents({
                         'fixture_id': fixture_id,
                         'type': {'$ne': 'event_match_end'}  # Loại trừ chính request này
-                    }).limit(50))
-                    
-                    logging.info(f"📊 Found {len(related_requests)} related requests for fixture_id: {fixture_id}")
+                    }, limit=1) > 0
                     
-                    if related_requests:
-                        # Khởi tạo thread riêng để xử lý tạo bài viết
-                        thread = threading.Thread(
-                            target=process_article_generation_async,
-                            args=(fixture_id, related_requests, str(result.inserted_id)),
-                            name=f"ArticleGen-{fixture_id}"
+                    if has_related_requests:
+                        # Đưa vào job queue bền vững (Mongo) thay vì tạo thread riêng
+                        job_id = article_job_queue.enqueue(
+                            'match_article',
+                            {'fixture_id': fixture_id, 'request_id': str(result.inserted_id)},
+                            dedupe_key=f"match_article:{result.inserted_id}"
                         )
-                        thread.daemon = True  # Thread sẽ tự động kết thúc khi main thread kết thúc
-                        thread.start()
                         
-                        logging.info(f"🚀 Started async article generation thread for fixture_id: {fixture_id}")
-                        logging.info(f"📋 Thread name: {thread.name}")
-                        logging.info(f"⏰ Article generation will start in 10 seconds...")
+                        logging.info(f"🚀 Queued article generation job {job_id} for fixture_id: {fixture_id}")
                         
-                        # Set initial status - sẽ được update bởi thread
-                        request_doc['article_generation_status'] = 'processing'
+                        # Set initial status - sẽ được update bởi worker
+                        request_doc['article_generation_status'] = 'queued'
                         request_doc['article_generation_started_at'] = datetime.utcnow()
                         request_doc['article_generated'] = False  # Sẽ được update khi hoàn thành
+                        request_doc['article_job_id'] = str(job_id)
+                        
+                        mongo.db.requests.update_one(
+                            {'_id': result.inserted_id},
+                            {'$set': {'article_job_id': str(job_id), 'article_generation_status': 'queued'}}
+                        )
                         
                     else:
                         logging.warning(f"⚠️ No related requests found for fixture_id: {fixture_id}")
@@ -3354,6 +3322,7 @@ def save_request():
             'generated_article_id': request_doc.get('generated_article_id'),
             'generation_error': request_doc.get('generation_error'),
             'article_generation_status': request_doc.get('article_generation_status', 'not_applicable'),
+            'article_job_id': request_doc.get('article_job_id'),
             'article_generation_started_at': request_doc.get('article_generation_started_at').isoformat() if request_doc.get('article_generation_started_at') else None
         }), 201
         
@@ -3470,6 +3439,136 @@ def delete_request(request_id):
             'error': str(e)
         }), 500
 
+# ==============================================================================
+# JOBS API
+# ==============================================================================
+
+@main.route('/api/jobs', methods=['GET'])
+def get_jobs():
+    """
+    API lấy danh sách jobs và trạng thái worker pool của từng queue
+    """
+    try:
+        mongo = get_mongo()
+        
+        # Lấy parameters từ query
+        limit = int(request.args.get('limit', 50))
+        skip = int(request.args.get('skip', 0))
+        queue_name = request.args.get('queue')
+        status = request.args.get('status')
+        job_type = request.args.get('type')
+        batch_id = request.args.get('batch_id')
+        
+        if status and status not in JOB_STATUSES:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid status, expected one of {JOB_STATUSES}'
+            }), 400
+        
+        query = {}
+        if queue_name:
+            query['queue'] = queue_name
+        if status:
+            query['status'] = status
+        if job_type:
+            query['type'] = job_type
+        if batch_id:
+            query['payload.batch_id'] = batch_id
+        
+        jobs = list(mongo.db.jobs.find(query).sort('created_at', -1).skip(skip).limit(limit))
+        total_count = mongo.db.jobs.count_documents(query)
+        
+        queues = [queue.stats() for name, queue in job_queues.items() if not queue_name or name == queue_name]
+        
+        response = {
+            'success': True,
+            'jobs': serialize_documents(jobs),
+            'total_count': total_count,
+            'limit': limit,
+            'skip': skip,
+            'queues': queues
+        }
+        
+        if batch_id:
+            # Tổng hợp trạng thái của cả batch (crawl-all của một channel)
+            batch_counts = {job_status: 0 for job_status in JOB_STATUSES}
+            for row in mongo.db.jobs.aggregate([
+                {'$match': {'payload.batch_id': batch_id}},
+                {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+            ]):
+                batch_counts[row['_id']] = row['count']
+            response['batch'] = {'batch_id': batch_id, 'counts': batch_counts}
+        
+        return jsonify(response), 200
+        
+    except Exception as e:
+        log_exception("get_jobs", e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@main.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    API lấy chi tiết một job
+    """
+    try:
+        mongo = get_mongo()
+        
+        job = mongo.db.jobs.find_one({'_id': ObjectId(job_id)})
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Job not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'job': serialize_document(job)
+        }), 200
+        
+    except Exception as e:
+        log_exception("get_job", e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@main.route('/api/jobs/<job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    """
+    API đưa một job đã dead-letter trở lại hàng đợi
+    """
+    try:
+        mongo = get_mongo()
+        
+        job = mongo.db.jobs.find_one({'_id': ObjectId(job_id)}, {'queue': 1, 'status': 1})
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Job not found'
+            }), 404
+        
+        queue = job_queues.get(job['queue'])
+        if not queue or not queue.retry(job['_id']):
+            return jsonify({
+                'success': False,
+                'error': f"Only dead jobs can be retried (current status: {job['status']})"
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'message': 'Job re-queued successfully'
+        }), 200
+        
+    except Exception as e:
+        log_exception("retry_job", e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # ==============================================================================
 # GENERATED ARTICLES API
 # ==============================================================================
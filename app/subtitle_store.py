@@ -0,0 +1,210 @@
+import io
+import os
+import gzip
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from app import get_mongo
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZSTD = 'zstd'
+
+
+def _zstandard():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+class LocalSubtitleBackend:
+    """Blobs as files under ``root`` (a shared volume lets every worker read them)"""
+
+    name = 'local'
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, data: bytes, metadata: Dict[str, Any]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Ghi ra file tạm rồi rename: reader không bao giờ thấy blob ghi dở
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, key: str):
+        return open(self._path(key), 'rb')
+
+    def delete(self, key: str):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class GridFSSubtitleBackend:
+    """Blobs in MongoDB GridFS, readable from any host that can reach the database"""
+
+    name = 'gridfs'
+
+    def __init__(self, collection: str = 'subtitle_blobs'):
+        self.collection = collection
+
+    @property
+    def fs(self):
+        import gridfs
+        return gridfs.GridFS(get_mongo().db, collection=self.collection)
+
+    def exists(self, key: str) -> bool:
+        return self.fs.exists(key)
+
+    def put(self, key: str, data: bytes, metadata: Dict[str, Any]):
+        import gridfs
+        try:
+            self.fs.put(data, _id=key, filename=key, metadata=metadata)
+        except gridfs.errors.FileExists:
+            # Worker khác vừa lưu cùng nội dung
+            pass
+
+    def open(self, key: str):
+        return self.fs.get(key)
+
+    def delete(self, key: str):
+        self.fs.delete(key)
+
+
+class SubtitleStore:
+    """Content-addressed, compressed storage for downloaded subtitle files.
+
+    A blob is keyed by video id and the sha256 of the raw file, so re-crawling
+    a video whose transcript did not change stores nothing new. Blobs are
+    compressed with zstd when the ``zstandard`` package is installed, gzip
+    otherwise, and are read back as a decompressed text stream so the chunker
+    never needs the raw file on local disk.
+    """
+
+    def __init__(self, backend, compression: str = COMPRESSION_GZIP, keep_raw: bool = False):
+        if compression == COMPRESSION_ZSTD and _zstandard() is None:
+            logger.warning("⚠️ zstandard is not installed, subtitle blobs fall back to gzip")
+            compression = COMPRESSION_GZIP
+        self.backend = backend
+        self.compression = compression
+        self.keep_raw = keep_raw
+
+    @staticmethod
+    def blob_key(video_key: str, content_hash: str, ext: str, compression: str) -> str:
+        suffix = 'zst' if compression == COMPRESSION_ZSTD else 'gz'
+        return f"{video_key[:2]}/{video_key}/{content_hash}.{ext}.{suffix}"
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == COMPRESSION_ZSTD:
+            return _zstandard().ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    def store_file(self, video_key: str, path: str) -> Dict[str, Any]:
+        """Store the subtitle file at ``path``; returns the fields to save on the srt_files document"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+        ext = path.rsplit('.', 1)[-1].lower()
+        key = self.blob_key(video_key, content_hash, ext, self.compression)
+
+        deduplicated = self.backend.exists(key)
+        stored_size = None
+        if not deduplicated:
+            blob = self._compress(data)
+            stored_size = len(blob)
+            self.backend.put(key, blob, {'video_key': video_key, 'content_hash': content_hash, 'format': ext})
+
+        if not self.keep_raw:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"⚠️ Could not remove raw subtitle file {path}: {str(e)}")
+
+        logger.info(f"🗄️ Subtitle {video_key} stored as {key} ({'deduplicated' if deduplicated else f'{len(data)} -> {stored_size} bytes'})")
+        return {
+            'blob_key': key,
+            'content_hash': content_hash,
+            'subtitle_format': ext,
+            'storage': {
+                'backend': self.backend.name,
+                'compression': self.compression,
+                'size': len(data),
+                'stored_size': stored_size,
+                'deduplicated': deduplicated
+            }
+        }
+
+    @contextmanager
+    def open_text(self, srt_doc: Dict[str, Any]) -> Iterator[io.TextIOBase]:
+        """Decompressed text stream of a stored subtitle (raw ``srt_file_path`` for documents saved before the store)"""
+        blob_key = srt_doc.get('blob_key')
+        if not blob_key:
+            with open(srt_doc['srt_file_path'], 'r', encoding='utf-8-sig') as f:
+                yield f
+            return
+
+        compression = (srt_doc.get('storage') or {}).get('compression', COMPRESSION_GZIP)
+        raw = self.backend.open(blob_key)
+        try:
+            if compression == COMPRESSION_ZSTD:
+                stream = _zstandard().ZstdDecompressor().stream_reader(raw)
+            else:
+                stream = gzip.GzipFile(fileobj=raw, mode='rb')
+            with io.TextIOWrapper(stream, encoding='utf-8-sig') as text:
+                yield text
+        finally:
+            raw.close()
+
+    def is_available(self, srt_doc: Dict[str, Any]) -> bool:
+        if srt_doc.get('blob_key'):
+            return self.backend.exists(srt_doc['blob_key'])
+        return bool(srt_doc.get('srt_file_path')) and os.path.exists(srt_doc['srt_file_path'])
+
+    def release(self, srt_doc: Dict[str, Any]):
+        """Delete the blob (or legacy raw file) of a removed srt_files document once nothing references it"""
+        blob_key = srt_doc.get('blob_key')
+        try:
+            if blob_key:
+                if get_mongo().db.srt_files.count_documents({'blob_key': blob_key}, limit=1) == 0:
+                    self.backend.delete(blob_key)
+            elif srt_doc.get('srt_file_path') and os.path.exists(srt_doc['srt_file_path']):
+                os.remove(srt_doc['srt_file_path'])
+        except Exception as e:
+            logger.warning(f"⚠️ Could not release subtitle {blob_key or srt_doc.get('srt_file_path')}: {str(e)}")
+
+
+def _create_store() -> SubtitleStore:
+    backend_name = os.getenv('SUBTITLE_STORE_BACKEND', 'local').lower()
+    if backend_name == 'gridfs':
+        backend = GridFSSubtitleBackend(os.getenv('SUBTITLE_STORE_GRIDFS_BUCKET', 'subtitle_blobs'))
+    else:
+        backend = LocalSubtitleBackend(os.getenv('SUBTITLE_STORE_DIR', 'subtitle_store'))
+    return SubtitleStore(
+        backend,
+        compression=os.getenv('SUBTITLE_STORE_COMPRESSION', COMPRESSION_ZSTD).lower(),
+        keep_raw=os.getenv('SUBTITLE_KEEP_RAW', 'false').lower() in ('1', 'true', 'yes')
+    )
+
+
+# Global instance
+subtitle_store = _create_store()
@@ -0,0 +1,250 @@
+import json
+import logging
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+from app import get_mongo
+
+logger = logging.getLogger(__name__)
+
+# Các cặp key home/away thường gặp trong payload webhook
+TEAM_KEY_PAIRS = [
+    ('home_team', 'away_team'),
+    ('homeTeam', 'awayTeam'),
+    ('home', 'away'),
+    ('team_home', 'team_away'),
+    ('localteam', 'visitorteam'),
+]
+
+# Các key chứa tên / biệt danh khi team là một dict
+TEAM_NAME_KEYS = ['name', 'team_name', 'teamName']
+TEAM_ALIAS_KEYS = ['shortName', 'short_name', 'shortname', 'code', 'tla', 'abbreviation', 'nickname']
+
+
+def normalize_team_name(name: str) -> str:
+    return re.sub(r'\s+', ' ', str(name)).strip().lower()
+
+
+def _dedupe_names(names: Iterable[str]) -> List[str]:
+    seen = set()
+    result = []
+    for name in names:
+        if not name or not str(name).strip():
+            continue
+        key = normalize_team_name(name)
+        if key not in seen:
+            seen.add(key)
+            result.append(str(name).strip())
+    return result
+
+
+def _parse_team(value: Any) -> Optional[Dict[str, Any]]:
+    """Turn a home/away value (string or dict) into {'name', 'aliases'}"""
+    if isinstance(value, str):
+        name = value.strip()
+        return {'name': name, 'aliases': []} if name else None
+
+    if isinstance(value, dict):
+        name = next((value[k] for k in TEAM_NAME_KEYS if isinstance(value.get(k), str) and value[k].strip()), None)
+        if name is None:
+            return None
+        aliases = [value[k] for k in TEAM_ALIAS_KEYS if isinstance(value.get(k), str)]
+        return {'name': name.strip(), 'aliases': _dedupe_names(a for a in aliases if normalize_team_name(a) != normalize_team_name(name))}
+
+    return None
+
+
+def extract_teams_from_match(match: Any) -> List[Dict[str, Any]]:
+    """Read home/away teams from a structured match dict without calling the LLM"""
+    if not isinstance(match, dict):
+        return []
+
+    for home_key, away_key in TEAM_KEY_PAIRS:
+        if home_key in match and away_key in match:
+            home = _parse_team(match[home_key])
+            away = _parse_team(match[away_key])
+            if home and away:
+                return [home, away]
+
+    teams = match.get('teams')
+    if isinstance(teams, dict):
+        return extract_teams_from_match(teams)
+    if isinstance(teams, list) and len(teams) == 2:
+        parsed = [_parse_team(team) for team in teams]
+        if all(parsed):
+            return parsed
+
+    return []
+
+
+def extract_teams_from_requests(requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Look for team names in match_details.match / match_data of the requests, newest first"""
+    for req in requests:
+        match_details = req.get('match_details') or {}
+        candidates = [
+            match_details.get('match') if isinstance(match_details, dict) else None,
+            match_details,
+            req.get('match_data'),
+            req.get('info'),
+        ]
+        for candidate in candidates:
+            teams = extract_teams_from_match(candidate)
+            if teams:
+                return teams
+    return []
+
+
+def _team_from_names(names: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(names, str):
+        names = [names]
+    if not isinstance(names, list):
+        return None
+    names = _dedupe_names(name for name in names if isinstance(name, str))
+    if not names:
+        return None
+    return {'name': names[0], 'aliases': names[1:]}
+
+
+def parse_groq_teams(text: str) -> List[Dict[str, Any]]:
+    """Parse Groq's ``{"home": [name, aliases...], "away": [...]}`` answer into two teams.
+
+    Returns [] when the answer is not that shape or the two teams overlap, so
+    names that cannot be attributed to one team are never learned as aliases.
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(data, dict):
+        return []
+    home = _team_from_names(data.get('home'))
+    away = _team_from_names(data.get('away'))
+    if not home or not away:
+        return []
+    home_keys = {normalize_team_name(name) for name in [home['name']] + home['aliases']}
+    away_keys = {normalize_team_name(name) for name in [away['name']] + away['aliases']}
+    if home_keys & away_keys:
+        return []
+    return [home, away]
+
+
+def groq_team_name_list(text: str) -> List[str]:
+    """Every team name in a Groq answer that ``parse_groq_teams`` rejected, for search only.
+
+    A JSON answer is flattened from its ``home`` / ``away`` lists; anything
+    else is read as the legacy comma-separated list.
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return _dedupe_names(name.strip() for name in str(text or '').split(','))
+    if not isinstance(data, dict):
+        return []
+    names = []
+    for side in ('home', 'away'):
+        value = data.get(side)
+        names.extend([value] if isinstance(value, str) else value if isinstance(value, list) else [])
+    return _dedupe_names(name for name in names if isinstance(name, str))
+
+
+class TeamNameStore:
+    """Persistent alias dictionary (`team_aliases`) and per-fixture cache (`team_name_cache`)"""
+
+    def __init__(self):
+        self._indexes_ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def db(self):
+        return get_mongo().db
+
+    def ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        with self._lock:
+            if self._indexes_ready:
+                return
+            self.db.team_aliases.create_index([('normalized', ASCENDING)], unique=True)
+            self.db.team_aliases.create_index([('aliases_normalized', ASCENDING)])
+            self.db.team_name_cache.create_index([('fixture_id', ASCENDING)], unique=True)
+            self._indexes_ready = True
+
+    # ------------------------------------------------------------------
+    # Per-fixture cache
+    # ------------------------------------------------------------------
+
+    def get_cached(self, fixture_id) -> Optional[Dict[str, Any]]:
+        self.ensure_indexes()
+        return self.db.team_name_cache.find_one({'fixture_id': fixture_id}, {'_id': 0})
+
+    def cache(self, fixture_id, teams: List[Dict[str, Any]], team_names: List[str], source: str):
+        self.ensure_indexes()
+        self.db.team_name_cache.update_one(
+            {'fixture_id': fixture_id},
+            {
+                '$set': {
+                    'teams': teams,
+                    'team_names': team_names,
+                    'source': source,
+                    'updated_at': datetime.utcnow()
+                },
+                '$setOnInsert': {'created_at': datetime.utcnow()}
+            },
+            upsert=True
+        )
+
+    # ------------------------------------------------------------------
+    # Alias dictionary
+    # ------------------------------------------------------------------
+
+    def _find_team(self, name: str) -> Optional[Dict[str, Any]]:
+        key = normalize_team_name(name)
+        return self.db.team_aliases.find_one({'$or': [{'normalized': key}, {'aliases_normalized': key}]})
+
+    def learn(self, teams: List[Dict[str, Any]], source: str):
+        """Merge team names and aliases into the dictionary so later fixtures can reuse them"""
+        self.ensure_indexes()
+        for team in teams:
+            existing = self._find_team(team['name'])
+            canonical = existing['name'] if existing else team['name']
+            # Tên gọi khác với tên chuẩn đã biết cũng được học như một alias
+            aliases = [a for a in [team['name']] + team.get('aliases', [])
+                       if normalize_team_name(a) != normalize_team_name(canonical)]
+            self.db.team_aliases.update_one(
+                {'normalized': normalize_team_name(canonical)},
+                {
+                    '$set': {'updated_at': datetime.utcnow()},
+                    '$setOnInsert': {'name': canonical, 'created_at': datetime.utcnow()},
+                    '$addToSet': {
+                        'aliases': {'$each': aliases},
+                        'aliases_normalized': {'$each': [normalize_team_name(a) for a in aliases]},
+                        'sources': source
+                    }
+                },
+                upsert=True
+            )
+
+    def expand(self, teams: List[Dict[str, Any]]) -> List[str]:
+        """Flatten teams into [name, aliases..., name, aliases...] enriched from the dictionary"""
+        names = []
+        for team in teams:
+            names.append(team['name'])
+            names.extend(team.get('aliases', []))
+            try:
+                known = self._find_team(team['name'])
+            except PyMongoError as e:
+                logger.warning(f"⚠️ Could not read team aliases for {team['name']}: {str(e)}")
+                known = None
+            if known:
+                names.append(known['name'])
+                names.extend(known.get('aliases', []))
+        return _dedupe_names(names)
+
+
+# Global instance
+team_name_store = TeamNameStore()
@@ -0,0 +1,357 @@
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from app import get_mongo
+
+logger = logging.getLogger(__name__)
+
+# YouTube Data API cho phép tối đa 50 item / request (playlistItems.list, videos.list)
+YOUTUBE_PAGE_SIZE = 50
+
+# Số video tối đa mỗi lần crawl (0 = toàn bộ uploads playlist)
+DEFAULT_MAX_VIDEOS = int(os.getenv('YOUTUBE_CRAWL_MAX_VIDEOS', 10))
+
+# Refresh view_count / like_count chỉ cho video đăng trong N ngày gần đây
+STATS_REFRESH_DAYS = int(os.getenv('YOUTUBE_STATS_REFRESH_DAYS', 7))
+STATS_REFRESH_LIMIT = int(os.getenv('YOUTUBE_STATS_REFRESH_LIMIT', 500))
+
+SYNC_MODE_FULL = 'full'
+SYNC_MODE_INCREMENTAL = 'incremental'
+SYNC_MODES = [SYNC_MODE_FULL, SYNC_MODE_INCREMENTAL]
+
+# Chỉ lấy các field cần dùng để giảm kích thước response
+PLAYLIST_ITEM_FIELDS = 'etag,nextPageToken,items(snippet(title,description,publishedAt,resourceId/videoId,thumbnails/high/url))'
+VIDEO_DETAIL_FIELDS = 'items(id,statistics(viewCount,likeCount),contentDetails/duration)'
+VIDEO_STATS_FIELDS = 'items(id,statistics(viewCount,likeCount))'
+
+
+class YouTubeConfigError(Exception):
+    """YouTube API key hoặc client library chưa được cấu hình"""
+
+
+def get_youtube_client():
+    API_KEY = os.getenv('YOUTUBE_API_KEY')
+    if not API_KEY:
+        raise YouTubeConfigError('YouTube API key not configured. Please set YOUTUBE_API_KEY environment variable.')
+    try:
+        from googleapiclient.discovery import build
+    except ImportError as e:
+        raise YouTubeConfigError(f'Google API client not installed: {str(e)}')
+    return build('youtube', 'v3', developerKey=API_KEY, cache_discovery=False)
+
+
+def video_url_for(video_id: str) -> str:
+    return f'https://www.youtube.com/watch?v={video_id}'
+
+
+def get_uploads_playlist_id(youtube, channel_id: str) -> str:
+    channel_response = youtube.channels().list(
+        part='contentDetails',
+        id=channel_id
+    ).execute()
+
+    if 'items' not in channel_response or not channel_response['items']:
+        raise LookupError('Channel not found')
+
+    return channel_response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+
+
+def _parse_published_at(value: str) -> datetime:
+    # Lưu dạng UTC naive như các datetime khác (datetime.utcnow) để so sánh được với giá trị đọc từ Mongo
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _is_not_modified(error: Exception) -> bool:
+    response = getattr(error, 'resp', None)
+    return getattr(response, 'status', None) == 304
+
+
+def fetch_video_details(youtube, video_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Statistics and duration for ``video_ids``, one videos.list call per 50 ids"""
+    details = {}
+    for start in range(0, len(video_ids), YOUTUBE_PAGE_SIZE):
+        batch = video_ids[start:start + YOUTUBE_PAGE_SIZE]
+        response = youtube.videos().list(
+            part='statistics,contentDetails',
+            id=','.join(batch),
+            maxResults=YOUTUBE_PAGE_SIZE,
+            fields=VIDEO_DETAIL_FIELDS
+        ).execute()
+        for item in response.get('items', []):
+            statistics = item.get('statistics', {})
+            details[item['id']] = {
+                'view_count': int(statistics.get('viewCount', 0)),
+                'like_count': int(statistics.get('likeCount', 0)),
+                'duration': item.get('contentDetails', {}).get('duration', '')
+            }
+    return details
+
+
+def _parse_playlist_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    snippet = item['snippet']
+    video_id = snippet['resourceId']['videoId']
+    return {
+        'title': snippet['title'],
+        'url': video_url_for(video_id),
+        'video_id': video_id,
+        'description': snippet.get('description', ''),
+        'thumbnail_url': snippet.get('thumbnails', {}).get('high', {}).get('url', ''),
+        'published_at': _parse_published_at(snippet['publishedAt'])
+    }
+
+
+def save_new_videos(channel_id: str, videos: List[Dict[str, Any]], details: Dict[str, Dict[str, Any]]) -> int:
+    """Insert videos that do not exist yet with one unordered bulk_write of upserts; returns inserted count"""
+    if not videos:
+        return 0
+    now = datetime.utcnow()
+    operations = []
+    for video in videos:
+        video_details = details.get(video['video_id'], {})
+        video_doc = {
+            'url': video['url'],
+            'channel_id': channel_id,
+            'title': video['title'],
+            'description': video['description'],
+            'video_id': video['video_id'],
+            'thumbnail_url': video['thumbnail_url'],
+            'duration': video_details.get('duration', ''),
+            'view_count': video_details.get('view_count', 0),
+            'like_count': video_details.get('like_count', 0),
+            'published_at': video['published_at'],
+            'status': 0,  # pending
+            'created_at': now,
+            'updated_at': now
+        }
+        # $setOnInsert: không ghi đè video đã có nếu một crawl khác vừa chèn cùng url
+        operations.append(UpdateOne({'url': video['url']}, {'$setOnInsert': video_doc}, upsert=True))
+
+    result = get_mongo().db.videos.bulk_write(operations, ordered=False)
+    return result.upserted_count
+
+
+def crawl_channel_videos(channel_id: str, max_videos: Optional[int] = None,
+                         mode: str = SYNC_MODE_FULL) -> Dict[str, Any]:
+    """
+    Đi qua uploads playlist của channel (50 item / trang) và lưu các video chưa có vào MongoDB.
+    max_videos: số video tối đa (mặc định YOUTUBE_CRAWL_MAX_VIDEOS, 0 = không giới hạn); mode='full' tính
+    theo số video duyệt (N video mới nhất), mode='incremental' tính theo số video mới được lưu.
+    mode='incremental': gửi If-None-Match với ETag của trang đầu, dừng phân trang khi gặp video đã biết
+    cũ hơn watermark rồi đi tiếp phần playlist chưa crawl (backfill) từ youtube_channels.sync_state.
+
+    sync_state mô tả đoạn đầu playlist đã lưu liên tục: last_published_at (watermark) là video mới nhất
+    của đoạn đó, backfill_page_token là trang ngay sau đoạn đó và backfill_complete = đoạn đó đã tới cuối
+    playlist. Watermark / ETag chỉ tiến lên khi lần chạy nối được với đoạn đã lưu (hoặc tới cuối playlist),
+    nên một lần crawl bị max_videos cắt ngang không làm các lần incremental sau bỏ sót video cũ hơn;
+    ETag chỉ được dùng khi đã backfill xong.
+    Raise LookupError nếu channel không tồn tại, YouTubeConfigError nếu thiếu cấu hình.
+    """
+    if mode not in SYNC_MODES:
+        raise ValueError(f'Invalid sync mode, expected one of {SYNC_MODES}')
+    max_videos = DEFAULT_MAX_VIDEOS if max_videos is None else max_videos
+    youtube = get_youtube_client()
+    mongo = get_mongo()
+
+    channel = mongo.db.youtube_channels.find_one({'channel_id': channel_id}, {'uploads_playlist_id': 1, 'sync_state': 1}) or {}
+    sync_state = channel.get('sync_state') or {}
+    incremental = mode == SYNC_MODE_INCREMENTAL
+    watermark = sync_state.get('last_published_at')
+    backfill_complete = bool(sync_state.get('backfill_complete'))
+    # Chưa có đoạn nào được lưu theo sync_state: lần chạy này bắt đầu đoạn đầu playlist
+    fresh = watermark is None and not backfill_complete
+
+    # uploads playlist id không đổi: cache lại để tiết kiệm một lần gọi channels.list
+    playlist_id = channel.get('uploads_playlist_id')
+    stats = {'api_calls': 0, 'pages': 0, 'total_found': 0, 'new_found': 0, 'crawled_count': 0,
+             'newest_published_at': None, 'first_page_etag': None, 'connected': False}
+    if not playlist_id:
+        playlist_id = get_uploads_playlist_id(youtube, channel_id)
+        stats['api_calls'] += 1
+
+    def walk(page_token: Optional[str], stop_at_known: bool):
+        """Crawl pages from ``page_token``; returns (reason, token to resume from): 'end' | 'known' | 'limit' | 'not_modified'"""
+        while True:
+            remaining = None
+            if max_videos:
+                remaining = max_videos - (stats['new_found'] if incremental else stats['total_found'])
+                if remaining <= 0:
+                    return 'limit', page_token
+            page_size = YOUTUBE_PAGE_SIZE if incremental or remaining is None else min(YOUTUBE_PAGE_SIZE, remaining)
+            playlist_request = youtube.playlistItems().list(
+                part='snippet',
+                playlistId=playlist_id,
+                maxResults=page_size,
+                pageToken=page_token,
+                fields=PLAYLIST_ITEM_FIELDS
+            )
+            first_page = page_token is None
+            if first_page and incremental and backfill_complete and sync_state.get('playlist_etag'):
+                # Conditional request: trang đầu không đổi -> 304, channel không có video mới
+                playlist_request.headers['If-None-Match'] = sync_state['playlist_etag']
+
+            stats['api_calls'] += 1
+            try:
+                playlist_response = playlist_request.execute()
+            except Exception as e:
+                if first_page and _is_not_modified(e):
+                    return 'not_modified', None
+                raise
+            stats['pages'] += 1
+            if first_page:
+                stats['first_page_etag'] = playlist_response.get('etag')
+
+            videos = [_parse_playlist_item(item) for item in playlist_response.get('items', [])]
+            if not incremental and remaining is not None:
+                videos = videos[:remaining]
+
+            # Một query $in cho cả trang thay vì find_one cho từng video
+            existing_urls = {
+                doc['url'] for doc in mongo.db.videos.find({'url': {'$in': [v['url'] for v in videos]}}, {'url': 1})
+            }
+            new_videos = [v for v in videos if v['url'] not in existing_urls]
+            truncated = incremental and remaining is not None and len(new_videos) > remaining
+            if truncated:
+                new_videos = new_videos[:remaining]
+            stats['total_found'] += len(videos)
+            stats['new_found'] += len(new_videos)
+            if videos:
+                page_newest = max(v['published_at'] for v in videos)
+                newest = stats['newest_published_at']
+                stats['newest_published_at'] = max(newest, page_newest) if newest else page_newest
+
+            if new_videos:
+                new_ids = [v['video_id'] for v in new_videos]
+                details = fetch_video_details(youtube, new_ids)
+                stats['api_calls'] += (len(new_ids) + YOUTUBE_PAGE_SIZE - 1) // YOUTUBE_PAGE_SIZE
+                stats['crawled_count'] += save_new_videos(channel_id, new_videos, details)
+
+            if truncated:
+                # Trang này còn video mới chưa lưu: lần sau đọc lại chính trang này
+                return 'limit', page_token
+
+            # Playlist sắp xếp mới nhất trước: gặp video đã biết cũ hơn watermark là đã nối với đoạn đã lưu
+            next_page_token = playlist_response.get('nextPageToken')
+            if watermark is not None and any(
+                v['url'] in existing_urls and v['published_at'] <= watermark for v in videos
+            ):
+                stats['connected'] = True
+                if stop_at_known:
+                    return ('known', next_page_token) if next_page_token else ('end', None)
+            if not next_page_token:
+                return 'end', None
+            page_token = next_page_token
+
+    reason, resume_token = walk(None, stop_at_known=incremental)
+    not_modified = reason == 'not_modified'
+    reached_known = reason == 'known'
+    connected = not not_modified and (reason == 'end' or stats['connected'] or fresh)
+
+    # Đi tiếp phần playlist chưa crawl (từ chỗ lần trước dừng lại)
+    backfill_reason = None
+    if incremental and connected and reason != 'end' and not backfill_complete:
+        # '' = trang đầu (lần trước dừng giữa trang đầu); chưa có token thì đi tiếp từ chỗ vừa dừng
+        start_token = (sync_state['backfill_page_token'] or None) if 'backfill_page_token' in sync_state else resume_token
+        backfill_reason, resume_token = walk(start_token, stop_at_known=False)
+
+    update = {
+        'uploads_playlist_id': playlist_id,
+        'sync_state.last_synced_at': datetime.utcnow(),
+        'sync_state.last_mode': mode,
+        'sync_state.last_new_videos': stats['crawled_count']
+    }
+    unset = {}
+    if connected:
+        newest_published_at = stats['newest_published_at']
+        if newest_published_at and (watermark is None or newest_published_at > watermark):
+            update['sync_state.last_published_at'] = newest_published_at
+        if stats['first_page_etag']:
+            update['sync_state.playlist_etag'] = stats['first_page_etag']
+        if reason == 'end' or backfill_reason == 'end':
+            backfill_complete = True
+            update['sync_state.backfill_complete'] = True
+            unset['sync_state.backfill_page_token'] = ''
+        elif backfill_reason == 'limit' or (fresh and reason == 'limit'):
+            update['sync_state.backfill_page_token'] = resume_token or ''
+    changes = {'$set': update}
+    if unset:
+        changes['$unset'] = unset
+    mongo.db.youtube_channels.update_one({'channel_id': channel_id}, changes)
+
+    logger.info(f"📺 Channel {channel_id} ({mode}): scanned {stats['total_found']} videos in {stats['pages']} pages, "
+                f"{stats['crawled_count']} new, {stats['api_calls']} API calls{' (not modified)' if not_modified else ''}"
+                f"{'' if backfill_complete else ' (backfill incomplete)'}")
+    return {
+        'mode': mode,
+        'crawled_count': stats['crawled_count'],
+        'total_found': stats['total_found'],
+        'pages': stats['pages'],
+        'api_calls': stats['api_calls'],
+        'not_modified': not_modified,
+        'reached_known': reached_known,
+        'backfill_complete': backfill_complete
+    }
+
+
+def is_backfill_complete(channel_id: str) -> bool:
+    """True once a crawl of the channel has reached the end of its uploads playlist"""
+    channel = get_mongo().db.youtube_channels.find_one({'channel_id': channel_id}, {'sync_state.backfill_complete': 1}) or {}
+    return bool((channel.get('sync_state') or {}).get('backfill_complete'))
+
+
+def refresh_video_stats(channel_id: Optional[str] = None, days: Optional[int] = None,
+                        limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Cập nhật view_count / like_count cho các video đăng trong ``days`` ngày gần đây,
+    50 id mỗi lần gọi videos.list và một bulk_write cho cả batch.
+    """
+    days = STATS_REFRESH_DAYS if days is None else days
+    limit = STATS_REFRESH_LIMIT if limit is None else limit
+    youtube = get_youtube_client()
+    mongo = get_mongo()
+
+    query = {'published_at': {'$gte': datetime.utcnow() - timedelta(days=days)}}
+    if channel_id:
+        query['channel_id'] = channel_id
+    cursor = mongo.db.videos.find(query, {'video_id': 1}).sort('published_at', -1)
+    if limit:
+        cursor = cursor.limit(limit)
+    video_ids = [doc['video_id'] for doc in cursor if doc.get('video_id')]
+
+    updated = 0
+    api_calls = 0
+    for start in range(0, len(video_ids), YOUTUBE_PAGE_SIZE):
+        batch = video_ids[start:start + YOUTUBE_PAGE_SIZE]
+        response = youtube.videos().list(
+            part='statistics',
+            id=','.join(batch),
+            maxResults=YOUTUBE_PAGE_SIZE,
+            fields=VIDEO_STATS_FIELDS
+        ).execute()
+        api_calls += 1
+
+        now = datetime.utcnow()
+        operations = []
+        for item in response.get('items', []):
+            statistics = item.get('statistics', {})
+            operations.append(UpdateOne(
+                {'url': video_url_for(item['id'])},
+                {'$set': {
+                    'view_count': int(statistics.get('viewCount', 0)),
+                    'like_count': int(statistics.get('likeCount', 0)),
+                    'stats_updated_at': now
+                }}
+            ))
+        if operations:
+            updated += mongo.db.videos.bulk_write(operations, ordered=False).modified_count
+
+    logger.info(f"📈 Refreshed stats for {updated}/{len(video_ids)} videos ({api_calls} API calls)")
+    return {
+        'videos_checked': len(video_ids),
+        'updated_count': updated,
+        'api_calls': api_calls,
+        'days': days
+    }
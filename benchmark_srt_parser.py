@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming subtitle parser + sentence chunker against the previous pysrt-based chunking
+"""
+
+import os
+import sys
+import glob
+import time
+import tracemalloc
+
+import pysrt
+
+from subtitle_parser import chunk_subtitle_file
+from text_chunker import estimate_tokens
+
+
+def legacy_process_srt_file(srt_file_path, max_words=350):
+    """Previous implementation of app.routes.process_srt_file (pysrt object model)"""
+    subs = pysrt.open(srt_file_path, encoding='utf-8')
+    chunks_data = []
+    current_chunk_captions = []
+    current_word_count = 0
+
+    for caption in subs:
+        caption_text = caption.text.replace('\n', ' ')
+        caption_word_count = len(caption_text.split())
+
+        if caption_word_count > max_words:
+            if current_chunk_captions:
+                full_chunk_text = " ".join([c.text.replace('\n', ' ') for c in current_chunk_captions])
+                chunks_data.append({'text': full_chunk_text, 'time': str(current_chunk_captions[0].start)})
+                current_chunk_captions = []
+                current_word_count = 0
+            words = caption_text.split()
+            for i in range(0, len(words), max_words):
+                chunks_data.append({'text': " ".join(words[i:i + max_words]), 'time': str(caption.start)})
+            continue
+
+        if current_word_count + caption_word_count > max_words and current_chunk_captions:
+            full_chunk_text = " ".join([c.text.replace('\n', ' ') for c in current_chunk_captions])
+            chunks_data.append({'text': full_chunk_text, 'time': str(current_chunk_captions[0].start)})
+            current_chunk_captions = [caption]
+            current_word_count = caption_word_count
+        else:
+            current_chunk_captions.append(caption)
+            current_word_count += caption_word_count
+
+    if current_chunk_captions:
+        full_chunk_text = " ".join([c.text.replace('\n', ' ') for c in current_chunk_captions])
+        chunks_data.append({'text': full_chunk_text, 'time': str(current_chunk_captions[0].start)})
+
+    return chunks_data
+
+
+def measure(func, files, rounds):
+    """Return (best seconds for one pass over files, peak traced memory in bytes, results of last pass)"""
+    best = None
+    results = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        results = [func(path) for path in files]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    for path in files:
+        func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, results
+
+
+def covers(old_chunks, new_chunks):
+    """True when every word of the old chunks appears, in order, in the new chunks (overlap only repeats words)"""
+    new_words = iter(word for chunk in new_chunks for word in chunk['text'].split())
+    return all(any(word == candidate for candidate in new_words)
+               for chunk in old_chunks for word in chunk['text'].split())
+
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else 'srt_files'
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    max_tokens = int(sys.argv[3]) if len(sys.argv) > 3 else 222
+    files = sorted(glob.glob(os.path.join(folder, '*.srt')))
+    if not files:
+        print(f"❌ No .srt files found in {folder}")
+        return 1
+
+    print("⏱️ Benchmarking SRT chunking")
+    print("=" * 50)
+    print(f"📁 {len(files)} files, {sum(os.path.getsize(f) for f in files) / 1024:.0f} KB, best of {rounds} rounds")
+
+    legacy_seconds, legacy_peak, legacy_results = measure(legacy_process_srt_file, files, rounds)
+    # Không dedupe, không overlap để so sánh nội dung với cách cũ
+    def streaming(path):
+        return chunk_subtitle_file(path, max_tokens, 0, estimate_tokens, dedupe=False)
+
+    stream_seconds, stream_peak, stream_results = measure(streaming, files, rounds)
+
+    print(f"pysrt     : {legacy_seconds * 1000:8.1f} ms, peak {legacy_peak / 1024:8.0f} KB")
+    print(f"streaming : {stream_seconds * 1000:8.1f} ms, peak {stream_peak / 1024:8.0f} KB")
+    print(f"🚀 Speedup: {legacy_seconds / stream_seconds:.2f}x")
+
+    print(f"📦 Chunks: {sum(map(len, legacy_results))} (350 words) vs {sum(map(len, stream_results))} ({max_tokens} tokens)")
+
+    # Chunk mới theo câu nên ranh giới khác, nhưng không được mất chữ nào
+    missing = 0
+    for path, old_chunks, new_chunks in zip(files, legacy_results, stream_results):
+        if not covers(old_chunks, new_chunks):
+            missing += 1
+            print(f"⚠️ Text lost in {path}")
+
+    if missing:
+        print(f"❌ {missing} files lost text")
+        return 1
+    print("✅ All caption text is covered")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
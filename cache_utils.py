@@ -0,0 +1,206 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Small thread-safe in-process LRU cache"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._data.get(key)
+                if value is None:
+                    self.misses += 1
+                    continue
+                self._data.move_to_end(key)
+                self.hits += 1
+                found[key] = value
+        return found
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def put_many(self, items: Dict[Hashable, Any]):
+        for key, value in items.items():
+            self.put(key, value)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+
+class TTLCache(LRUCache):
+    """LRU cache whose entries also expire ``ttl_seconds`` after being stored"""
+
+    def __init__(self, max_size: int = 1000, ttl_seconds: float = 60):
+        super().__init__(max_size)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = super().get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self.pop(key)
+            with self._lock:
+                # Tính là miss, không phải hit
+                self.hits -= 1
+                self.misses += 1
+            return None
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.ttl_seconds <= 0:
+            return
+        super().put(key, (time.monotonic() + self.ttl_seconds, value))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), 'ttl_seconds': self.ttl_seconds}
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key: one caller runs the function, the others wait for its result"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call['event'].set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {'executed': self.executed, 'coalesced': self.coalesced, 'in_flight': in_flight}
+
+
+class RedisCache:
+    """Shared byte cache on a Redis-compatible server; every error is logged and treated as a miss (fail open)"""
+
+    def __init__(self, url: str, prefix: str, ttl_seconds: int = 0):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=float(os.getenv('REDIS_SOCKET_TIMEOUT', 0.2)))
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            value = self.client.get(self.prefix + key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Redis get failed: {str(e)}")
+            return None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes):
+        try:
+            self.client.set(self.prefix + key, value, ex=self.ttl_seconds or None)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Redis set failed: {str(e)}")
+
+    def incr(self, key: str) -> Optional[int]:
+        try:
+            return int(self.client.incr(self.prefix + key))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Redis incr failed: {str(e)}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {'prefix': self.prefix, 'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+
+
+def create_redis_cache(prefix: str, ttl_seconds: int = 0) -> Optional[RedisCache]:
+    """RedisCache on REDIS_URL, or None when it is not configured or the redis package is missing"""
+    url = os.getenv('REDIS_URL', '').strip()
+    if not url:
+        return None
+    try:
+        return RedisCache(url, prefix, ttl_seconds)
+    except ImportError:
+        logger.warning("⚠️ REDIS_URL is set but the redis package is not installed, using in-process caches only")
+        return None
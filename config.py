@@ -29,6 +29,9 @@ class Config:
     
     # Sentence Transformer Model Configuration
     SENTENCE_TRANSFORMER_MODEL = os.getenv('SENTENCE_TRANSFORMER_MODEL', 'all-MiniLM-L6-v2')
+    ARTICLES_EMBEDDING_MODEL = os.getenv('ARTICLES_EMBEDDING_MODEL', 'all-distilroberta-v1')
+    ARTICLES_ES_HOST = os.getenv('ARTICLES_ES_HOST', 'http://37.27.181.54:9200')
+    EMBEDDING_WARMUP = os.getenv('EMBEDDING_WARMUP', '')
     
 # Groq API Configuration
 GROQ_KEY = os.getenv('GROQ_KEY', '')
@@ -1,17 +1,201 @@
 import os
+import base64
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import streaming_bulk
 import json
+from embedding_service import embedding_service, EmbeddingModelError, normalize_text
+from cache_utils import TTLCache, SingleFlight
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Số lỗi tối đa giữ lại trong kết quả bulk (tránh response quá lớn)
+MAX_REPORTED_BULK_ERRORS = 20
+
+
+def chunk_doc_id(url: str, chunk_index: int) -> str:
+    """Deterministic document id for chunk ``chunk_index`` of ``url`` so re-indexing overwrites instead of duplicating"""
+    return hashlib.sha1(f"{url}#{chunk_index}".encode('utf-8')).hexdigest()
+
+
+def bulk_index(es: Elasticsearch, actions: List[Dict[str, Any]], chunk_size: int = 500,
+               refresh: bool = False) -> Dict[str, Any]:
+    """Send index actions through ``streaming_bulk`` and report per-item failures instead of raising"""
+    indexed_count = 0
+    errors = []
+    for ok, item in streaming_bulk(es, actions, chunk_size=chunk_size, refresh=refresh,
+                                   raise_on_error=False, raise_on_exception=False):
+        if ok:
+            indexed_count += 1
+            continue
+        op_result = next(iter(item.values()), {})
+        errors.append({
+            '_id': op_result.get('_id'),
+            'status': op_result.get('status'),
+            'error': op_result.get('error') if isinstance(op_result.get('error'), (str, dict)) else str(op_result.get('error'))
+        })
+
+    if errors:
+        logger.warning(f"⚠️ Bulk indexing: {len(errors)} of {indexed_count + len(errors)} documents failed")
+    return {
+        'indexed_count': indexed_count,
+        'failed_count': len(errors),
+        'errors': errors[:MAX_REPORTED_BULK_ERRORS]
+    }
+
+
+def delete_stale_docs(es: Elasticsearch, index: str, url: str, keep_ids: List[str], field: str = 'url') -> int:
+    """Delete documents whose ``field`` equals ``url`` that are not part of the freshly indexed id set"""
+    query = {
+        "query": {
+            "bool": {
+                "filter": [{"term": {field: url}}],
+                "must_not": [{"ids": {"values": keep_ids}}]
+            }
+        }
+    }
+    response = es.delete_by_query(index=index, body=query, conflicts='proceed')
+    return response.get('deleted', 0)
+
+# Hybrid search: kNN + BM25, trộn bằng reciprocal rank fusion hoặc điểm có trọng số
+SEARCH_MODE_HYBRID = 'hybrid'
+SEARCH_MODE_SEMANTIC = 'semantic'
+SEARCH_MODE_KEYWORD = 'keyword'
+SEARCH_MODES = (SEARCH_MODE_HYBRID, SEARCH_MODE_SEMANTIC, SEARCH_MODE_KEYWORD)
+FUSION_RRF = 'rrf'
+FUSION_WEIGHTED = 'weighted'
+FUSION_METHODS = (FUSION_RRF, FUSION_WEIGHTED)
+SEARCH_RRF_RANK_CONSTANT = int(os.getenv('SEARCH_RRF_RANK_CONSTANT', 60))
+# Trọng số của kNN khi fusion=weighted (BM25 nhận phần còn lại)
+SEARCH_HYBRID_ALPHA = float(os.getenv('SEARCH_HYBRID_ALPHA', 0.5))
+# num_candidates = k * factor, kẹp trong [min, max] (ES giới hạn 10000)
+SEARCH_NUM_CANDIDATES_FACTOR = int(os.getenv('SEARCH_NUM_CANDIDATES_FACTOR', 10))
+SEARCH_MIN_NUM_CANDIDATES = int(os.getenv('SEARCH_MIN_NUM_CANDIDATES', 100))
+SEARCH_MAX_NUM_CANDIDATES = 10000
+# Độ sâu tối đa (offset + size) một trang có thể yêu cầu
+SEARCH_MAX_DEPTH = int(os.getenv('SEARCH_MAX_DEPTH', 1000))
+SEARCH_TITLE_BOOST = float(os.getenv('SEARCH_TITLE_BOOST', 0.5))
+
+# Schema kết quả của /api/search: key trả về -> (field trong ES, giá trị mặc định). Không bao giờ có 'vector'
+SEARCH_RESULT_FIELDS = {
+    'url_channel': ('url_channel', ''),
+    'url': ('url', ''),
+    'origin_content': ('origin_content', ''),
+    'time': ('time', ''),
+    'video_id': ('video_id', ''),
+    'chunk_id': ('chunk_id', ''),
+    'start_time': ('start_time', 0),
+    'end_time': ('end_time', 0),
+    'duration': ('duration', 0),
+    'chunk_index': ('chunk_index', 0),
+    'video_title': ('video_title', ''),
+    'channel_name': ('channel_name', ''),
+    'language': ('language', None),
+}
+# Không phải field của document: highlight của nhánh BM25 (chỉ request highlight khi cần)
+SEARCH_HIGHLIGHTS_FIELD = 'highlights'
+# Field keyword / integer đọc được từ doc values (float bị đổi sang double nên vẫn lấy từ _source)
+DOCVALUE_SEARCH_FIELDS = {'url_channel', 'url', 'video_id', 'chunk_id', 'chunk_index', 'channel_name', 'language'}
+SEARCH_DOCVALUE_FIELDS = os.getenv('SEARCH_DOCVALUE_FIELDS', 'false').lower() in ('1', 'true', 'yes')
+SEARCH_SOURCE_EXCLUDES = ['vector'] + [f.strip() for f in os.getenv('SEARCH_SOURCE_EXCLUDES', '').split(',') if f.strip()]
+# Chỉ giữ phần response được dùng (bỏ _index, _shards, metadata của từng hit...)
+SEARCH_FILTER_PATH = ['took', 'hits.total', 'hits.hits._id', 'hits.hits._score', 'hits.hits._source',
+                      'hits.hits.fields', 'hits.hits.highlight']
+MSEARCH_FILTER_PATH = ['took', 'responses.error', 'responses.took'] + [f'responses.{path}' for path in SEARCH_FILTER_PATH[1:]]
+
+
+def search_projection(fields: List[str], use_docvalues: bool = SEARCH_DOCVALUE_FIELDS) -> Dict[str, Any]:
+    """``_source`` includes/excludes (and ``docvalue_fields``) fetching only the result ``fields``"""
+    es_fields = [SEARCH_RESULT_FIELDS[field][0] for field in fields if field in SEARCH_RESULT_FIELDS]
+    docvalue = [field for field in es_fields if use_docvalues and field in DOCVALUE_SEARCH_FIELDS]
+    projection = {
+        "_source": {
+            "includes": [field for field in es_fields if field not in docvalue],
+            "excludes": SEARCH_SOURCE_EXCLUDES
+        }
+    }
+    if not projection["_source"]["includes"]:
+        projection["_source"] = False
+    if docvalue:
+        projection["docvalue_fields"] = docvalue
+    return projection
+
+
+def project_hit(hit: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Result dict with exactly ``fields`` read from ``_source`` or doc values (single-valued)"""
+    source = hit.get('_source') or {}
+    docvalues = hit.get('fields') or {}
+    result = {}
+    for field in fields:
+        if field == SEARCH_HIGHLIGHTS_FIELD:
+            result[field] = hit.get('highlight', {})
+            continue
+        es_field, default = SEARCH_RESULT_FIELDS[field]
+        if es_field in docvalues:
+            result[field] = docvalues[es_field][0]
+        else:
+            value = source.get(es_field)
+            result[field] = default if value is None else value
+    return result
+
+
+def reciprocal_rank_fusion(ranked: Dict[str, List[Dict[str, Any]]], rank_constant: int = 60) -> List[Tuple[str, float]]:
+    """RRF: each list adds 1 / (rank_constant + rank) for every document it returned"""
+    scores: Dict[str, float] = {}
+    for hits in ranked.values():
+        for rank, hit in enumerate(hits, start=1):
+            scores[hit['_id']] = scores.get(hit['_id'], 0.0) + 1.0 / (rank_constant + rank)
+    return list(scores.items())
+
+
+def weighted_fusion(ranked: Dict[str, List[Dict[str, Any]]], weights: Dict[str, float]) -> List[Tuple[str, float]]:
+    """Weighted sum of per-list min-max normalised scores (a document missing from a list gets 0 from it)"""
+    scores: Dict[str, float] = {}
+    for name, hits in ranked.items():
+        if not hits:
+            continue
+        raw = [hit['_score'] or 0.0 for hit in hits]
+        low, high = min(raw), max(raw)
+        for hit, value in zip(hits, raw):
+            normalised = (value - low) / (high - low) if high > low else 1.0
+            scores[hit['_id']] = scores.get(hit['_id'], 0.0) + weights.get(name, 0.0) * normalised
+    return list(scores.items())
+
+
+def encode_search_cursor(state: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_search_cursor(cursor: str) -> Dict[str, Any]:
+    """Parse a ``next_cursor``; raises ValueError when it was not produced by ``encode_search_cursor``"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        offset, (score, doc_id) = int(state['offset']), state['after']
+        return {'offset': offset, 'after': [float(score), str(doc_id)]}
+    except Exception as e:
+        raise ValueError('malformed search cursor') from e
+
+
+# Cache kết quả search theo TTL; bị xóa khi index_chunks / delete_video_chunks ghi vào index
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv('SEARCH_RESULT_CACHE_SIZE', 1000))
+SEARCH_RESULT_CACHE_TTL = int(os.getenv('SEARCH_RESULT_CACHE_TTL', 60))
+
+# Ngôn ngữ phụ đề và model đã embed chunk: vector của các model khác nhau không so sánh được với nhau
+LANGUAGE_FIELDS = {
+    "language": {
+        "type": "keyword"
+    },
+    "embedding_key": {
+        "type": "keyword"
+    }
+}
+
 class ElasticsearchService:
     def __init__(self):
         """Initialize Elasticsearch service with vector embedding capabilities"""
@@ -20,13 +204,18 @@ class ElasticsearchService:
         self.es_user = os.getenv('ELASTICSEARCH_USER', '')
         self.es_password = os.getenv('ELASTICSEARCH_PASSWORD', '')
         self.index_name = os.getenv('ELASTICSEARCH_INDEX', 'video_chunks')
+        # Model embedding lấy từ embedding_service (load lazy, dùng chung trong process)
+        self.embedding_key = 'video_chunks'
+        
+        # Cache kết quả search: LRU + TTL trong process, thêm store dùng chung (Redis) nếu có
+        self.result_cache = TTLCache(SEARCH_RESULT_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL)
+        self.result_store = None
+        self._search_flight = SingleFlight()
+        self._cache_generation = 0
         
         # Initialize Elasticsearch client
         self.es = self._init_elasticsearch()
         
-        # Initialize sentence transformer model
-        self.model = self._init_sentence_transformer()
-        
         # Create index if not exists
         self._create_index()
     
@@ -54,18 +243,12 @@ class ElasticsearchService:
             logger.error(f"❌ Elasticsearch connection error: {str(e)}")
             return None
     
-    def _init_sentence_transformer(self) -> Optional[SentenceTransformer]:
-        """Initialize sentence transformer model for vectorization"""
+    @property
+    def model(self):
+        """Sentence transformer model for this index (loaded on first use), None if it cannot be loaded"""
         try:
-            # Use a lightweight, fast model for production
-            model_name = "all-MiniLM-L6-v2"  # Fast and efficient
-            logger.info(f"🔄 Loading sentence transformer model: {model_name}")
-            
-            model = SentenceTransformer(model_name)
-            logger.info("✅ Sentence transformer model loaded successfully")
-            return model
-        except Exception as e:
-            logger.error(f"❌ Failed to load sentence transformer model: {str(e)}")
+            return embedding_service.get_model(self.embedding_key)
+        except EmbeddingModelError:
             return None
     
     def _create_index(self):
@@ -77,11 +260,16 @@ class ElasticsearchService:
             # Check if index exists
             if self.es.indices.exists(index=self.index_name):
                 logger.info(f"📁 Index '{self.index_name}' already exists")
+                # Index tạo trước khi có phụ đề đa ngôn ngữ: thêm field mới (put_mapping chỉ bổ sung, không reindex)
+                self.es.indices.put_mapping(index=self.index_name, body={'properties': LANGUAGE_FIELDS})
                 return
             
             # Define index mapping with vector field
+            # Một khối settings duy nhất: trước đây khối thứ hai ghi đè khối analysis nên custom_text_analyzer không tồn tại
             mapping = {
                 "settings": {
+                    "number_of_shards": 1,
+                    "number_of_replicas": 0,
                     "analysis": {
                         "analyzer": {
                             "custom_text_analyzer": {
@@ -115,7 +303,7 @@ class ElasticsearchService:
                         },
                         "vector": {
                             "type": "dense_vector",
-                            "dims": 384,  # all-MiniLM-L6-v2 produces 384-dimensional vectors
+                            "dims": embedding_service.dimension(self.embedding_key),
                             "index": True,
                             "similarity": "cosine"
                         },
@@ -148,6 +336,7 @@ class ElasticsearchService:
                         "channel_name": {
                             "type": "keyword"
                         },
+                        **LANGUAGE_FIELDS,
                         "created_at": {
                             "type": "date"
                         },
@@ -155,14 +344,6 @@ class ElasticsearchService:
                             "type": "date"
                         }
                     }
-                },
-                "settings": {
-                    "number_of_shards": 1,
-                    "number_of_replicas": 0,
-                    "index": {
-                        "knn": True,
-                        "knn.algo_param.ef_search": 100
-                    }
                 }
             }
             
@@ -173,14 +354,15 @@ class ElasticsearchService:
         except Exception as e:
             logger.error(f"❌ Failed to create index: {str(e)}")
     
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate vector embeddings for a list of texts"""
-        if not self.model:
-            logger.error("❌ Sentence transformer model not available")
+    def generate_embeddings(self, texts: List[str], embedding_key: Optional[str] = None) -> List[List[float]]:
+        """Generate vector embeddings for a list of texts (with the model of ``embedding_key``, this index's model by default)"""
+        embedding_key = embedding_key or self.embedding_key
+        if not embedding_service.is_available(embedding_key):
+            logger.error(f"❌ Sentence transformer model for '{embedding_key}' not available")
             return []
         
         try:
-            embeddings = self.model.encode(texts, convert_to_tensor=False)
+            embeddings = embedding_service.encode(texts, embedding_key)
             
             # Convert numpy arrays to lists
             embeddings_list = [embedding.tolist() for embedding in embeddings]
@@ -192,7 +374,12 @@ class ElasticsearchService:
             return []
     
     def index_chunks(self, chunks_data: List[Dict[str, Any]], video_info: Dict[str, Any]) -> Dict[str, Any]:
-        """Index video chunks with vector embeddings to Elasticsearch"""
+        """Index video chunks with vector embeddings to Elasticsearch.
+
+        ``video_info['video_id']`` must be the id later passed to ``delete_video_chunks``
+        (the Mongo video _id). After a fully successful bulk, chunks of the video that
+        were not re-indexed (the new subtitle yields fewer chunks) are deleted.
+        """
         if not self.es or not self.model:
             return {
                 'success': False,
@@ -201,6 +388,9 @@ class ElasticsearchService:
             }
         
         try:
+            # Phụ đề không thuộc ngôn ngữ gốc của model được embed bằng model đa ngôn ngữ
+            language = video_info.get('language')
+            embedding_key = embedding_service.key_for_language(self.embedding_key, language)
             
             # Prepare documents for indexing
             documents = []
@@ -231,6 +421,8 @@ class ElasticsearchService:
                         'chunk_index': chunk.get('chunk_index', 0),
                         'video_title': video_info.get('title', ''),
                         'channel_name': video_info.get('channel_name', ''),
+                        'language': language,
+                        'embedding_key': embedding_key,
                         'created_at': datetime.utcnow().isoformat(),
                         'updated_at': datetime.utcnow().isoformat()
                     }
@@ -238,7 +430,7 @@ class ElasticsearchService:
                 documents.append(doc)
             
             # Generate embeddings for all texts
-            embeddings = self.generate_embeddings(texts_for_embedding)
+            embeddings = self.generate_embeddings(texts_for_embedding, embedding_key)
             
             if not embeddings:
                 return {
@@ -252,16 +444,27 @@ class ElasticsearchService:
                 if i < len(embeddings):
                     doc['_source']['vector'] = embeddings[i]  # Sử dụng field name 'vector' theo yêu cầu
             
-            # Bulk index documents
-            success_count, failed_items = bulk(self.es, documents, chunk_size=100)
+            # Bulk index documents (lỗi từng document được trả về, không làm hỏng cả batch)
+            bulk_result = bulk_index(self.es, documents, chunk_size=100)
+            success_count = bulk_result['indexed_count']
+            
+            # Chỉ xóa chunk cũ thừa khi bulk thành công hoàn toàn, tránh mất dữ liệu đang được search
+            deleted_stale = 0
+            if bulk_result['failed_count'] == 0:
+                deleted_stale = delete_stale_docs(self.es, self.index_name, video_info['video_id'],
+                                                  [doc['_id'] for doc in documents], field='video_id')
+            if success_count or deleted_stale:
+                self.invalidate_search_cache()
             
-            logger.info(f"✅ Successfully indexed {success_count} chunks to Elasticsearch")
+            logger.info(f"✅ Successfully indexed {success_count} chunks to Elasticsearch (stale deleted {deleted_stale})")
             
             return {
-                'success': True,
+                'success': bulk_result['failed_count'] == 0,
                 'message': f'Successfully indexed {success_count} chunks',
                 'indexed_count': success_count,
-                'failed_count': len(failed_items) if failed_items else 0
+                'failed_count': bulk_result['failed_count'],
+                'deleted_stale': deleted_stale,
+                'errors': bulk_result['errors']
             }
             
         except Exception as e:
@@ -272,96 +475,277 @@ class ElasticsearchService:
                 'indexed_count': 0
             }
     
+    @staticmethod
+    def _term_or_missing(field: str, value: str, include_missing: bool) -> Dict[str, Any]:
+        if not include_missing:
+            return {"term": {field: value}}
+        return {"bool": {
+            "should": [
+                {"term": {field: value}},
+                {"bool": {"must_not": {"exists": {"field": field}}}}
+            ],
+            "minimum_should_match": 1
+        }}
+    
+    def _search_filters(self, video_id: Optional[str], language: Optional[str],
+                        embedding_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Filters shared by the kNN and BM25 legs; ``embedding_key`` restricts vectors to the query's model"""
+        native = embedding_service.key_for_language(self.embedding_key, language) == self.embedding_key
+        filters = []
+        if embedding_key:
+            # Chỉ so sánh với vector cùng model với query
+            filters.append(self._term_or_missing('embedding_key', embedding_key, include_missing=native))
+        if language:
+            # Chunk index trước khi lưu ngôn ngữ đều là phụ đề tiếng Anh của model gốc
+            filters.append(self._term_or_missing('language', language.lower(), include_missing=native))
+        if video_id:
+            filters.append({"term": {"video_id": video_id}})
+        return filters
+    
+    def _knn_body(self, query_embedding: List[float], k: int, filters: List[Dict[str, Any]],
+                  projection: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "size": k,
+            "knn": {
+                "field": "vector",
+                "query_vector": query_embedding,
+                "k": k,
+                "num_candidates": min(SEARCH_MAX_NUM_CANDIDATES, max(k * SEARCH_NUM_CANDIDATES_FACTOR, SEARCH_MIN_NUM_CANDIDATES)),
+                "filter": filters
+            },
+            **projection
+        }
+    
+    def _bm25_body(self, query: str, k: int, filters: List[Dict[str, Any]],
+                   projection: Dict[str, Any], highlight: bool) -> Dict[str, Any]:
+        body = {
+            "size": k,
+            "query": {
+                "bool": {
+                    "must": [
+                        {
+                            "multi_match": {
+                                "query": query,
+                                "fields": ["origin_content", f"video_title^{SEARCH_TITLE_BOOST}"]
+                            }
+                        }
+                    ],
+                    "filter": filters
+                }
+            },
+            **projection
+        }
+        if highlight:
+            body["highlight"] = {
+                "fields": {
+                    "origin_content": {
+                        "fragment_size": 150,
+                        "number_of_fragments": 3
+                    }
+                }
+            }
+        return body
+    
+    def set_result_store(self, store):
+        """Attach a shared byte cache (get / set / incr, e.g. cache_utils.RedisCache) for search results"""
+        self.result_store = store
+    
+    def invalidate_search_cache(self):
+        """Drop cached search results after the index changed (other workers see the new shared generation)"""
+        self._cache_generation += 1
+        self.result_cache.clear()
+        if self.result_store is not None:
+            self.result_store.incr('generation')
+    
+    def _search_cache_key(self, params: Dict[str, Any]) -> str:
+        shared = self.result_store.get('generation') if self.result_store is not None else None
+        generation = f"{int(shared or 0)}.{self._cache_generation}"
+        payload = json.dumps({**params, 'index': self.index_name, 'generation': generation}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
     def search_chunks(self, query: str, video_id: Optional[str] = None, 
-                     size: int = 10, from_: int = 0) -> Dict[str, Any]:
-        """Search chunks using semantic similarity"""
-        if not self.es or not self.model:
+                     size: int = 10, from_: int = 0, language: Optional[str] = None,
+                     mode: str = SEARCH_MODE_HYBRID, fusion: str = FUSION_RRF,
+                     cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """``_search_chunks`` behind a TTL result cache; identical concurrent searches run once.
+
+        Only successful responses are cached (marked ``cached: True`` when served
+        from the cache); writes through this service invalidate the cache.
+        """
+        params = {
+            'query': normalize_text(query), 'video_id': video_id, 'size': size, 'from': from_,
+            'language': language, 'mode': mode, 'fusion': fusion, 'cursor': cursor, 'fields': fields
+        }
+        cache_key = self._search_cache_key(params)
+        
+        cached = self.result_cache.get(cache_key)
+        if cached is None and self.result_store is not None:
+            stored = self.result_store.get(cache_key)
+            if stored is not None:
+                cached = json.loads(stored)
+                self.result_cache.put(cache_key, cached)
+        if cached is not None:
+            return {**cached, 'cached': True}
+        
+        def run():
+            result = self._search_chunks(query, video_id, size, from_, language, mode, fusion, cursor, fields)
+            if result.get('success'):
+                self.result_cache.put(cache_key, result)
+                if self.result_store is not None:
+                    self.result_store.set(cache_key, json.dumps(result).encode('utf-8'))
+            return result
+        
+        return {**self._search_flight.do(cache_key, run), 'cached': False}
+    
+    def search_cache_stats(self) -> Dict[str, Any]:
+        return {
+            'memory': self.result_cache.stats(),
+            'shared': self.result_store.stats() if self.result_store is not None and hasattr(self.result_store, 'stats') else None,
+            'coalescing': self._search_flight.stats(),
+            'generation': self._cache_generation
+        }
+    
+    def _search_chunks(self, query: str, video_id: Optional[str] = None, 
+                       size: int = 10, from_: int = 0, language: Optional[str] = None,
+                       mode: str = SEARCH_MODE_HYBRID, fusion: str = FUSION_RRF,
+                       cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Search chunks with kNN, BM25 or both fused (``mode`` = hybrid | semantic | keyword).
+
+        kNN is a top-level ``knn`` search with ``k`` equal to the depth of the
+        requested page and ``num_candidates`` a multiple of it; BM25 matches
+        ``origin_content`` and ``video_title`` with the index analyzer. In hybrid
+        mode both run in one ``msearch`` and are fused with reciprocal rank
+        fusion (or min-max weighted scores with ``fusion='weighted'``).
+
+        Results are ordered by (score desc, _id) and paged with ``cursor``: the
+        ``next_cursor`` of a response holds the last (score, _id) and the depth
+        reached, and the next page starts strictly after that key. ``from_`` is
+        only used when no cursor is given.
+
+        The query is embedded with the model that indexed ``language`` and only
+        vectors of that model are compared; without ``language`` only chunks of
+        this index's own model (including ones indexed before languages were
+        recorded) are searched by kNN.
+
+        Each result holds ``score``, ``ranks`` and only the requested ``fields``
+        (keys of SEARCH_RESULT_FIELDS plus ``highlights``, all by default); the
+        embedding is never fetched and ES responses are trimmed with filter_path.
+        """
+        if mode not in SEARCH_MODES:
+            return {'success': False, 'message': f"Invalid mode '{mode}', expected one of {', '.join(SEARCH_MODES)}", 'results': []}
+        if fusion not in FUSION_METHODS:
+            return {'success': False, 'message': f"Invalid fusion '{fusion}', expected one of {', '.join(FUSION_METHODS)}", 'results': []}
+        fields = list(fields) if fields else list(SEARCH_RESULT_FIELDS) + [SEARCH_HIGHLIGHTS_FIELD]
+        unknown = [field for field in fields if field not in SEARCH_RESULT_FIELDS and field != SEARCH_HIGHLIGHTS_FIELD]
+        if unknown:
+            return {'success': False, 'message': f"Unknown fields: {', '.join(unknown)}", 'results': []}
+        if not self.es or (mode != SEARCH_MODE_KEYWORD and not self.model):
             return {
                 'success': False,
                 'message': 'Elasticsearch or model not available',
                 'results': []
             }
         
+        after = None
+        offset = max(0, from_)
+        if cursor:
+            try:
+                decoded = decode_search_cursor(cursor)
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'message': f'Invalid cursor: {str(e)}',
+                    'results': []
+                }
+            offset, after = decoded['offset'], decoded['after']
+        
         try:
-            logger.info(f"🔍 Searching for: '{query}'")
-            
-            # Generate embedding for search query
-            query_embedding = self.model.encode([query], convert_to_tensor=False)[0].tolist()
-            
-            # Build search query
-            search_body = {
-                "size": size,
-                "from": from_,
-                "query": {
-                    "bool": {
-                        "must": [
-                            {
-                                "knn": {
-                                    "vector": {
-                                        "vector": query_embedding,
-                                        "k": size
-                                    }
-                                }
-                            }
-                        ]
-                    }
-                },
-                "_source": [
-                    "url_channel", "url", "origin_content", "time", "vector",
-                    "video_id", "chunk_id", "start_time", "end_time", 
-                    "duration", "chunk_index", "video_title", "channel_name"
-                ],
-                "highlight": {
-                    "fields": {
-                        "origin_content": {
-                            "fragment_size": 150,
-                            "number_of_fragments": 3
-                        }
-                    }
+            depth = offset + size
+            if depth > SEARCH_MAX_DEPTH:
+                return {
+                    'success': False,
+                    'message': f'Pagination depth {depth} exceeds SEARCH_MAX_DEPTH ({SEARCH_MAX_DEPTH})',
+                    'results': []
                 }
-            }
             
-            # Add video filter if specified
-            if video_id:
-                search_body["query"]["bool"]["filter"] = [
-                    {"term": {"video_id": video_id}}
-                ]
-            
-            # Execute search
-            response = self.es.search(index=self.index_name, body=search_body)
-            
-            # Process results
-            results = []
-            for hit in response['hits']['hits']:
-                result = {
-                    # Main fields theo yêu cầu
-                    'url_channel': hit['_source'].get('url_channel', ''),
-                    'url': hit['_source'].get('url', ''),
-                    'origin_content': hit['_source'].get('origin_content', ''),
-                    'time': hit['_source'].get('time', ''),
-                    
-                    # Additional fields
-                    'video_id': hit['_source'].get('video_id', ''),
-                    'chunk_id': hit['_source'].get('chunk_id', ''),
-                    'start_time': hit['_source'].get('start_time', 0),
-                    'end_time': hit['_source'].get('end_time', 0),
-                    'duration': hit['_source'].get('duration', 0),
-                    'chunk_index': hit['_source'].get('chunk_index', 0),
-                    'video_title': hit['_source'].get('video_title', ''),
-                    'channel_name': hit['_source'].get('channel_name', ''),
-                    'score': hit['_score'],
-                    'highlights': hit.get('highlight', {})
-                }
-                results.append(result)
+            logger.info(f"🔍 Searching ({mode}) for: '{query}'")
+            
+            projection = search_projection(fields)
+            legs = []
+            if mode != SEARCH_MODE_KEYWORD:
+                # Generate embedding for search query
+                embedding_key = embedding_service.key_for_language(self.embedding_key, language)
+                query_embedding = embedding_service.encode_query(query, embedding_key)
+                legs.append(('semantic', self._knn_body(
+                    query_embedding, depth, self._search_filters(video_id, language, embedding_key), projection)))
+            if mode != SEARCH_MODE_SEMANTIC:
+                legs.append(('keyword', self._bm25_body(
+                    query, depth, self._search_filters(video_id, language), projection,
+                    highlight=SEARCH_HIGHLIGHTS_FIELD in fields)))
+            
+            # Hybrid: hai truy vấn trong một round-trip
+            if len(legs) == 1:
+                responses = [self.es.search(index=self.index_name, body=legs[0][1], filter_path=SEARCH_FILTER_PATH)]
+                took = responses[0]['took']
+            else:
+                searches = []
+                for _, body in legs:
+                    searches.extend([{"index": self.index_name}, body])
+                msearch = self.es.msearch(body=searches, filter_path=MSEARCH_FILTER_PATH)
+                responses = msearch['responses']
+                for response in responses:
+                    if 'error' in response:
+                        raise RuntimeError(response['error'])
+                took = msearch.get('took', max(response['took'] for response in responses))
+            
+            # filter_path bỏ luôn key 'hits' khi không có kết quả
+            ranked = {name: response.get('hits', {}).get('hits', []) for (name, _), response in zip(legs, responses)}
+            if len(legs) == 1:
+                fused = [(hit['_id'], hit['_score']) for hit in next(iter(ranked.values()))]
+            elif fusion == FUSION_WEIGHTED:
+                fused = weighted_fusion(ranked, {'semantic': SEARCH_HYBRID_ALPHA, 'keyword': 1 - SEARCH_HYBRID_ALPHA})
+            else:
+                fused = reciprocal_rank_fusion(ranked, SEARCH_RRF_RANK_CONSTANT)
+            fused.sort(key=lambda item: (-item[1], item[0]))
             
+            if after is not None:
+                after_key = (-after[0], after[1])
+                page = [item for item in fused if (-item[1], item[0]) > after_key][:size]
+            else:
+                page = fused[offset:offset + size]
+            
+            hits_by_id: Dict[str, Dict[str, Any]] = {}
+            ranks: Dict[str, Dict[str, int]] = {}
+            for name, hits in ranked.items():
+                for rank, hit in enumerate(hits, start=1):
+                    hits_by_id.setdefault(hit['_id'], hit)
+                    if 'highlight' in hit:
+                        hits_by_id[hit['_id']] = {**hits_by_id[hit['_id']], 'highlight': hit['highlight']}
+                    ranks.setdefault(hit['_id'], {})[name] = rank
+            
+            results = [
+                {**project_hit(hits_by_id[doc_id], fields), 'score': score, 'ranks': ranks.get(doc_id, {})}
+                for doc_id, score in page
+            ]
+            
+            # Còn trang sau khi trang này đầy và một trong các nhánh có thể còn kết quả sâu hơn depth
+            next_cursor = None
+            more = len(fused) > offset + len(page) or any(len(hits) >= depth for hits in ranked.values())
+            if len(page) == size and more:
+                next_cursor = encode_search_cursor({'offset': offset + size, 'after': [page[-1][1], page[-1][0]]})
+            
+            totals = [response.get('hits', {}).get('total', {}).get('value', 0) for response in responses]
             logger.info(f"✅ Found {len(results)} results for query: '{query}'")
             
             return {
                 'success': True,
                 'message': f'Found {len(results)} results',
                 'results': results,
-                'total': response['hits']['total']['value'],
-                'took': response['took']
+                'total': max(totals + [len(fused)]),
+                'took': took,
+                'mode': mode,
+                'fusion': fusion if len(legs) > 1 else None,
+                'next_cursor': next_cursor
             }
             
         except Exception as e:
@@ -399,6 +783,8 @@ class ElasticsearchService:
             )
             
             deleted_count = response['deleted']
+            if deleted_count:
+                self.invalidate_search_cache()
             logger.info(f"✅ Deleted {deleted_count} chunks for video: {video_id}")
             
             return {
@@ -452,11 +838,14 @@ class ElasticsearchService:
     def health_check(self) -> Dict[str, Any]:
         """Check Elasticsearch and model health"""
         es_healthy = self.es and self.es.ping()
-        model_healthy = self.model is not None
+        model_info = embedding_service.info().get(self.embedding_key, {})
+        # Model chưa load (lazy) vẫn được coi là healthy nếu chưa từng load lỗi
+        model_healthy = model_info.get('error') is None
         
         return {
             'elasticsearch': es_healthy,
             'sentence_transformer': model_healthy,
+            'embedding_model': model_info,
             'overall': es_healthy and model_healthy
         }
 
@@ -0,0 +1,470 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+import queue
+import unicodedata
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cache_utils import LRUCache, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingModelError(Exception):
+    """Raised when an embedding model cannot be loaded or is not registered"""
+
+
+def normalize_text(text: str) -> str:
+    """Normalization used for cache keys: NFC + collapsed whitespace (case is kept, models are cased)"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text or '')).strip()
+
+
+def embedding_cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+
+# Sau khi load model lỗi, request trong N giây tiếp theo báo lỗi ngay thay vì load lại (tải / đọc model rất nặng)
+EMBEDDING_MODEL_RETRY_SECONDS = float(os.getenv('EMBEDDING_MODEL_RETRY_SECONDS', 300))
+
+# Gom query của nhiều request thành một batch: chờ tối đa N ms hoặc M text
+EMBEDDING_MICRO_BATCHING = os.getenv('EMBEDDING_MICRO_BATCHING', 'true').lower() in ('1', 'true', 'yes')
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_MAX_WAIT_MS', 5))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', 32))
+EMBEDDING_BATCH_TIMEOUT = float(os.getenv('EMBEDDING_BATCH_TIMEOUT', 30))
+
+# Giới hạn trên của các bucket histogram kích thước batch
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class MicroBatchEncoder:
+    """Collects single-text encode requests from many threads and runs them through the model as one batch.
+
+    A worker thread takes the first waiting request, keeps collecting for up to
+    ``max_wait_ms`` or until ``max_batch`` texts are queued, calls
+    ``encode_batch`` once and resolves every caller's future with its row (or
+    the batch's exception). Only this thread touches the model, so request
+    threads no longer contend on it and each forward pass uses the BLAS
+    parallelism of a full batch.
+    """
+
+    def __init__(self, name: str, encode_batch: Callable[[List[str]], np.ndarray],
+                 max_batch: int = EMBEDDING_BATCH_MAX_SIZE, max_wait_ms: float = EMBEDDING_BATCH_MAX_WAIT_MS):
+        self.name = name
+        self.encode_batch = encode_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_queue_depth = 0
+        self.total_wait_ms = 0.0
+        self.total_encode_ms = 0.0
+        self.batch_size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.batch_size_histogram['more'] = 0
+
+    def _ensure_started(self):
+        # Process gunicorn fork ra không có thread của process cha
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f'MicroBatch-{self.name}', daemon=True)
+            self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+        return future
+
+    def encode(self, text: str, timeout: float = EMBEDDING_BATCH_TIMEOUT) -> np.ndarray:
+        future = self.submit(text)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Hủy để worker bỏ qua text này nếu batch của nó chưa bắt đầu
+            future.cancel()
+            raise
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Hết thời gian chờ thì vẫn lấy nốt các request đã nằm sẵn trong queue
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Caller đã timeout / hủy thì bỏ qua text của nó
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                vectors = self.encode_batch([text for text, _, _ in batch])
+                for (_, future, _), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                logger.error(f"❌ Micro-batch encode failed for '{self.name}' ({len(batch)} texts): {str(e)}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            finished = time.perf_counter()
+            self._record(batch, started, finished)
+
+    def _record(self, batch: List[Tuple[str, Future, float]], started: float, finished: float):
+        size = len(batch)
+        bucket = next((b for b in BATCH_SIZE_BUCKETS if size <= b), 'more')
+        with self._stats_lock:
+            self.batches += 1
+            self.items += size
+            self.total_wait_ms += sum((started - enqueued) * 1000 for _, _, enqueued in batch)
+            self.total_encode_ms += (finished - started) * 1000
+            self.batch_size_histogram[bucket] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'batches': self.batches,
+                'items': self.items,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else None,
+                'avg_queue_wait_ms': round(self.total_wait_ms / self.items, 2) if self.items else None,
+                'avg_encode_ms': round(self.total_encode_ms / self.batches, 2) if self.batches else None,
+                'batch_size_histogram': {str(bucket): count for bucket, count in self.batch_size_histogram.items()},
+                'max_batch': self.max_batch,
+                'max_wait_ms': self.max_wait * 1000
+            }
+
+
+class EmbeddingService:
+    """Single provider for sentence-transformer embeddings used by every index.
+
+    Models are registered under a key (one per index) with their expected
+    dimension, loaded lazily on first use and shared between keys that point
+    at the same model name, so a worker holds each model in memory only once.
+
+    Vectors are content-addressed by (model, normalized text): an in-process
+    LRU sits in front of an optional persistent store (see ``set_store``), so
+    unchanged chunks are never sent through the model twice.
+    """
+
+    def __init__(self, memory_cache_size: int = 20000, query_cache_size: int = 2000):
+        self._registry: Dict[str, Dict[str, Any]] = {}
+        self._language_routes: Dict[str, Dict[str, Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._load_errors: Dict[str, str] = {}
+        self._retry_at: Dict[str, float] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+        self.memory_cache = LRUCache(memory_cache_size)
+        self.store = None
+        # Query search ngắn và lặp lại nhiều: LRU riêng để encode chunk hàng loạt không đẩy chúng ra khỏi cache
+        self.query_cache = LRUCache(query_cache_size)
+        self.query_store = None
+        self._query_flight = SingleFlight()
+        self.micro_batching = EMBEDDING_MICRO_BATCHING
+        self._batchers: Dict[str, MicroBatchEncoder] = {}
+        self.encoded_count = 0
+
+    def register(self, key: str, model_name: str, dimension: int):
+        """Register ``model_name`` for ``key`` with the vector dimension the index mapping expects"""
+        with self._registry_lock:
+            self._registry[key] = {'model_name': model_name, 'dimension': dimension}
+            self._locks.setdefault(model_name, threading.Lock())
+
+    def route_languages(self, key: str, multilingual_key: str, native_languages: List[str]):
+        """Send text in languages other than ``native_languages`` to the model registered as ``multilingual_key``"""
+        self._language_routes[key] = {
+            'multilingual_key': multilingual_key,
+            'native_languages': {language.strip().lower() for language in native_languages if language.strip()}
+        }
+
+    def key_for_language(self, key: str, language: Optional[str]) -> str:
+        """Model key that should embed ``language`` text for index ``key`` (``key`` itself when unknown or native)"""
+        route = self._language_routes.get(key)
+        if not route or not language or language.lower() in route['native_languages']:
+            return key
+        return route['multilingual_key']
+
+    def _spec(self, key: str) -> Dict[str, Any]:
+        spec = self._registry.get(key)
+        if spec is None:
+            raise EmbeddingModelError(f"Embedding model '{key}' is not registered")
+        return spec
+
+    def model_name(self, key: str) -> str:
+        return self._spec(key)['model_name']
+
+    def dimension(self, key: str) -> int:
+        return self._spec(key)['dimension']
+
+    def _raise_if_backing_off(self, model_name: str):
+        retry_in = self._retry_at.get(model_name, 0) - time.time()
+        if retry_in > 0:
+            raise EmbeddingModelError(
+                f"Embedding model '{model_name}' failed to load, next attempt in {int(retry_in)}s: {self._load_errors.get(model_name)}"
+            )
+
+    def get_model(self, key: str):
+        """Return the loaded model for ``key``, loading it on first use.
+
+        A failed load is remembered for EMBEDDING_MODEL_RETRY_SECONDS: calls in
+        that window raise EmbeddingModelError at once instead of loading again.
+        """
+        model_name = self.model_name(key)
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+        self._raise_if_backing_off(model_name)
+
+        with self._locks[model_name]:
+            model = self._models.get(model_name)
+            if model is not None:
+                return model
+            # Thread khác vừa load lỗi trong lúc chờ lock
+            self._raise_if_backing_off(model_name)
+
+            logger.info(f"🧠 Loading embedding model '{model_name}' for '{key}'...")
+            started = time.time()
+            try:
+                # Import trễ: process không dùng embedding thì không phải load torch
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(model_name)
+            except Exception as e:
+                self._load_errors[model_name] = str(e)
+                self._retry_at[model_name] = time.time() + EMBEDDING_MODEL_RETRY_SECONDS
+                logger.error(f"❌ Failed to load embedding model '{model_name}' (retry in {EMBEDDING_MODEL_RETRY_SECONDS:.0f}s): {str(e)}")
+                raise EmbeddingModelError(f"Failed to load embedding model '{model_name}': {str(e)}") from e
+
+            self._load_seconds[model_name] = time.time() - started
+            self._load_errors.pop(model_name, None)
+            self._retry_at.pop(model_name, None)
+
+            actual_dimension = model.get_sentence_embedding_dimension()
+            for spec in self._registry.values():
+                if spec['model_name'] == model_name and spec['dimension'] != actual_dimension:
+                    logger.warning(f"⚠️ Model '{model_name}' produces {actual_dimension} dims, registry says {spec['dimension']}")
+                    spec['dimension'] = actual_dimension
+
+            self._models[model_name] = model
+            logger.info(f"✅ Loaded '{model_name}' in {self._load_seconds[model_name]:.1f}s ({actual_dimension} dims)")
+            return model
+
+    def is_available(self, key: str) -> bool:
+        try:
+            self.get_model(key)
+            return True
+        except EmbeddingModelError:
+            return False
+
+    def set_store(self, store):
+        """Attach a persistent vector store exposing get_many(model, keys) / put_many(model, {key: vector})"""
+        self.store = store
+
+    def _encode_uncached(self, texts: List[str], key: str, batch_size: int) -> np.ndarray:
+        model = self.get_model(key)
+        embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+        self.encoded_count += len(texts)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def encode(self, texts: List[str], key: str, batch_size: int = 32, use_cache: bool = True) -> np.ndarray:
+        """Encode ``texts`` in batches; returns a float32 array of shape (len(texts), dimension).
+
+        Cached vectors are looked up first (memory, then the persistent store);
+        only the missing, de-duplicated texts go through the model.
+        """
+        if not texts:
+            return np.zeros((0, self.dimension(key)), dtype=np.float32)
+        if not use_cache:
+            return self._encode_uncached(texts, key, batch_size)
+
+        model_name = self.model_name(key)
+        cache_keys = [embedding_cache_key(model_name, text) for text in texts]
+        vectors = self.memory_cache.get_many(cache_keys)
+
+        missing = [k for k in dict.fromkeys(cache_keys) if k not in vectors]
+        if missing and self.store is not None:
+            stored = self.store.get_many(model_name, missing)
+            vectors.update(stored)
+            self.memory_cache.put_many(stored)
+            missing = [k for k in missing if k not in stored]
+
+        if missing:
+            # Encode mỗi nội dung khác nhau đúng một lần
+            text_by_key = dict(zip(cache_keys, texts))
+            encoded = self._encode_uncached([text_by_key[k] for k in missing], key, batch_size)
+            fresh = dict(zip(missing, encoded))
+            vectors.update(fresh)
+            self.memory_cache.put_many(fresh)
+            if self.store is not None:
+                self.store.put_many(model_name, fresh)
+
+        logger.info(f"🧮 Embeddings for '{key}': {len(texts)} texts, {len(missing)} encoded, {len(texts) - len(missing)} from cache")
+        return np.stack([vectors[k] for k in cache_keys]).astype(np.float32, copy=False)
+
+    def encode_one(self, text: str, key: str) -> List[float]:
+        return self.encode([text], key)[0].tolist()
+
+    def set_query_store(self, store):
+        """Attach a shared byte cache (get(key) / set(key, bytes), e.g. cache_utils.RedisCache) for query vectors"""
+        self.query_store = store
+
+    def encode_query(self, text: str, key: str) -> List[float]:
+        """Embedding of a search query: query LRU, then the shared query store, then the model.
+
+        Concurrent misses for the same (model, normalized text) are coalesced so
+        only one of them runs the model; the others wait for its vector.
+        """
+        cache_key = embedding_cache_key(self.model_name(key), text)
+        vector = self.query_cache.get(cache_key)
+        if vector is not None:
+            return vector
+        return self._query_flight.do(cache_key, lambda: self._encode_query_miss(cache_key, text, key))
+
+    def batcher(self, key: str) -> MicroBatchEncoder:
+        """Micro-batching encoder for ``key`` (one worker thread per model key, created on first use)"""
+        batcher = self._batchers.get(key)
+        if batcher is None:
+            with self._registry_lock:
+                batcher = self._batchers.get(key)
+                if batcher is None:
+                    # Không qua cache chunk (memory + Mongo): thread batch không bao giờ chờ I/O của Mongo
+                    batcher = MicroBatchEncoder(key, lambda texts: self.encode(texts, key, use_cache=False))
+                    self._batchers[key] = batcher
+        return batcher
+
+    def _encode_query_miss(self, cache_key: str, text: str, key: str) -> List[float]:
+        stored = self.query_store.get(cache_key) if self.query_store is not None else None
+        if stored is not None:
+            vector = np.frombuffer(stored, dtype=np.float32).tolist()
+        else:
+            if self.micro_batching:
+                encoded = self.batcher(key).encode(text)
+            else:
+                # Query chỉ nằm trong query LRU / query store, không ghi vào cache chunk (memory + Mongo)
+                encoded = self.encode([text], key, use_cache=False)[0]
+            vector = encoded.tolist()
+            if self.query_store is not None:
+                self.query_store.set(cache_key, encoded.astype(np.float32).tobytes())
+        self.query_cache.put(cache_key, vector)
+        return vector
+
+    def max_tokens(self, key: str) -> int:
+        """Longest input (in tokens, without special tokens) the model for ``key`` embeds without truncation"""
+        model = self.get_model(key)
+        special = model.tokenizer.num_special_tokens_to_add() if hasattr(model, 'tokenizer') else 2
+        return int(model.max_seq_length) - special
+
+    def count_tokens(self, texts: List[str], key: str) -> List[int]:
+        """Token length of each text for the tokenizer of ``key`` (special tokens excluded)"""
+        if not texts:
+            return []
+        tokenizer = self.get_model(key).tokenizer
+        encoded = tokenizer(texts, add_special_tokens=False, truncation=False, verbose=False)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def warm_up(self, keys: Optional[List[str]] = None):
+        """Load the given models (all registered by default) and run one encode so the first request is not slow"""
+        for key in keys or list(self._registry):
+            try:
+                self.encode(['warm up'], key, use_cache=False)
+                logger.info(f"🔥 Embedding model for '{key}' warmed up")
+            except Exception as e:
+                logger.error(f"❌ Warm-up failed for '{key}': {str(e)}")
+
+    def start_warm_up(self, keys: Optional[List[str]] = None) -> threading.Thread:
+        """Warm up in a background thread so app startup is not blocked by model loading"""
+        thread = threading.Thread(target=self.warm_up, args=(keys,), name='EmbeddingWarmUp', daemon=True)
+        thread.start()
+        return thread
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            'encoded_count': self.encoded_count,
+            'memory': self.memory_cache.stats(),
+            'store': self.store.stats() if self.store is not None and hasattr(self.store, 'stats') else None,
+            'query': {
+                'memory': self.query_cache.stats(),
+                'shared': self.query_store.stats() if self.query_store is not None and hasattr(self.query_store, 'stats') else None,
+                'coalescing': self._query_flight.stats()
+            }
+        }
+
+    def batching_stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.micro_batching,
+            'models': {key: batcher.stats() for key, batcher in self._batchers.items()}
+        }
+
+    def info(self) -> Dict[str, Any]:
+        result = {}
+        for key, spec in self._registry.items():
+            model_name = spec['model_name']
+            model = self._models.get(model_name)
+            result[key] = {
+                'model_name': model_name,
+                'dimension': spec['dimension'],
+                'loaded': model is not None,
+                'load_seconds': round(self._load_seconds[model_name], 2) if model_name in self._load_seconds else None,
+                'max_seq_length': getattr(model, 'max_seq_length', None) if model is not None else None,
+                'error': self._load_errors.get(model_name),
+                'retry_in_seconds': max(0, int(self._retry_at[model_name] - time.time())) if model_name in self._retry_at else None,
+                'language_route': self._language_routes.get(key) and {
+                    'multilingual_key': self._language_routes[key]['multilingual_key'],
+                    'native_languages': sorted(self._language_routes[key]['native_languages'])
+                }
+            }
+        return result
+
+
+# Global instance và model registry (một key cho mỗi index)
+embedding_service = EmbeddingService(
+    memory_cache_size=int(os.getenv('EMBEDDING_MEMORY_CACHE_SIZE', 20000)),
+    query_cache_size=int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', 2000))
+)
+embedding_service.register(
+    'articles',
+    os.getenv('ARTICLES_EMBEDDING_MODEL', 'all-distilroberta-v1'),
+    int(os.getenv('ARTICLES_EMBEDDING_DIMS', 768))
+)
+embedding_service.register(
+    'video_chunks',
+    os.getenv('SENTENCE_TRANSFORMER_MODEL', 'all-MiniLM-L6-v2'),
+    int(os.getenv('VIDEO_CHUNKS_EMBEDDING_DIMS', 384))
+)
+# Phụ đề không phải tiếng Anh: model đa ngôn ngữ cùng số chiều để dùng chung field vector của video_chunks
+embedding_service.register(
+    'video_chunks_multilingual',
+    os.getenv('VIDEO_CHUNKS_MULTILINGUAL_MODEL', 'paraphrase-multilingual-MiniLM-L12-v2'),
+    int(os.getenv('VIDEO_CHUNKS_EMBEDDING_DIMS', 384))
+)
+embedding_service.route_languages(
+    'video_chunks', 'video_chunks_multilingual',
+    os.getenv('VIDEO_CHUNKS_NATIVE_LANGUAGES', 'en').split(',')
+)
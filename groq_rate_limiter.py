@@ -0,0 +1,318 @@
+import os
+import re
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from groq import RateLimitError as GroqRateLimitError
+except ImportError:
+    GroqRateLimitError = None
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller could not be admitted within the configured max wait"""
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset durations such as '7.66s', '2m59.56s', '1h2m' or '250ms' into seconds"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value):
+        matched = True
+        amount = float(amount)
+        if unit == 'h':
+            total += amount * 3600
+        elif unit == 'm':
+            total += amount * 60
+        elif unit == 's':
+            total += amount
+        else:
+            total += amount / 1000
+    return total if matched else None
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at capacity/60 per second"""
+
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = float(capacity_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / 60.0
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def cap_level(self, level: float, now: float):
+        """Lower the local level to what the server reports as remaining"""
+        self._refill(now)
+        self.tokens = min(self.tokens, float(level))
+
+    def set_capacity(self, capacity_per_minute: float, now: float):
+        self._refill(now)
+        self.capacity = float(capacity_per_minute)
+        self.tokens = min(self.tokens, self.capacity)
+
+
+class _ModelLimits:
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.blocked_until = 0.0
+        self.waiters = deque()
+        self.admitted = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.learned = {}
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        return max(
+            self.blocked_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(tokens, now)
+        )
+
+
+class GroqRateLimiter:
+    """Process-wide limiter for Groq calls aware of requests/minute and tokens/minute.
+
+    Callers are admitted in FIFO order per model once both buckets have room for
+    the estimated token cost. Limits and remaining budget are learned from the
+    ``x-ratelimit-*`` response headers, and 429 responses block the model until
+    the server-provided reset time instead of every thread sleeping on its own.
+    """
+
+    def __init__(self, requests_per_minute: int = 30, tokens_per_minute: int = 6000, max_wait: float = 600):
+        self.default_rpm = requests_per_minute
+        self.default_tpm = tokens_per_minute
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._models: Dict[str, _ModelLimits] = {}
+
+    def _limits_for(self, model: str) -> _ModelLimits:
+        limits = self._models.get(model)
+        if limits is None:
+            limits = _ModelLimits(self.default_rpm, self.default_tpm)
+            self._models[model] = limits
+        return limits
+
+    def acquire(self, model: str, tokens: int, timeout: Optional[float] = None) -> int:
+        """Block until a call of ``tokens`` estimated tokens may be sent; returns the reserved amount"""
+        timeout = self.max_wait if timeout is None else timeout
+        ticket = object()
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            limits = self._limits_for(model)
+            limits.waiters.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if limits.waiters[0] is ticket:
+                        wait = limits.wait_time(tokens, now)
+                        if wait <= 0:
+                            limits.requests.consume(1, now)
+                            limits.tokens.consume(tokens, now)
+                            limits.admitted += 1
+                            limits.total_wait += now - started
+                            return min(tokens, int(limits.tokens.capacity))
+                    else:
+                        # Chưa tới lượt: chờ caller phía trước được admit
+                        wait = deadline - now
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise RateLimitTimeout(f"Waited more than {timeout:.0f}s for Groq rate limit on {model}")
+                    self._cond.wait(timeout=max(0.01, min(wait, remaining)))
+            finally:
+                limits.waiters.remove(ticket)
+                self._cond.notify_all()
+
+    def settle(self, model: str, reserved: int, actual: Optional[int]):
+        """Correct the token bucket once the real usage of a call is known"""
+        if actual is None:
+            return
+        with self._cond:
+            limits = self._limits_for(model)
+            now = time.monotonic()
+            if actual > reserved:
+                limits.tokens.consume(actual - reserved, now)
+            elif reserved > actual:
+                limits.tokens.refund(reserved - actual, now)
+            self._cond.notify_all()
+
+    def update_from_headers(self, model: str, headers: Any):
+        """Learn real limits and remaining budget from Groq x-ratelimit-* headers"""
+        if not headers:
+            return
+
+        def header(name):
+            value = headers.get(name)
+            return value if value not in (None, '') else None
+
+        with self._cond:
+            limits = self._limits_for(model)
+            now = time.monotonic()
+
+            limit_tokens = header('x-ratelimit-limit-tokens')
+            if limit_tokens is not None:
+                limits.tokens.set_capacity(float(limit_tokens), now)
+                limits.learned['tokens_per_minute'] = int(float(limit_tokens))
+
+            remaining_tokens = header('x-ratelimit-remaining-tokens')
+            if remaining_tokens is not None:
+                limits.tokens.cap_level(float(remaining_tokens), now)
+
+            # Groq trả về giới hạn request theo ngày (RPD): chỉ chặn khi đã hết quota
+            limit_requests = header('x-ratelimit-limit-requests')
+            if limit_requests is not None:
+                limits.learned['requests_per_day'] = int(float(limit_requests))
+            remaining_requests = header('x-ratelimit-remaining-requests')
+            if remaining_requests is not None and float(remaining_requests) <= 0:
+                reset = parse_reset_duration(header('x-ratelimit-reset-requests'))
+                if reset:
+                    limits.blocked_until = max(limits.blocked_until, now + reset)
+
+            retry_after = parse_reset_duration(header('retry-after'))
+            if retry_after:
+                limits.blocked_until = max(limits.blocked_until, now + retry_after)
+
+            self._cond.notify_all()
+
+    def record_rate_limited(self, model: str, retry_after: Optional[float]):
+        """Block the model after a 429 so queued callers wait for the reset together"""
+        with self._cond:
+            limits = self._limits_for(model)
+            now = time.monotonic()
+            limits.rate_limited += 1
+            limits.tokens.cap_level(0, now)
+            if retry_after:
+                limits.blocked_until = max(limits.blocked_until, now + retry_after)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            result = {}
+            for model, limits in self._models.items():
+                limits.tokens._refill(now)
+                limits.requests._refill(now)
+                result[model] = {
+                    'tokens_per_minute': int(limits.tokens.capacity),
+                    'tokens_available': int(limits.tokens.tokens),
+                    'requests_per_minute': int(limits.requests.capacity),
+                    'requests_available': round(limits.requests.tokens, 2),
+                    'blocked_for_seconds': round(max(0.0, limits.blocked_until - now), 2),
+                    'queued_callers': len(limits.waiters),
+                    'admitted': limits.admitted,
+                    'rate_limited': limits.rate_limited,
+                    'avg_wait_seconds': round(limits.total_wait / limits.admitted, 3) if limits.admitted else 0.0,
+                    'learned': dict(limits.learned)
+                }
+            return result
+
+    # ------------------------------------------------------------------
+    # Chat completion helper
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _is_rate_limit_error(error: Exception) -> bool:
+        if GroqRateLimitError is not None and isinstance(error, GroqRateLimitError):
+            return True
+        error_str = str(error)
+        return "rate_limit_exceeded" in error_str or "429" in error_str
+
+    @staticmethod
+    def _retry_after_from_error(error: Exception) -> Optional[float]:
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if headers is not None:
+            retry_after = parse_reset_duration(headers.get('retry-after'))
+            if retry_after:
+                return retry_after
+        wait_match = re.search(r'Please try again in ([\dhms.]+)', str(error))
+        if wait_match:
+            return parse_reset_duration(wait_match.group(1).rstrip('.'))
+        return None
+
+    def chat_completion(self, client, estimated_prompt_tokens: int, max_retries: int = 3, **kwargs):
+        """Call ``client.chat.completions.create`` through the limiter.
+
+        The reservation is the prompt estimate plus ``max_tokens``; it is
+        corrected with the real usage reported by the API afterwards.
+        """
+        model = kwargs['model']
+        estimated = estimated_prompt_tokens + int(kwargs.get('max_tokens') or 0)
+
+        for attempt in range(max_retries):
+            reserved = self.acquire(model, estimated)
+            logger.info(f"🎫 Groq call admitted for {model} (~{estimated} tokens), attempt {attempt + 1}/{max_retries}")
+            try:
+                completions = client.chat.completions
+                raw_api = getattr(completions, 'with_raw_response', None)
+                if raw_api is not None:
+                    raw_response = raw_api.create(**kwargs)
+                    self.update_from_headers(model, getattr(raw_response, 'headers', None))
+                    response = raw_response.parse()
+                else:
+                    response = completions.create(**kwargs)
+            except Exception as e:
+                if not self._is_rate_limit_error(e):
+                    self.settle(model, reserved, 0)
+                    raise
+                retry_after = self._retry_after_from_error(e)
+                response_headers = getattr(getattr(e, 'response', None), 'headers', None)
+                self.update_from_headers(model, response_headers)
+                self.record_rate_limited(model, retry_after)
+                if attempt < max_retries - 1:
+                    logger.warning(f"⚠️ Groq rate limit hit for {model}, blocking for {retry_after or 0:.1f}s before retry {attempt + 2}/{max_retries}")
+                    continue
+                logger.error(f"❌ All retry attempts failed for {model} due to rate limit")
+                raise
+
+            usage = getattr(response, 'usage', None)
+            self.settle(model, reserved, getattr(usage, 'total_tokens', None))
+            return response
+
+
+# Global instance dùng chung cho mọi lời gọi Groq trong process
+groq_rate_limiter = GroqRateLimiter(
+    requests_per_minute=int(os.getenv('GROQ_REQUESTS_PER_MINUTE', 30)),
+    tokens_per_minute=int(os.getenv('GROQ_TOKENS_PER_MINUTE', 6000)),
+    max_wait=float(os.getenv('GROQ_RATE_LIMIT_MAX_WAIT', 600))
+)
@@ -233,6 +233,7 @@ db.teams.createIndex({ 'name': 1 });
 db.teams.createIndex({ 'sport': 1 });
 db.youtube_channels.createIndex({ 'channel_id': 1 }, { unique: true });
 db.youtube_channels.createIndex({ 'url': 1 });
+db.youtube_channels.createIndex({ 'poll.next_poll_at': 1 });
 db.youtube_channels.createIndex({ 'created_at': -1 });
 db.videos.createIndex({ 'url': 1 }, { unique: true });
 db.videos.createIndex({ 'channel_id': 1 });
@@ -240,5 +241,17 @@ db.videos.createIndex({ 'video_id': 1 });
 db.videos.createIndex({ 'status': 1 });
 db.videos.createIndex({ 'published_at': -1 });
 db.videos.createIndex({ 'created_at': -1 });
+db.articles.createIndex(
+  { 'title': 'text', 'summary': 'text', 'content': 'text' },
+  { name: 'articles_text_search', weights: { 'title': 10, 'summary': 5, 'content': 1 }, default_language: 'none' }
+);
+db.articles.createIndex({ 'created_at': -1 });
+db.articles.createIndex({ 'source': 1, 'created_at': -1 });
+db.srt_chunks.createIndex({ 'srt_id': 1, 'chunk_index': 1 });
+db.srt_chunks.createIndex({ 'video_id': 1 }, { sparse: true });
+db.srt_files.createIndex({ 'video_url': 1, 'created_at': -1 });
+db.srt_files.createIndex({ 'created_at': -1 });
+db.srt_files.createIndex({ 'video_id': 1 }, { sparse: true });
+db.srt_files.createIndex({ 'language': 1 }, { sparse: true });
 
 print('Database và collections đã được khởi tạo thành công!');
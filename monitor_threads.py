@@ -46,7 +46,7 @@ def monitor_api_logs():
             print(f"🔄 Generation Status: {result.get('article_generation_status')}")
             print()
             
-            if result.get('article_generation_status') == 'processing':
+            if result.get('article_generation_status') in ('queued', 'processing'):
                 print("🚀 Thread started - monitoring progress...")
                 print("⏰ Timeline:")
                 print("  0s:  Request received, thread started")
@@ -88,7 +88,7 @@ def check_request_progress(request_id):
                 print(f"\n✅ Article generation completed!")
                 if result.get('generated_article_id'):
                     print(f"📄 Generated article ID: {result.get('generated_article_id')}")
-            elif status == 'processing':
+            elif status in ('queued', 'processing'):
                 print(f"\n⏳ Still processing...")
             else:
                 print(f"\n⚠️ Status: {status}")
@@ -49,6 +49,14 @@ class ChannelDetailManager {
         });
         }
 
+        // Crawl & index toàn bộ video của channel
+        const crawlAllBtn = document.getElementById('crawlAllBtn');
+        if (crawlAllBtn) {
+            crawlAllBtn.addEventListener('click', () => {
+            this.crawlAllVideos();
+        });
+        }
+
         const crawlVideosBtnEmpty = document.getElementById('crawlVideosBtnEmpty');
         if (crawlVideosBtnEmpty) {
             crawlVideosBtnEmpty.addEventListener('click', () => {
@@ -287,6 +295,69 @@ class ChannelDetailManager {
     }
 
 
+    async crawlAllVideos() {
+        const crawlAllBtn = document.getElementById('crawlAllBtn');
+        try {
+            crawlAllBtn.disabled = true;
+            this.showToast('info', 'Info', 'Queuing all unprocessed videos of this channel...');
+
+            const response = await fetch(`${this.apiBaseUrl}/api/channels/${this.channelId}/crawl-all`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({})
+            });
+
+            const data = await response.json();
+            if (!data.success) {
+                this.showToast('error', 'Error', data.error || 'Failed to queue channel crawl');
+                return;
+            }
+
+            this.showToast('success', 'Queued',
+                `Queued ${data.queued_count} videos (${data.skipped_processed} already processed)`);
+            if (data.queued_count > 0) {
+                await this.waitForBatch(data.batch_id, data.queued_count);
+            }
+            this.loadVideos();
+        } catch (error) {
+            console.error('Error crawling all videos:', error);
+            this.showToast('error', 'Error', 'Unable to connect to server');
+        } finally {
+            crawlAllBtn.disabled = false;
+            crawlAllBtn.innerHTML = '<i class="fas fa-layer-group"></i> Crawl & Index All Videos';
+        }
+    }
+
+    async waitForBatch(batchId, total, intervalMs = 5000) {
+        // Poll tổng trạng thái của batch cho tới khi không còn job pending / running
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+            const response = await fetch(`${this.apiBaseUrl}/api/jobs?batch_id=${batchId}&limit=1`);
+            const data = await response.json();
+            if (!data.success || !data.batch) {
+                return;
+            }
+
+            const counts = data.batch.counts;
+            const finished = counts.done + counts.dead;
+            this.updateCrawlAllProgress(finished, total);
+            if (counts.pending === 0 && counts.running === 0) {
+                this.showToast(counts.dead ? 'warning' : 'success', 'Channel crawl finished',
+                    `${counts.done} videos indexed, ${counts.dead} failed`);
+                return;
+            }
+        }
+    }
+
+    updateCrawlAllProgress(finished, total) {
+        const crawlAllBtn = document.getElementById('crawlAllBtn');
+        if (crawlAllBtn) {
+            crawlAllBtn.innerHTML = `<i class="fas fa-spinner fa-spin"></i> ${finished}/${total} processed`;
+        }
+    }
+
     updateCrawledVideosCount() {
         const crawledCount = this.videos.length;
         document.getElementById('crawledVideos').textContent = this.formatNumber(crawledCount);
@@ -456,6 +527,7 @@ class ChannelDetailManager {
 
     getSrtStatusText(status) {
         switch (status) {
+            case -1: return 'No subtitles';
             case 0: return 'Pending';
             case 1: return 'Processed';
             case 2: return 'Completed';
@@ -464,6 +536,30 @@ class ChannelDetailManager {
     }
 
 
+    async waitForJob(jobId, onProgress, intervalMs = 2000) {
+        // Poll trạng thái job pipeline cho tới khi xong (done) hoặc thất bại hẳn (dead)
+        let lastStage = null;
+        while (true) {
+            const response = await fetch(`${this.apiBaseUrl}/api/jobs/${jobId}`);
+            const data = await response.json();
+            if (!data.success) {
+                throw new Error(data.error || 'Failed to load job status');
+            }
+
+            const job = data.job;
+            const progress = job.progress || {};
+            if (onProgress && progress.current_stage && progress.current_stage !== lastStage) {
+                lastStage = progress.current_stage;
+                onProgress(progress);
+            }
+
+            if (job.status === 'done' || job.status === 'dead') {
+                return job;
+            }
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    }
+
     async crawlVideoSrt(videoId) {
         try {
             const response = await fetch(`${this.apiBaseUrl}/api/crawl-and-chunk-video`, {
@@ -478,12 +574,20 @@ class ChannelDetailManager {
 
             const data = await response.json();
 
-            if (data.success) {
+            if (!data.success) {
+                this.showToast('error', 'Error', data.error || 'Failed to crawl and chunk video');
+                return;
+            }
+
+            this.showToast('info', 'Queued', 'Crawl & chunk job started, processing in background...');
+            const job = await this.waitForJob(data.job_id);
+
+            if (job.status === 'done') {
                 this.showToast('success', 'Success', 
-                    `Successfully crawled and chunked video with ${data.chunks_count} chunks`);
+                    `Successfully crawled and chunked video with ${job.result.chunks_count} chunks`);
                 this.loadVideos(); // Reload videos to update status
             } else {
-                this.showToast('error', 'Error', data.error || 'Failed to crawl and chunk video');
+                this.showToast('error', 'Error', job.last_error || 'Failed to crawl and chunk video');
             }
         } catch (error) {
             console.error('Error crawling video SRT:', error);
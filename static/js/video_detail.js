@@ -102,6 +102,7 @@ class VideoDetailManager {
 
     getSrtStatusText(status) {
         switch (status) {
+            case -1: return 'No subtitles';
             case 0: return 'Pending';
             case 1: return 'Processed';
             case 2: return 'Completed';
@@ -229,6 +230,7 @@ class VideoDetailManager {
 
     getSrtStatusText(status) {
         switch (status) {
+            case -1: return 'No subtitles';
             case 0: return 'Pending';
             case 1: return 'Processed';
             case 2: return 'Completed';
@@ -522,6 +524,30 @@ class VideoDetailManager {
         return num.toString();
     }
 
+    async waitForJob(jobId, onProgress, intervalMs = 2000) {
+        // Poll trạng thái job pipeline cho tới khi xong (done) hoặc thất bại hẳn (dead)
+        let lastStage = null;
+        while (true) {
+            const response = await fetch(`${this.apiBaseUrl}/api/jobs/${jobId}`);
+            const data = await response.json();
+            if (!data.success) {
+                throw new Error(data.error || 'Failed to load job status');
+            }
+
+            const job = data.job;
+            const progress = job.progress || {};
+            if (onProgress && progress.current_stage && progress.current_stage !== lastStage) {
+                lastStage = progress.current_stage;
+                onProgress(progress);
+            }
+
+            if (job.status === 'done' || job.status === 'dead') {
+                return job;
+            }
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    }
+
     // 🔄 FULL PROCESS: Delete old data → Crawl SRT → Chunk → Vectorize → Save to Elasticsearch
     async fullProcessVideo() {
         try {
@@ -565,16 +591,29 @@ class VideoDetailManager {
                 })
             });
 
-            const result = await response.json();
+            const queued = await response.json();
+
+            if (!queued.success) {
+                this.showToast('error', 'Full Process Failed', queued.error || 'Unknown error occurred');
+                return;
+            }
+
+            // Pipeline chạy nền: theo dõi tiến độ qua job status
+            const job = await this.waitForJob(queued.job_id, (progress) => {
+                this.showToast('info', `⏳ ${progress.current_stage}`,
+                    `Stage ${progress.completed_stages + 1}/${progress.total_stages} (${progress.percent}%)`);
+            });
 
-            if (result.success) {
+            if (job.status === 'done') {
+                const result = job.result || {};
+                const elasticsearch = result.elasticsearch || {};
                 // Hiển thị kết quả chi tiết
                 const message = `
                     ✅ Full Process Complete!<br>
                     🗑️ Old data: Cleaned<br>
                     📄 SRT Chunks: ${result.chunks_count}<br>
                     🤖 Vector Embeddings: Generated (768D)<br>
-                    💾 Elasticsearch: ${result.elasticsearch.indexed_count} chunks indexed<br>
+                    💾 Elasticsearch: ${elasticsearch.indexed_count || 0} chunks indexed<br>
                     🔍 Ready for semantic search!
                 `;
                 
@@ -585,7 +624,7 @@ class VideoDetailManager {
                 await this.loadTranscription();
                 
             } else {
-                this.showToast('error', 'Full Process Failed', result.message || 'Unknown error occurred');
+                this.showToast('error', 'Full Process Failed', job.last_error || 'Unknown error occurred');
             }
 
         } catch (error) {
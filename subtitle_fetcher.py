@@ -0,0 +1,219 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from youtube_download import (
+    base_ydl_opts, download_limiter, youtube_video_id, subtitle_shard_dir,
+    YOUTUBE_MAX_CONCURRENT_DOWNLOADS
+)
+
+logger = logging.getLogger(__name__)
+
+# Số thread fetch phụ đề, mỗi thread giữ một YoutubeDL "ấm" riêng (YoutubeDL không thread-safe)
+SUBTITLE_FETCH_WORKERS = int(os.getenv('SUBTITLE_FETCH_WORKERS', YOUTUBE_MAX_CONCURRENT_DOWNLOADS))
+# Tạo lại instance sau N video để cookie jar / cache trong RAM không phình mãi
+SUBTITLE_FETCHER_MAX_USES = int(os.getenv('SUBTITLE_FETCHER_MAX_USES', 500))
+# Cache dùng chung trên đĩa (player JS, signature) cho mọi instance và process
+YTDLP_CACHE_DIR = os.getenv('YTDLP_CACHE_DIR', '.cache/yt-dlp')
+# Thứ tự ưu tiên định dạng track (YouTube thường chỉ có vtt / json3 / srv* / ttml)
+SUBTITLE_FORMAT_PREFERENCE = ('srt', 'vtt')
+# Ngôn ngữ phụ đề theo thứ tự ưu tiên; '*' = ngôn ngữ gốc của video khi không có ngôn ngữ nào ở trên
+SUBTITLE_LANGUAGES = [lang.strip() for lang in os.getenv('SUBTITLE_LANGUAGES', 'en,*').split(',') if lang.strip()]
+ANY_LANGUAGE = '*'
+
+
+def base_language(code: Optional[str]) -> Optional[str]:
+    """'en-US' / 'en-orig' -> 'en' (the language stored on srt_files, srt_chunks and video_chunks)"""
+    return code.split('-', 1)[0].lower() if code else None
+
+
+def _is_translated(track: Dict[str, Any]) -> bool:
+    # Auto-caption dịch máy từ ngôn ngữ gốc (YouTube thêm tlang=), chất lượng kém và sai ngôn ngữ thật của video
+    return 'tlang=' in (track.get('url') or '')
+
+
+class SubtitleFetcher:
+    """Fetch one subtitle track per video on a pool of threads that keep warm YoutubeDL instances.
+
+    Building a YoutubeDL re-initialises extractors, re-reads the cookies file
+    and loses the in-memory player cache, so each pool thread keeps its own
+    instance for up to ``max_uses`` videos and all of them share ``cache_dir``
+    on disk. Only the video metadata is extracted (no format processing, no
+    download); the chosen track is then fetched through the same instance so
+    it reuses its cookies and HTTP session.
+    """
+
+    def __init__(self, workers: int = SUBTITLE_FETCH_WORKERS, max_uses: int = SUBTITLE_FETCHER_MAX_USES,
+                 cache_dir: str = YTDLP_CACHE_DIR):
+        self.workers = max(1, workers)
+        self.max_uses = max_uses
+        self.cache_dir = cache_dir
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'instances_created': 0,
+            'fetches': 0,
+            'no_track': 0,
+            'errors': 0,
+            'total_ms': 0,
+            'slot_wait_ms': 0
+        }
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Tạo lazy: process gunicorn fork ra mới có thread pool riêng
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='subtitle-fetch')
+            return self._executor
+
+    def _ydl(self):
+        """YoutubeDL instance of the current pool thread, recreated every ``max_uses`` videos"""
+        import yt_dlp
+
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is not None and self._local.uses >= self.max_uses:
+            self._discard()
+            ydl = None
+        if ydl is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            ydl = yt_dlp.YoutubeDL(base_ydl_opts(skip_download=True, cachedir=self.cache_dir))
+            self._local.ydl = ydl
+            self._local.uses = 0
+            self._count(instances_created=1)
+        self._local.uses += 1
+        return ydl
+
+    def _discard(self):
+        ydl = getattr(self._local, 'ydl', None)
+        self._local.ydl = None
+        if ydl is not None:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _pick_format(key: str, formats: List[Dict[str, Any]], source: str) -> Optional[Dict[str, Any]]:
+        for ext in SUBTITLE_FORMAT_PREFERENCE:
+            for track in formats:
+                if track.get('ext') == ext and track.get('url') and not (source == 'automatic' and _is_translated(track)):
+                    return {'track': key, 'language': base_language(key), 'ext': ext,
+                            'url': track['url'], 'source': source}
+        return None
+
+    @classmethod
+    def select_track(cls, info: Dict[str, Any], languages: List[str]) -> Optional[Dict[str, Any]]:
+        """Best track for ``languages`` in priority order; for each language a manual track beats an auto-caption.
+
+        Machine-translated auto-captions are never picked. ``'*'`` selects the
+        video's original language: its declared language, else the first manual
+        track, else the original auto-caption track.
+        """
+        manual = info.get('subtitles') or {}
+        automatic = info.get('automatic_captions') or {}
+
+        for language in languages:
+            if language == ANY_LANGUAGE:
+                original = base_language(info.get('language'))
+                if original and original not in languages:
+                    track = cls.select_track(info, [original])
+                    if track:
+                        return track
+                for key, formats in manual.items():
+                    track = cls._pick_format(key, formats, 'manual')
+                    if track:
+                        return track
+                # '<lang>-orig' là track nhận dạng giọng nói gốc
+                for key in sorted(automatic, key=lambda k: not k.endswith('-orig')):
+                    track = cls._pick_format(key, automatic[key], 'automatic')
+                    if track:
+                        return track
+                continue
+
+            for source, tracks in (('manual', manual), ('automatic', automatic)):
+                # 'en' khớp cả 'en-US', 'en-GB', 'en-orig'...
+                keys = [language] + sorted(key for key in tracks if key.startswith(f"{language}-"))
+                for key in keys:
+                    track = cls._pick_format(key, tracks.get(key) or [], source)
+                    if track:
+                        return track
+        return None
+
+    def _fetch(self, video_url: str, languages: List[str]) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        video_key = youtube_video_id(video_url) or uuid.uuid4().hex
+
+        try:
+            # Giới hạn số request đồng thời tới YouTube khi nhiều worker chạy song song
+            with download_limiter.slot(video_url):
+                slot_wait_ms = int((time.perf_counter() - started) * 1000)
+                ydl = self._ydl()
+                # process=False: chỉ metadata của extractor (có danh sách track), không chọn format video
+                info = ydl.extract_info(video_url, download=False, process=False) or {}
+                track = self.select_track(info, languages)
+                if track is None:
+                    self._count(fetches=1, no_track=1, slot_wait_ms=slot_wait_ms)
+                    logger.warning(f"⚠️ No subtitles for {video_url} (languages: {languages})")
+                    return None
+                data = ydl.urlopen(track['url']).read()
+        except Exception:
+            # Instance lỗi giữa chừng có thể ở trạng thái hỏng, tạo lại ở lần sau
+            self._discard()
+            self._count(errors=1)
+            raise
+
+        folder = subtitle_shard_dir(video_key)
+        os.makedirs(folder, exist_ok=True)
+        filename = f"{video_key}_{uuid.uuid4().hex[:8]}.{track['track']}.{track['ext']}"
+        path = os.path.join(folder, filename)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        self._count(fetches=1, total_ms=elapsed_ms, slot_wait_ms=slot_wait_ms)
+        logger.info(f"📝 Fetched {track['source']} subtitles '{track['track']}' for {video_key} in {elapsed_ms} ms")
+        return {
+            'path': path,
+            'filename': filename,
+            'language': track['language'],
+            'track': track['track'],
+            'source': track['source'],
+            'slot_wait_ms': slot_wait_ms,
+            'fetch_ms': elapsed_ms
+        }
+
+    def fetch(self, video_url: str, languages: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Download the best subtitle track of one video.
+
+        Returns ``{'path', 'filename', 'language', 'track', 'source', 'slot_wait_ms', 'fetch_ms'}``
+        or None when the video has no track in ``languages`` (SUBTITLE_LANGUAGES by default).
+        """
+        return self.executor.submit(self._fetch, video_url, languages or SUBTITLE_LANGUAGES).result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        completed = stats['fetches'] - stats['no_track']
+        stats['avg_fetch_ms'] = round(stats['total_ms'] / completed, 1) if completed else None
+        stats['workers'] = self.workers
+        stats['max_uses'] = self.max_uses
+        stats['cache_dir'] = self.cache_dir
+        stats['languages'] = SUBTITLE_LANGUAGES
+        stats['download_slots'] = download_limiter.stats()
+        return stats
+
+
+# Global instance
+subtitle_fetcher = SubtitleFetcher()
@@ -0,0 +1,218 @@
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from text_chunker import SENTENCE_BOUNDARY_RE, TokenCounter, chunk_segments, estimate_tokens
+
+# (start_seconds, end_seconds, text) của một cue
+Cue = Tuple[float, float, str]
+
+TIMING_SEPARATOR = '-->'
+# Tag trong WebVTT (<c>, <00:00:01.000>, <v Speaker>) và SRT (<i>, <font ...>)
+VTT_TAG_RE = re.compile(r'<[^>]*>')
+
+
+def parse_timestamp(value: str) -> float:
+    """'HH:MM:SS,mmm' (SRT) or '[HH:]MM:SS.mmm' (VTT) -> seconds"""
+    value = value.strip().replace(',', '.')
+    parts = value.split(':')
+    seconds = float(parts[-1])
+    if len(parts) >= 2:
+        seconds += int(parts[-2]) * 60
+    if len(parts) >= 3:
+        seconds += int(parts[-3]) * 3600
+    return seconds
+
+
+def format_timestamp(seconds: float) -> str:
+    """Seconds -> 'HH:MM:SS,mmm' (the SRT form stored in srt_chunks.time)"""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def _parse_timing(line: str) -> Tuple[float, float]:
+    start, _, rest = line.partition(TIMING_SEPARATOR)
+    # VTT có thể có cue settings sau end time: "00:01.000 --> 00:04.000 align:start"
+    end = rest.strip().split(' ', 1)[0]
+    return parse_timestamp(start), parse_timestamp(end)
+
+
+def iter_cues(lines: Iterable[str], strip_tags: bool = False) -> Iterator[Cue]:
+    """Yield (start, end, text) for every cue of an SRT or WebVTT stream, one cue in memory at a time.
+
+    Cue numbers, the WEBVTT header and NOTE/STYLE blocks are skipped; the
+    text lines of a cue are joined with a single space. Only an empty line
+    ends a cue, whitespace-only lines inside a cue are skipped.
+    """
+    timing = None
+    text_lines: List[str] = []
+    for raw_line in lines:
+        # Chỉ dòng rỗng thật mới kết thúc cue: auto-caption VTT của YouTube có dòng " " ngay trong cue
+        if not raw_line.rstrip('\r\n'):
+            if timing is not None:
+                yield timing[0], timing[1], ' '.join(text_lines)
+                timing = None
+                text_lines = []
+            continue
+        line = raw_line.strip()
+        if not line:
+            continue
+        if timing is None:
+            if TIMING_SEPARATOR in line:
+                try:
+                    timing = _parse_timing(line)
+                except ValueError:
+                    timing = None
+            # Dòng khác ngoài cue (số thứ tự, WEBVTT, NOTE...) bị bỏ qua
+            continue
+        if strip_tags:
+            line = VTT_TAG_RE.sub('', line).strip()
+            if not line:
+                continue
+        text_lines.append(line)
+
+    if timing is not None:
+        yield timing[0], timing[1], ' '.join(text_lines)
+
+
+def iter_subtitle_file(path: str, encoding: str = 'utf-8') -> Iterator[Cue]:
+    """Stream the cues of an .srt or .vtt file (format picked by extension)"""
+    strip_tags = path.lower().endswith('.vtt')
+    # utf-8-sig: bỏ BOM ở đầu file nếu có
+    if encoding.lower().replace('_', '-') == 'utf-8':
+        encoding = 'utf-8-sig'
+    with open(path, 'r', encoding=encoding) as f:
+        yield from iter_cues(f, strip_tags=strip_tags)
+
+
+def dedupe_rolling_cues(cues: Iterable[Cue], min_overlap: int = 2, lookback: int = 3,
+                        stats: Optional[Dict[str, Any]] = None) -> Iterator[Cue]:
+    """Drop the text YouTube auto-captions repeat from one cue to the next ("rolling" captions).
+
+    A rolling cue starts with the text of the cue(s) just before it, so a
+    prefix is removed only when it equals the speech emitted since one of the
+    last ``lookback`` cue boundaries and is at least ``min_overlap`` words;
+    natural repetitions inside speech ("I think, I think") are kept. Word
+    counts before/after and the reduction ratio are written into ``stats``.
+    """
+    recent = deque(maxlen=lookback)
+    words_in = words_out = cues_dropped = 0
+
+    for start, end, text in cues:
+        words = text.split()
+        words_in += len(words)
+        if not words:
+            continue
+
+        # Thử suffix dài nhất trước: nội dung từ cue thứ j tính ngược tới cue vừa phát ra
+        overlap = 0
+        suffix: List[str] = []
+        candidates = []
+        for previous in reversed(recent):
+            suffix = previous + suffix
+            candidates.append(suffix)
+        for candidate in reversed(candidates):
+            size = len(candidate)
+            if min_overlap <= size <= len(words) and words[:size] == candidate:
+                overlap = size
+                break
+
+        words = words[overlap:]
+        if not words:
+            cues_dropped += 1
+            continue
+
+        recent.append(words)
+        words_out += len(words)
+        yield start, end, ' '.join(words)
+
+    if stats is not None:
+        stats.update({
+            'words_before': words_in,
+            'words_after': words_out,
+            'cues_dropped': cues_dropped,
+            'reduction_ratio': round(1 - words_out / words_in, 4) if words_in else 0.0
+        })
+
+
+def iter_cue_sentences(cues: Iterable[Cue], max_words: int = 60) -> Iterator[Dict[str, Any]]:
+    """Re-cut the cue stream into sentences, each with the start of its first cue and the end of its last.
+
+    Auto-captions often have no punctuation, so a sentence is also closed at
+    the cue boundary where it reaches ``max_words`` to keep timestamps precise.
+    """
+    parts: List[str] = []
+    word_count = 0
+    sentence_start = sentence_end = 0.0
+
+    for start, end, text in cues:
+        position = 0
+        for match in SENTENCE_BOUNDARY_RE.finditer(text):
+            piece = text[position:match.end()].strip()
+            position = match.end()
+            if piece:
+                if not parts:
+                    sentence_start = start
+                parts.append(piece)
+            if parts:
+                yield {'text': ' '.join(parts), 'start': sentence_start, 'end': end}
+                parts = []
+                word_count = 0
+        piece = text[position:].strip()
+        if piece:
+            if not parts:
+                sentence_start = start
+            parts.append(piece)
+            word_count += len(piece.split())
+            sentence_end = end
+            if word_count >= max_words:
+                yield {'text': ' '.join(parts), 'start': sentence_start, 'end': sentence_end}
+                parts = []
+                word_count = 0
+
+    if parts:
+        yield {'text': ' '.join(parts), 'start': sentence_start, 'end': sentence_end}
+
+
+def chunk_cues(cues: Iterable[Cue], max_tokens: int, overlap_tokens: int = 0,
+               count_tokens: TokenCounter = estimate_tokens) -> Iterator[Dict[str, Any]]:
+    """Sentence-aware chunks of a cue stream that fit ``max_tokens`` of the embedding model.
+
+    Each chunk carries the SRT-style ``time`` plus float ``start_time`` / ``end_time``.
+    """
+    segments = iter_cue_sentences(cues)
+    for index, chunk in enumerate(chunk_segments(segments, max_tokens, overlap_tokens, count_tokens)):
+        start = chunk[0]['start']
+        end = max(segment['end'] for segment in chunk)
+        yield {
+            'chunk_id': str(index),
+            'chunk_index': index,
+            'text': ' '.join(segment['text'] for segment in chunk),
+            'tokens': sum(segment['tokens'] for segment in chunk),
+            'time': format_timestamp(start),
+            'start_time': round(start, 3),
+            'end_time': round(end, 3),
+            'duration': round(max(0.0, end - start), 3)
+        }
+
+
+def chunk_subtitle_lines(lines: Iterable[str], max_tokens: int, overlap_tokens: int = 0,
+                         count_tokens: TokenCounter = estimate_tokens, dedupe: bool = True,
+                         stats: Optional[Dict[str, Any]] = None, is_vtt: bool = False) -> List[Dict[str, Any]]:
+    """Chunk any line stream of SRT/VTT text (an open file or a decompressed blob from the subtitle store)"""
+    cues = iter_cues(lines, strip_tags=is_vtt)
+    if dedupe:
+        cues = dedupe_rolling_cues(cues, stats=stats)
+    return list(chunk_cues(cues, max_tokens, overlap_tokens, count_tokens))
+
+
+def chunk_subtitle_file(path: str, max_tokens: int, overlap_tokens: int = 0,
+                        count_tokens: TokenCounter = estimate_tokens, dedupe: bool = True,
+                        stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    cues = iter_subtitle_file(path)
+    if dedupe:
+        cues = dedupe_rolling_cues(cues, stats=stats)
+    return list(chunk_cues(cues, max_tokens, overlap_tokens, count_tokens))
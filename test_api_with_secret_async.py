@@ -61,7 +61,7 @@ def test_async_article_generation():
             print(f"⏰ Started At: {result.get('article_generation_started_at')}")
             print()
             
-            if result.get('article_generation_status') == 'processing':
+            if result.get('article_generation_status') in ('queued', 'processing'):
                 print("🚀 Async article generation started!")
                 print("⏳ Waiting 25 seconds for article generation to complete...")
                 time.sleep(25)
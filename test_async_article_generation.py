@@ -60,7 +60,7 @@ def test_event_match_end_api():
             print()
             
             # Check if async processing was started
-            if result.get('article_generation_status') == 'processing':
+            if result.get('article_generation_status') in ('queued', 'processing'):
                 print("🚀 Async article generation started successfully!")
                 print(f"⏰ Processing started at: {result.get('article_generation_started_at')}")
                 print("⏳ Article generation will begin in 20 seconds...")
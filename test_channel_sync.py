@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test script to verify incremental channel sync never loses the back catalogue after a capped crawl
+(runs against mongomock and a fake YouTube client, no API key needed)
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import mongomock
+
+import app.youtube_sync as youtube_sync
+import app.channel_poller as channel_poller_module
+from app.youtube_sync import crawl_channel_videos, SYNC_MODE_FULL, SYNC_MODE_INCREMENTAL
+
+CHANNEL_ID = 'UC_test_channel'
+PLAYLIST_ID = 'UU_test_channel'
+
+
+class NotModified(Exception):
+    def __init__(self):
+        super().__init__('304 Not Modified')
+        self.resp = SimpleNamespace(status=304)
+
+
+class FakeRequest:
+    def __init__(self, execute):
+        self.headers = {}
+        self._execute = execute
+
+    def execute(self):
+        return self._execute(self.headers)
+
+
+class FakeYouTube:
+    """Uploads playlist newest first; page tokens are offsets, the ETag changes when the top page changes"""
+
+    def __init__(self, count):
+        self.videos_list = []
+        self.playlist_calls = 0
+        self.add_videos(count)
+
+    def add_videos(self, count):
+        start = len(self.videos_list)
+        base = datetime(2024, 1, 1)
+        new = [{'id': f'vid{start + i:04d}', 'published_at': base + timedelta(hours=start + i)} for i in range(count)]
+        self.videos_list = list(reversed(new)) + self.videos_list
+
+    def _etag(self):
+        return 'etag-' + ','.join(video['id'] for video in self.videos_list[:50])
+
+    def playlistItems(self):
+        return self
+
+    def videos(self):
+        return SimpleNamespace(list=self._video_details)
+
+    def list(self, part, playlistId, maxResults, pageToken=None, fields=None):
+        def execute(headers):
+            self.playlist_calls += 1
+            offset = int(pageToken) if pageToken else 0
+            if offset == 0 and headers.get('If-None-Match') == self._etag():
+                raise NotModified()
+            page = self.videos_list[offset:offset + maxResults]
+            response = {
+                'etag': self._etag(),
+                'items': [{'snippet': {
+                    'title': video['id'],
+                    'publishedAt': video['published_at'].strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    'resourceId': {'videoId': video['id']}
+                }} for video in page]
+            }
+            if offset + maxResults < len(self.videos_list):
+                response['nextPageToken'] = str(offset + maxResults)
+            return response
+        return FakeRequest(execute)
+
+    def _video_details(self, part, id, maxResults, fields):
+        return FakeRequest(lambda headers: {'items': [
+            {'id': video_id, 'statistics': {'viewCount': '1', 'likeCount': '0'}, 'contentDetails': {'duration': 'PT1M'}}
+            for video_id in id.split(',')
+        ]})
+
+
+def _setup(count):
+    mongo = SimpleNamespace(db=mongomock.MongoClient().db)
+    mongo.db.youtube_channels.insert_one({'channel_id': CHANNEL_ID, 'uploads_playlist_id': PLAYLIST_ID})
+    youtube = FakeYouTube(count)
+    patches = [
+        mock.patch.object(youtube_sync, 'get_mongo', lambda: mongo),
+        mock.patch.object(youtube_sync, 'get_youtube_client', lambda: youtube),
+        mock.patch.object(channel_poller_module, 'get_mongo', lambda: mongo),
+    ]
+    for patch in patches:
+        patch.start()
+    return mongo, youtube, patches
+
+
+def _stored(mongo):
+    return mongo.db.videos.count_documents({'channel_id': CHANNEL_ID})
+
+
+def test_incremental_after_capped_crawl():
+    """'Crawl 10 latest' then incremental crawls store the whole playlist"""
+
+    print("🧪 Testing incremental sync after a capped first crawl")
+    print("=" * 50)
+
+    mongo, youtube, patches = _setup(200)
+    try:
+        first = crawl_channel_videos(CHANNEL_ID, 10, mode=SYNC_MODE_FULL)
+        print(f"📺 Capped crawl: {first}")
+        assert first['crawled_count'] == 10
+        assert not first['backfill_complete']
+
+        second = crawl_channel_videos(CHANNEL_ID, 50, mode=SYNC_MODE_INCREMENTAL)
+        print(f"📺 Incremental (max 50 new): {second}")
+        assert _stored(mongo) == 60
+        assert not second['backfill_complete']
+
+        third = crawl_channel_videos(CHANNEL_ID, 0, mode=SYNC_MODE_INCREMENTAL)
+        print(f"📺 Incremental (no limit): {third}")
+        assert _stored(mongo) == 200
+        assert third['backfill_complete']
+
+        # Backfill xong: trang đầu không đổi -> 304
+        fourth = crawl_channel_videos(CHANNEL_ID, 0, mode=SYNC_MODE_INCREMENTAL)
+        print(f"📺 Incremental (unchanged): {fourth}")
+        assert fourth['not_modified']
+
+        youtube.add_videos(3)
+        fifth = crawl_channel_videos(CHANNEL_ID, 0, mode=SYNC_MODE_INCREMENTAL)
+        print(f"📺 Incremental (3 new uploads): {fifth}")
+        assert fifth['crawled_count'] == 3 and fifth['reached_known']
+        assert _stored(mongo) == 203
+        print("✅ Whole playlist stored")
+    finally:
+        for patch in patches:
+            patch.stop()
+
+
+def test_poll_after_capped_crawl():
+    """The channel poller keeps backfilling a channel first crawled with a cap"""
+
+    print("🧪 Testing channel poller after a capped first crawl")
+    print("=" * 50)
+
+    mongo, youtube, patches = _setup(200)
+    queued = []
+    patches.append(mock.patch.object(channel_poller_module.video_pipeline_queue, 'enqueue',
+                                     lambda job_type, payload, dedupe_key=None: queued.append(payload)))
+    patches[-1].start()
+    try:
+        crawl_channel_videos(CHANNEL_ID, 10, mode=SYNC_MODE_FULL)
+        poller = channel_poller_module.ChannelPoller(max_videos=100)
+        channel = mongo.db.youtube_channels.find_one({'channel_id': CHANNEL_ID})
+
+        polls = []
+        for _ in range(3):
+            polls.append(poller.poll_channel(channel))
+        print(f"🛰️ Polls: {polls}")
+        assert [poll['new_videos'] for poll in polls] == [100, 90, 0]
+        assert _stored(mongo) == 200
+        assert mongo.db.youtube_channels.find_one({'channel_id': CHANNEL_ID})['sync_state']['backfill_complete']
+        print(f"✅ Poller stored the back catalogue ({len(queued)} pipeline jobs queued)")
+    finally:
+        for patch in patches:
+            patch.stop()
+
+
+if __name__ == "__main__":
+    test_incremental_after_capped_crawl()
+    test_poll_after_capped_crawl()
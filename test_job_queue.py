@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script to verify article generation goes through the durable job queue
+"""
+
+import requests
+import json
+import time
+from datetime import datetime
+
+# Configuration
+API_BASE_URL = "http://localhost:5000"
+SECRET_KEY = "your_secret_key_here"  # Replace with your actual secret key
+
+def test_event_match_end_is_queued():
+    """Test that event_match_end creates a job instead of a thread"""
+    
+    print("🧪 Testing Job Queue for Article Generation")
+    print("=" * 50)
+    
+    fixture_id = f"job_queue_test_{int(time.time())}"
+    
+    # Request thường để có dữ liệu nguồn cho fixture
+    info_data = {
+        "type": "event_goal",
+        "fixture_id": fixture_id,
+        "info": {"minute": 12, "team": "Chelsea", "player": "Palmer"},
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    end_data = {
+        "type": "event_match_end",
+        "fixture_id": fixture_id,
+        "commentaries": [{"minute": 90, "text": "Full time"}],
+        "match_data": {"home_team": "Chelsea", "away_team": "Liverpool", "score": "2-1"},
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    
+    try:
+        for payload in (info_data, end_data):
+            response = requests.post(
+                f"{API_BASE_URL}/api/requests",
+                params={"secret_key": SECRET_KEY},
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=10
+            )
+            print(f"📊 {payload['type']}: {response.status_code}")
+        
+        result = response.json()
+        print(json.dumps(result, indent=2))
+        
+        job_id = result.get('article_job_id')
+        if result.get('article_generation_status') != 'queued' or not job_id:
+            print("❌ Failed: event_match_end was not queued")
+            return
+        
+        print(f"✅ Job queued: {job_id}")
+        
+        # Poll trạng thái job
+        for i in range(30):
+            job_response = requests.get(f"{API_BASE_URL}/api/jobs/{job_id}", timeout=10)
+            job = job_response.json().get('job', {})
+            status = job.get('status')
+            print(f"⏳ {i * 2}s: status={status} attempts={job.get('attempts')}")
+            if status in ('done', 'dead'):
+                print(f"🏁 Final status: {status}")
+                if job.get('last_error'):
+                    print(f"❌ Last error: {job.get('last_error')}")
+                break
+            time.sleep(2)
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+
+def test_jobs_api():
+    """Test the /api/jobs status endpoint"""
+    
+    print("\n🧪 Testing /api/jobs")
+    print("=" * 50)
+    
+    try:
+        response = requests.get(f"{API_BASE_URL}/api/jobs", params={"limit": 5}, timeout=10)
+        print(f"📊 Response Status: {response.status_code}")
+        
+        if response.status_code == 200:
+            result = response.json()
+            for queue in result.get('queues', []):
+                print(f"📦 Queue {queue['queue']}: {queue['counts']} (workers: {queue['workers']}, busy: {queue['busy_workers']})")
+            print(f"📋 Total jobs: {result.get('total_count')}")
+        else:
+            print(f"❌ Failed: {response.text}")
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+
+if __name__ == "__main__":
+    test_event_match_end_is_queued()
+    test_jobs_api()
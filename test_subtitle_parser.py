@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the SRT/VTT cue parser on YouTube auto-caption VTT
+"""
+
+from subtitle_parser import chunk_subtitle_lines, iter_cues
+
+# Auto-caption VTT của YouTube: mỗi cue rolling có một dòng chỉ gồm khoảng trắng
+YOUTUBE_VTT = "\n".join([
+    "WEBVTT",
+    "Kind: captions",
+    "Language: en",
+    "",
+    "00:00:00.160 --> 00:00:02.070 align:start position:0%",
+    " ",
+    "welcome<00:00:00.480><c> back</c><00:00:00.800><c> to</c><00:00:01.120><c> the</c><00:00:01.440><c> channel</c>",
+    "",
+    "00:00:02.070 --> 00:00:02.080 align:start position:0%",
+    "welcome back to the channel",
+    " ",
+    "",
+    "00:00:02.080 --> 00:00:04.630 align:start position:0%",
+    "welcome back to the channel",
+    "today<00:00:02.400><c> we</c><00:00:02.720><c> look</c><00:00:03.040><c> at</c><00:00:03.360><c> the</c><00:00:03.680><c> match</c>",
+    "",
+]) + "\n"
+
+
+def test_blank_padded_cue_lines():
+    """Whitespace-only lines inside a cue must not end it"""
+
+    print("🧪 Testing YouTube VTT with blank-padded cue lines")
+    print("=" * 50)
+
+    cues = list(iter_cues(YOUTUBE_VTT.splitlines(keepends=True), strip_tags=True))
+    for cue in cues:
+        print(f"📝 {cue}")
+
+    assert len(cues) == 3
+    assert cues[0] == (0.16, 2.07, 'welcome back to the channel')
+    assert cues[1] == (2.07, 2.08, 'welcome back to the channel')
+    assert cues[2][0] == 2.08
+    assert cues[2][2] == 'welcome back to the channel today we look at the match'
+    print("✅ Cue timings and text preserved")
+
+
+def test_first_chunk_starts_at_first_cue():
+    """The first chunk keeps the timing of the first cue"""
+
+    print("🧪 Testing chunk timing on YouTube VTT")
+    print("=" * 50)
+
+    stats = {}
+    chunks = chunk_subtitle_lines(YOUTUBE_VTT.splitlines(keepends=True), max_tokens=256, stats=stats, is_vtt=True)
+    print(f"📦 Chunks: {chunks}")
+    print(f"📊 Dedupe: {stats}")
+
+    assert chunks
+    assert chunks[0]['start_time'] == 0.16
+    assert chunks[0]['time'] == '00:00:00,160'
+    assert chunks[0]['text'] == 'welcome back to the channel today we look at the match'
+    print("✅ First chunk starts at 0.16s")
+
+
+if __name__ == "__main__":
+    test_blank_padded_cue_lines()
+    test_first_chunk_starts_at_first_cue()
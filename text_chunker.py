@@ -0,0 +1,151 @@
+import re
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Hàm đếm token cho một batch text (tokenizer của model embedding hoặc ước lượng)
+TokenCounter = Callable[[List[str]], List[int]]
+
+# Ranh giới câu: sau . ! ? … (kèm dấu ngoặc/nháy đóng) và khoảng trắng, hoặc dòng trống / xuống dòng
+SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?…])["\'”’)\]]*\s+|\n+')
+
+# Đếm token theo batch để tokenizer xử lý nhiều câu một lần
+COUNT_BATCH_SIZE = 256
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split ``text`` into sentences in one regex pass (paragraph breaks also end a sentence)"""
+    sentences = []
+    start = 0
+    for match in SENTENCE_BOUNDARY_RE.finditer(text):
+        sentence = text[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+def estimate_tokens(texts: List[str]) -> List[int]:
+    """Conservative token estimate (~4/3 tokens per word) used when no tokenizer is available"""
+    return [(len(text.split()) * 4 + 2) // 3 for text in texts]
+
+
+def model_token_budget(key: str, reserved: int = 0,
+                       max_tokens: Optional[int] = None) -> Tuple[TokenCounter, int]:
+    """Token counter and per-chunk budget for embedding model ``key``.
+
+    The budget is the model window minus ``reserved`` tokens (text the indexer
+    adds around the chunk), capped by ``max_tokens``. Falls back to the word
+    estimate and a 256-token window if the model cannot be loaded.
+    """
+    from embedding_service import embedding_service, EmbeddingModelError
+
+    try:
+        window = embedding_service.max_tokens(key)
+
+        def counter(texts: List[str]) -> List[int]:
+            return embedding_service.count_tokens(texts, key)
+    except (EmbeddingModelError, ImportError, AttributeError) as e:
+        logger.warning(f"⚠️ Tokenizer for '{key}' unavailable, estimating token counts: {str(e)}")
+        window = 254
+        counter = estimate_tokens
+
+    budget = window - reserved
+    if max_tokens:
+        budget = min(budget, max_tokens)
+    return counter, max(16, budget)
+
+
+def _split_long_segment(segment: Dict[str, Any], max_tokens: int, count_tokens: TokenCounter) -> List[Dict[str, Any]]:
+    """Cut a segment longer than the budget into word windows that each fit"""
+    words = segment['text'].split()
+    pieces = []
+    start = 0
+    while start < len(words):
+        # Ước lượng số từ theo tỷ lệ token/từ của segment, thu nhỏ cho tới khi vừa budget
+        size = max(1, int(len(words) * max_tokens / max(1, segment['tokens']) * 0.9))
+        while True:
+            text = ' '.join(words[start:start + size])
+            tokens = count_tokens([text])[0]
+            if tokens <= max_tokens or size == 1:
+                break
+            size = max(1, size // 2)
+        pieces.append({**segment, 'text': text, 'tokens': tokens})
+        start += size
+    return pieces
+
+
+def _with_token_counts(segments: Iterable[Dict[str, Any]], count_tokens: TokenCounter) -> Iterator[Dict[str, Any]]:
+    batch: List[Dict[str, Any]] = []
+    for segment in segments:
+        batch.append(segment)
+        if len(batch) >= COUNT_BATCH_SIZE:
+            for seg, tokens in zip(batch, count_tokens([seg['text'] for seg in batch])):
+                seg['tokens'] = tokens
+                yield seg
+            batch = []
+    if batch:
+        for seg, tokens in zip(batch, count_tokens([seg['text'] for seg in batch])):
+            seg['tokens'] = tokens
+            yield seg
+
+
+def chunk_segments(segments: Iterable[Dict[str, Any]], max_tokens: int, overlap_tokens: int = 0,
+                   count_tokens: TokenCounter = estimate_tokens) -> Iterator[List[Dict[str, Any]]]:
+    """Greedily pack sentence segments (dicts with 'text' plus any metadata) into chunks of at most ``max_tokens``.
+
+    Each segment is counted once (in batches) and the running total is kept,
+    so packing is linear in the input. The last segments of a chunk, up to
+    ``overlap_tokens``, are repeated at the start of the next one. A segment
+    longer than the budget is split into word windows instead of being
+    truncated by the model.
+    """
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    current: deque = deque()
+    current_tokens = 0
+    has_new = False
+
+    for segment in _with_token_counts(segments, count_tokens):
+        if segment['tokens'] > max_tokens:
+            pieces = _split_long_segment(segment, max_tokens, count_tokens)
+        else:
+            pieces = [segment]
+
+        for piece in pieces:
+            if current and current_tokens + piece['tokens'] > max_tokens:
+                if has_new:
+                    yield list(current)
+                # Giữ lại các segment cuối làm overlap, bỏ phần không còn vừa budget
+                kept_tokens = 0
+                kept: deque = deque()
+                while current and kept_tokens + current[-1]['tokens'] <= overlap_tokens:
+                    seg = current.pop()
+                    kept.appendleft(seg)
+                    kept_tokens += seg['tokens']
+                current, current_tokens = kept, kept_tokens
+                while current and current_tokens + piece['tokens'] > max_tokens:
+                    current_tokens -= current.popleft()['tokens']
+                has_new = False
+            current.append(piece)
+            current_tokens += piece['tokens']
+            has_new = True
+
+    if current and has_new:
+        yield list(current)
+
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int = 0,
+               count_tokens: TokenCounter = estimate_tokens) -> List[str]:
+    """Sentence-aware chunks of ``text`` that each fit ``max_tokens``"""
+    if not text or not text.strip():
+        return []
+    segments = ({'text': sentence} for sentence in split_sentences(text))
+    return [
+        ' '.join(seg['text'] for seg in chunk)
+        for chunk in chunk_segments(segments, max_tokens, overlap_tokens, count_tokens)
+    ]
@@ -0,0 +1,123 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+# File cookies (định dạng Netscape) dùng chung cho mọi lần gọi yt-dlp
+COOKIES_FILE = os.getenv('YTDLP_COOKIES_FILE', 'cookies.txt')
+
+# Giới hạn số download đồng thời theo host trong một process
+YOUTUBE_MAX_CONCURRENT_DOWNLOADS = int(os.getenv('YOUTUBE_MAX_CONCURRENT_DOWNLOADS', 3))
+DEFAULT_MAX_CONCURRENT_DOWNLOADS = int(os.getenv('DEFAULT_MAX_CONCURRENT_DOWNLOADS', 4))
+
+# Thư mục gốc chứa file phụ đề, chia shard theo N ký tự đầu của video id (srt_files/ab/abXYZ..._1a2b3c4d.en.srt)
+SRT_FILES_DIR = os.getenv('SRT_FILES_DIR', 'srt_files')
+SRT_SHARD_CHARS = int(os.getenv('SRT_SHARD_CHARS', 2))
+
+# Các domain của YouTube dùng chung một giới hạn
+HOST_ALIASES = {
+    'youtube.com': 'youtube',
+    'www.youtube.com': 'youtube',
+    'm.youtube.com': 'youtube',
+    'youtu.be': 'youtube',
+}
+HOST_LIMITS = {
+    'youtube': YOUTUBE_MAX_CONCURRENT_DOWNLOADS,
+}
+
+
+def get_cookiefile() -> Optional[str]:
+    """Path of the shared cookies file for yt-dlp, or None when it does not exist"""
+    if COOKIES_FILE and os.path.exists(COOKIES_FILE):
+        return COOKIES_FILE
+    return None
+
+
+def base_ydl_opts(**overrides) -> Dict[str, Any]:
+    """Common yt-dlp options (cookies, timeouts, retries) merged with ``overrides``"""
+    opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'socket_timeout': int(os.getenv('YTDLP_SOCKET_TIMEOUT', 30)),
+        'retries': int(os.getenv('YTDLP_RETRIES', 3)),
+    }
+    cookiefile = get_cookiefile()
+    if cookiefile:
+        opts['cookiefile'] = cookiefile
+    opts.update(overrides)
+    return opts
+
+
+class HostConcurrencyLimiter:
+    """Bounded semaphore per host so parallel workers do not hammer one site"""
+
+    def __init__(self, limits: Dict[str, int], default_limit: int):
+        self.limits = limits
+        self.default_limit = default_limit
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._active: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        host = (urlparse(url).hostname or '').lower()
+        return HOST_ALIASES.get(host, host)
+
+    def _semaphore(self, key: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(key)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(max(1, self.limits.get(key, self.default_limit)))
+                self._semaphores[key] = semaphore
+                self._active[key] = 0
+            return semaphore
+
+    @contextmanager
+    def slot(self, url: str):
+        key = self.host_key(url)
+        semaphore = self._semaphore(key)
+        semaphore.acquire()
+        with self._lock:
+            self._active[key] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[key] -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                key: {'active': self._active.get(key, 0), 'limit': max(1, self.limits.get(key, self.default_limit))}
+                for key in self._semaphores
+            }
+
+
+# Global instance
+download_limiter = HostConcurrencyLimiter(HOST_LIMITS, DEFAULT_MAX_CONCURRENT_DOWNLOADS)
+
+
+def youtube_video_id(video_url: str) -> Optional[str]:
+    """Video id from a watch / youtu.be / shorts URL, None when it cannot be found"""
+    parsed = urlparse(video_url)
+    host = (parsed.hostname or '').lower()
+    if host == 'youtu.be':
+        return parsed.path.lstrip('/').split('/')[0] or None
+    video_id = parse_qs(parsed.query).get('v', [None])[0]
+    if video_id:
+        return video_id
+    parts = [part for part in parsed.path.split('/') if part]
+    if len(parts) >= 2 and parts[0] in ('shorts', 'embed', 'live'):
+        return parts[1]
+    return None
+
+
+def subtitle_shard_dir(video_key: str) -> str:
+    """Directory for the subtitles of ``video_key``; keeps every directory small as the archive grows"""
+    shard = video_key[:SRT_SHARD_CHARS] if SRT_SHARD_CHARS > 0 else ''
+    return os.path.join(SRT_FILES_DIR, shard) if shard else SRT_FILES_DIR